@@ -1,16 +1,28 @@
-from flask import Flask, request, jsonify, send_file
-from services.validate_xml import validate_xml
+from flask import Flask, Response, request, jsonify, send_file
 from services.process_xml_file import procesar_configuracion, procesar_consumo
+from services.subidas import guardar_subida
 from services.facturacion_service import FacturacionService
-from services.factura_pdf_service import FacturaPdfService
+from services.factura_pdf_service import FacturaPdfService, RESUMENES
+from services.exportacion_pdf import seleccionar_facturas, exportar_zip
 from services.state_service import StateService
-from services.reporte_service import ReporteService
+from services.reporte_service import ReporteService, COLUMNAS_REPORTES, filas_json, filas_csv
 from models.classes.recurso import Recurso
 from models.classes.categoria import Categoria
 from models.classes.cliente import Cliente
+from models.classes.consumo import GrupoConsumos
+from models.columnas_consumo import DIR_COLUMNAS
+from models.marcas_facturado import RUTA_MARCAS
+from models.classes.ingreso_diario import IngresoDiario
+from models.repositorio import repositorio
+from models.exceptions import XmlInvalidoError
+from models import almacen_sqlite, bloqueo
+from services.almacenamiento_service import exportar_xml, importar_xml
+from services import trabajos
+from services.cache_pdf import DIR_CACHE_PDF
 
 import os
 import glob
+import shutil
 
 
 app = Flask(__name__)
@@ -30,6 +42,10 @@ def state():
     except Exception as e:
         return jsonify({"error": f"Error al procesar el archivo: {str(e)}"}), 500
 
+@app.route('/cache')
+def estadisticas_cache():
+    return jsonify(repositorio.estadisticas()), 200
+
 @app.route('/recursos')
 def get_recursos():
     try:
@@ -138,17 +154,14 @@ def crear_configuracion():
         return jsonify({"error": "No se recibió ningún archivo"}), 400
 
     try:
-        # Obtener el contenido del archivo XML
-        xml_content = archivo.read().decode('utf-8')
-        # Cargar y validar el XML contra el esquema XSD
-        isValid, message = validate_xml(xml_content, 'schemas/configuracion.xsd')
-        if not isValid:
-            return jsonify({"error": message }), 400
-
-        # Procesar
-        result = procesar_configuracion(xml_content)
+        # Guardar el archivo en disco para recorrerlo en streaming
+        with guardar_subida(archivo) as ruta_xml:
+            # Validar contra el esquema XSD y procesar en un solo recorrido
+            result = procesar_configuracion(ruta_xml, 'schemas/configuracion.xsd')
         return jsonify(result), 200
 
+    except XmlInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Error al procesar el archivo: {str(e)}"}), 500
 
@@ -160,32 +173,48 @@ def consumo():
         return jsonify({"error": "No se recibió ningún archivo"}), 400
 
     try:
-        # Obtener el contenido del archivo XML
-        xml_content = archivo.read().decode('utf-8')
-        # Cargar y validar el XML contra el esquema XSD
-        isValid, message = validate_xml(xml_content, 'schemas/consumo.xsd')
-        if not isValid:
-            return jsonify({"error": message }), 400
-
-        # Procesar
-        result = procesar_consumo(xml_content)
+        # Guardar el archivo en disco para recorrerlo en streaming
+        with guardar_subida(archivo) as ruta_xml:
+            # Validar contra el esquema XSD y procesar en un solo recorrido
+            result = procesar_consumo(ruta_xml, 'schemas/consumo.xsd')
         return jsonify(result), 200
 
+    except XmlInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Error al procesar el archivo: {str(e)}"}), 500
 
+@app.route('/consumo/compactar', methods=['POST'])
+def compactar_consumos():
+    try:
+        grupos = GrupoConsumos.compactar()
+        return jsonify({"message": "Bitácora de consumos compactada.", "grupos": grupos}), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al compactar consumos: {str(e)}"}), 500
+
 @app.route('/limpiar-db', methods=['POST'])
 def limpiar_xml():
     try:
-        print('hola mudo')
-        archivos = glob.glob(os.path.join("data", '*.xml'))
         eliminados = []
-        print(archivos)
-
-        for archivo in archivos:
-            os.remove(archivo)
-            eliminados.append(os.path.basename(archivo))
-
+        with bloqueo.escritura():
+            # XML de datos (con sus índices e instantáneas), facturas, bitácora de
+            # consumos e ingresos diarios, y los archivos derivados de ellos
+            archivos = glob.glob(os.path.join("data", '**', '*.xml'), recursive=True)
+            archivos += glob.glob(os.path.join("data", '**', '*.xml.idx'), recursive=True)
+            archivos += glob.glob(os.path.join("data", '**', '*.xml.snap'), recursive=True)
+            if os.path.exists(RUTA_MARCAS):
+                archivos.append(RUTA_MARCAS)
+            for archivo in archivos:
+                os.remove(archivo)
+                eliminados.append(os.path.basename(archivo))
+            for directorio in (DIR_COLUMNAS, os.path.dirname(DIR_CACHE_PDF)):
+                if os.path.isdir(directorio):
+                    shutil.rmtree(directorio)
+                    eliminados.append(os.path.basename(directorio))
+            trabajos.vaciar()
+            repositorio.limpiar()
+            if almacen_sqlite.activo():
+                almacen_sqlite.vaciar()
 
         return jsonify({
             'mensaje': 'Archivos XML eliminados correctamente.',
@@ -197,13 +226,61 @@ def limpiar_xml():
 
 @app.route("/facturas/<factura_id>")
 def generar_pdf_factura(factura_id: str):
+    resumen = request.args.get("resumen") or None
+    if resumen is not None and resumen not in RESUMENES:
+        return jsonify({"error": f"Resumen inválido, debe ser uno de: {', '.join(RESUMENES)}."}), 400
+
     try:
-        service = FacturaPdfService(int(factura_id))
-        ruta_pdf = service.generar_pdf()
-        return send_file(ruta_pdf, mimetype="application/pdf", as_attachment=True)
+        service = FacturaPdfService(int(factura_id), resumen)
+        ruta_pdf, huella = service.obtener_pdf()
+        # conditional=True responde 304 a If-None-Match / If-Modified-Since. send_file
+        # resuelve las rutas relativas desde la carpeta de la aplicación, no desde el
+        # directorio de trabajo en el que está data/
+        return send_file(
+            os.path.abspath(ruta_pdf), mimetype="application/pdf", as_attachment=True,
+            download_name=f"factura_{service.factura.id}.pdf",
+            etag=huella, last_modified=os.path.getmtime(ruta_pdf), conditional=True
+        )
     except Exception as e:
         return jsonify({"error": f"Error al generar pdf: {str(e)}"}), 500
 
+@app.route("/facturas/<factura_id>/consumos.csv")
+def consumos_factura_csv(factura_id: str):
+    try:
+        service = FacturaPdfService(int(factura_id))
+    except Exception as e:
+        return jsonify({"error": f"Error al obtener consumos: {str(e)}"}), 500
+
+    return Response(
+        service.consumos_csv(), mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=factura_{service.factura.id}_consumos.csv"}
+    )
+
+@app.route("/facturas/exportar", methods=["POST"])
+def exportar_pdf_facturas():
+    data = request.get_json(silent=True) or {}
+    nits = data.get("nits")
+    if nits is not None and not isinstance(nits, list):
+        return jsonify({"error": "'nits' debe ser una lista."}), 400
+    resumen = data.get("resumen") or None
+    if resumen is not None and resumen not in RESUMENES:
+        return jsonify({"error": f"Resumen inválido, debe ser uno de: {', '.join(RESUMENES)}."}), 400
+
+    try:
+        ids = seleccionar_facturas(data.get("fecha_inicio"), data.get("fecha_fin"), nits)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error al exportar facturas: {str(e)}"}), 500
+
+    if not ids:
+        return jsonify({"error": "No hay facturas que coincidan."}), 404
+
+    return Response(
+        exportar_zip(ids, resumen), mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=facturas.zip", "X-Facturas": str(len(ids))}
+    )
+
 @app.route('/factura', methods=['POST'])
 def generar_facturas():
     data = request.get_json()
@@ -215,6 +292,10 @@ def generar_facturas():
         return jsonify({"error": "Rango de fecha no provisto."}), 400
 
     try:
+        if _asincrono():
+            trabajo = trabajos.encolar("factura", {"fecha_inicio": fecha_inicio_str, "fecha_fin": fecha_fin_str})
+            return _trabajo_aceptado(trabajo)
+
         facturacion_service = FacturacionService()
         result = facturacion_service.facturar(fecha_inicio_str, fecha_fin_str)
         return jsonify(result), 200
@@ -233,6 +314,14 @@ def generar_reporte_pdf(reporte_id: str):
         return jsonify({"error": "Rango de fecha no provisto."}), 400
 
     try:
+        if _asincrono():
+            if reporte_id not in ("1", "2"):
+                return jsonify({"error": f"ID de reporte no válido '{reporte_id}'."}), 400
+            trabajo = trabajos.encolar("reporte", {
+                "reporte_id": reporte_id, "fecha_inicio": fecha_inicio_str, "fecha_fin": fecha_fin_str
+            })
+            return _trabajo_aceptado(trabajo)
+
         reporte_service = ReporteService(fecha_inicio_str, fecha_fin_str)
         ruta_pdf = ""
         if reporte_id == "1":
@@ -241,11 +330,104 @@ def generar_reporte_pdf(reporte_id: str):
             ruta_pdf = reporte_service.reporte2()
         else:
             return jsonify({"error": f"ID de reporte no válido '{reporte_id}'."}), 400
-        return send_file(ruta_pdf, mimetype="application/pdf", as_attachment=True)
+        return send_file(os.path.abspath(ruta_pdf), mimetype="application/pdf", as_attachment=True)
 
     except Exception as e:
         return jsonify({"error": f"Error al generar reporte: {str(e)}"}), 500
 
+@app.route("/reporte/<reporte_id>/datos")
+def datos_reporte(reporte_id: str):
+    fecha_inicio_str = request.args.get("fecha_inicio")
+    fecha_fin_str = request.args.get("fecha_fin")
+    formato = request.args.get("formato", "json").lower()
+
+    if not fecha_inicio_str or not fecha_fin_str:
+        return jsonify({"error": "Rango de fecha no provisto."}), 400
+    if reporte_id not in COLUMNAS_REPORTES:
+        return jsonify({"error": f"ID de reporte no válido '{reporte_id}'."}), 400
+    if formato not in ("json", "csv"):
+        return jsonify({"error": f"Formato no válido '{formato}', debe ser json o csv."}), 400
+
+    try:
+        reporte_service = ReporteService(fecha_inicio_str, fecha_fin_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        filas = reporte_service.filas(reporte_id)
+    except Exception as e:
+        return jsonify({"error": f"Error al generar reporte: {str(e)}"}), 500
+
+    # Las filas se serializan y envían una a una
+    if formato == "csv":
+        return Response(
+            filas_csv(COLUMNAS_REPORTES[reporte_id], filas), mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=reporte_{reporte_id}.csv"}
+        )
+    encabezado = {"reporte": reporte_id, "fecha_inicio": fecha_inicio_str, "fecha_fin": fecha_fin_str}
+    return Response(filas_json(encabezado, filas), mimetype="application/json")
+
+@app.route("/jobs/<job_id>")
+def estado_trabajo(job_id: str):
+    try:
+        trabajo = trabajos.obtener(job_id)
+        if trabajo is None:
+            return jsonify({"error": f"Trabajo '{job_id}' no encontrado."}), 404
+        return jsonify(_trabajo_dict(trabajo)), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al consultar el trabajo: {str(e)}"}), 500
+
+@app.route("/jobs/<job_id>/resultado")
+def resultado_trabajo(job_id: str):
+    try:
+        trabajo = trabajos.obtener(job_id)
+        if trabajo is None:
+            return jsonify({"error": f"Trabajo '{job_id}' no encontrado."}), 404
+        if trabajo.estado != trabajos.COMPLETADO:
+            return jsonify(_trabajo_dict(trabajo)), 409
+        if trabajo.archivo:
+            return send_file(os.path.abspath(trabajo.archivo), mimetype="application/pdf", as_attachment=True)
+        return jsonify(trabajo.resultado), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al obtener el resultado del trabajo: {str(e)}"}), 500
+
+def _asincrono() -> bool:
+    return request.args.get("asincrono", "0").lower() in ("1", "true")
+
+def _trabajo_dict(trabajo: trabajos.Trabajo) -> dict:
+    datos = trabajo.to_dict()
+    datos["url"] = f"/jobs/{trabajo.id}"
+    if trabajo.estado == trabajos.COMPLETADO:
+        datos["resultado_url"] = f"/jobs/{trabajo.id}/resultado"
+    return datos
+
+def _trabajo_aceptado(trabajo: trabajos.Trabajo):
+    respuesta = jsonify(_trabajo_dict(trabajo))
+    respuesta.headers["Location"] = f"/jobs/{trabajo.id}"
+    return respuesta, 202
+
+
+@app.cli.command("exportar-xml")
+def exportar_xml_comando():
+    """Regenera los archivos XML de data/ desde la base SQLite."""
+    if not almacen_sqlite.activo():
+        print("El motor de almacenamiento configurado ya es XML (SERVICE2_ALMACENAMIENTO=xml).")
+        return
+    print(f"Exportado a XML: {exportar_xml()}")
+
+@app.cli.command("importar-xml")
+def importar_xml_comando():
+    """Reemplaza el contenido de la base SQLite con los archivos XML de data/."""
+    if not almacen_sqlite.activo():
+        print("El motor de almacenamiento configurado es XML (SERVICE2_ALMACENAMIENTO=xml).")
+        return
+    print(f"Importado a SQLite: {importar_xml()}")
+
+@app.cli.command("reconstruir-ingresos")
+def reconstruir_ingresos_comando():
+    """Vuelve a calcular los ingresos acumulados de los reportes desde las facturas guardadas."""
+    print(f"Ingresos reconstruidos con {IngresoDiario.reconstruir()} facturas.")
+
 
 if __name__ == '__main__':
     app.run(debug=True)
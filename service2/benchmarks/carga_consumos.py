@@ -0,0 +1,87 @@
+"""
+Memoria máxima del proceso al cargar un archivo de consumos con POST /consumo, para
+varios tamaños de archivo. El archivo se guarda en disco y se valida y procesa en
+streaming, así el pico de memoria no crece con el tamaño de la carga. La compactación
+de la bitácora, que depende del historial y no de la carga, se desactiva para medir
+solo la carga.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.carga_consumos [--filas 100000 400000 1600000]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generar_carga(ruta: str, filas: int) -> None:
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<listadoConsumos>\n")
+        for i in range(filas):
+            g = i % 2000
+            f.write(
+                f'  <consumo nitCliente="{1000000 + g}-{g % 10}" idInstancia="{g}">\n'
+                f"    <tiempo>{(i % 7) + 0.25}</tiempo>\n"
+                f"    <fechaHora>{i % 28 + 1:02d}/01/2025 {i % 24:02d}:00</fechaHora>\n"
+                "  </consumo>\n"
+            )
+        f.write("</listadoConsumos>")
+
+
+def medir(directorio: str, ruta_carga: str) -> dict:
+    sys.path.insert(0, RAIZ_SERVICIO)
+    os.chdir(directorio)
+    os.makedirs("data", exist_ok=True)
+    os.symlink(os.path.join(RAIZ_SERVICIO, "schemas"), "schemas")
+    from app import app
+
+    cliente = app.test_client()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    with open(ruta_carga, "rb") as archivo:
+        respuesta = cliente.post("/consumo", data={"archivo": (archivo, "consumos.xml")})
+    transcurrido = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "consumos": respuesta.get_json()["consumos_procesados"],
+        "tiempo": transcurrido,
+        "pico_mb": (pico - base) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, nargs="+", default=[100000, 400000, 1600000])
+    parser.add_argument("--medir", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(*args.medir)))
+        return
+
+    print(f"{'consumos':>10}{'archivo':>12}{'tiempo':>10}{'memoria extra':>16}")
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_carga = os.path.join(directorio, "carga.xml")
+            generar_carga(ruta_carga, filas)
+            tamano = os.path.getsize(ruta_carga)
+            servicio = os.path.join(directorio, "servicio")
+            os.makedirs(servicio)
+            env = dict(os.environ, SERVICE2_BITACORA_MAX_BYTES=str(2 ** 62))
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.carga_consumos", "--medir", servicio, ruta_carga],
+                cwd=RAIZ_SERVICIO, env=env, capture_output=True, text=True, check=True
+            )
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{r['consumos']:>10}{tamano / 1024 / 1024:>10.1f}MB{r['tiempo']:>9.2f}s{r['pico_mb']:>14.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Escalado del armado de facturas con la cantidad de clientes (una instancia y un
+grupo de consumos por cliente). Con los índices por NIT e instancia el tiempo por
+cliente se mantiene constante; como referencia se mide también el recorrido anidado
+clientes x grupos anterior, hasta --max-anidado clientes.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.escalado_facturacion [--clientes 100 1000 10000 100000]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+os.chdir(RAIZ_SERVICIO)
+
+from models.classes.cliente import Cliente
+from models.classes.consumo import GrupoConsumos, Consumo
+from models.classes.instancia import Instancia
+from services.facturacion_service import FacturacionService
+
+RANGO = ("01/01/2025", "31/01/2025", datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+
+class FacturacionEnMemoria(FacturacionService):
+    """
+    FacturacionService sobre clientes y grupos ya construidos, sin leer data/.
+    """
+
+    def __init__(self, clientes, grupos, anidado: bool = False):
+        super().__init__(clientes=clientes)
+        self._grupos = grupos
+        self._anidado = anidado
+
+    def _cargar_grupos_pendientes(self, fecha_ini, fecha_fin):
+        return self._grupos
+
+    def _indexar_grupos(self, grupos):
+        if not self._anidado:
+            return super()._indexar_grupos(grupos)
+        # Recorrido anterior: cada cliente compara todos los grupos
+        return _GruposAnidados(grupos)
+
+    def _indexar_configuraciones(self, cliente):
+        if not self._anidado:
+            return super()._indexar_configuraciones(cliente)
+        return _ConfiguracionesAnidadas(cliente)
+
+
+class _GruposAnidados:
+    def __init__(self, grupos):
+        self._grupos = grupos
+
+    def get(self, nit, _):
+        return [g for g in self._grupos if g.nitCliente.lower() == nit]
+
+
+class _ConfiguracionesAnidadas:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def get(self, id_instancia):
+        for inst in self._cliente.instancias:
+            if inst.id == id_instancia:
+                return inst.idConfiguracion
+        return None
+
+
+def generar(clientes: int):
+    lista_clientes, grupos = [], []
+    for c in range(clientes):
+        nit = f"{1000000 + c}-{c % 10}"
+        cliente = Cliente(nit, f"Cliente {c}", f"u{c}", f"c{c}", "Ciudad", f"c{c}@correo.com")
+        cliente.instancias = [Instancia(c, c % 4 + 1, f"Instancia {c}", "01/01/2024", "Vigente", "")]
+        lista_clientes.append(cliente)
+        grupo = GrupoConsumos(nitCliente=nit, idInstancia=c)
+        grupo.consumos = [Consumo(1.5, "10/01/2025 08:00"), Consumo(2.25, "11/01/2025 09:30")]
+        grupos.append(grupo)
+    return lista_clientes, grupos
+
+
+def medir(clientes: int, anidado: bool) -> float:
+    lista_clientes, grupos = generar(clientes)
+    servicio = FacturacionEnMemoria(lista_clientes, grupos, anidado)
+    inicio = time.perf_counter()
+    facturas, _, _ = servicio._generar_facturas(*RANGO)
+    transcurrido = time.perf_counter() - inicio
+    assert len(facturas) == clientes
+    return transcurrido
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--max-anidado", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'clientes':>10}{'indexado':>14}{'µs/cliente':>12}{'anidado':>14}{'µs/cliente':>12}")
+    for n in args.clientes:
+        indexado = medir(n, anidado=False)
+        fila = f"{n:>10}{indexado:>13.3f}s{indexado / n * 1e6:>12.1f}"
+        if n <= args.max_anidado:
+            anidado = medir(n, anidado=True)
+            fila += f"{anidado:>13.3f}s{anidado / n * 1e6:>12.1f}"
+        else:
+            fila += f"{'-':>14}{'-':>12}"
+        print(fila)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Tiempo de generación y tamaño del PDF de una factura según la cantidad de consumos,
+con el detalle completo (tablas partidas por páginas) y con los resúmenes por día y
+por semana. Los consumos son horarios y se reparten entre --instancias instancias.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.factura_pdf [--filas 1000 10000 100000] [--instancias 4]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from benchmarks.facturacion import generar_clientes
+
+MODOS = ("detalle", "dia", "semana")
+
+
+def generar_factura(filas: int, instancias: int):
+    from models.classes.factura import Factura
+    from models.classes.detalle_factura import DetalleFactura, ConsumoFactura
+
+    inicio = datetime(2024, 1, 1)
+    detalles = []
+    for i in range(instancias):
+        consumos = [
+            ConsumoFactura(tiempo=1.0, fechaHora=(inicio + timedelta(hours=h)).strftime("%d/%m/%Y %H:%M"))
+            for h in range(filas // instancias)
+        ]
+        horas = float(len(consumos))
+        detalles.append(DetalleFactura(
+            idInstancia=0, idConfiguracion=1, horas=horas, subtotal=horas * 2.5,
+            recursos_cantidad={1: 2, 2: 4}, consumos=consumos
+        ))
+    fin = (inicio + timedelta(hours=filas // instancias)).strftime("%d/%m/%Y")
+    factura = Factura.generar("1000000-0", "01/01/2024", fin, detalles, sum(d.subtotal for d in detalles))
+    Factura.write_xml([factura])
+    return factura.id
+
+
+def medir(directorio: str, filas: int, instancias: int) -> dict:
+    os.chdir(directorio)
+    from services.factura_pdf_service import FacturaPdfService
+
+    id_factura = generar_factura(filas, instancias)
+    resultados = {}
+    for modo in MODOS:
+        ruta = f"factura_{modo}.pdf"
+        inicio = time.perf_counter()
+        FacturaPdfService(id_factura, resumen=None if modo == "detalle" else modo).generar_pdf(ruta)
+        resultados[modo] = {"tiempo": time.perf_counter() - inicio, "bytes": os.path.getsize(ruta)}
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--instancias", type=int, default=4)
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, args.filas[0], args.instancias)))
+        return
+
+    print(f"{'consumos':>10}" + "".join(f"{modo:>22}" for modo in MODOS))
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.makedirs(os.path.join(directorio, "data"))
+            generar_clientes(directorio, 1)
+            for archivo in ("recursos.xml", "categorias.xml"):
+                shutil.copy(os.path.join(RAIZ_SERVICIO, "data", archivo), os.path.join(directorio, "data", archivo))
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.factura_pdf", "--medir", directorio,
+                 "--filas", str(filas), "--instancias", str(args.instancias)],
+                cwd=RAIZ_SERVICIO, capture_output=True, text=True, check=True
+            )
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{filas:>10}" + "".join(
+            f"{r[modo]['tiempo']:>10.2f}s{r[modo]['bytes'] / 1024:>10.0f}KB" for modo in MODOS
+        ))
+
+
+if __name__ == "__main__":
+    main()
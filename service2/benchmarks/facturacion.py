@@ -0,0 +1,132 @@
+"""
+Compara los motores de facturación "python" y "numpy", en serie y repartidos en
+--procesos procesos, sobre los mismos consumos y verifica que generen exactamente
+las mismas facturas. "calculo" mide solo el armado de las facturas; "facturar"
+incluye guardarlas y marcar los consumos.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.facturacion [--grupos 2000] [--filas 500] [--procesos 4]
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from benchmarks.xml_backend import generar_datos
+
+
+def generar_clientes(directorio: str, grupos: int) -> None:
+    """
+    Un cliente por grupo de consumos de `generar_datos`, con su instancia.
+    """
+    with open(os.path.join(directorio, "data", "clientes.xml"), "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<listaClientes>\n")
+        for g in range(grupos):
+            f.write(
+                f'  <cliente nit="{1000000 + g}-{g % 10}">\n'
+                f"    <nombre>Cliente {g}</nombre>\n"
+                f"    <usuario>u{g}</usuario>\n"
+                f"    <clave>c{g}</clave>\n"
+                "    <direccion>Ciudad</direccion>\n"
+                f"    <correoElectronico>c{g}@correo.com</correoElectronico>\n"
+                "    <listaInstancias>\n"
+                f'      <instancia id="{g}">\n'
+                f"        <idConfiguracion>{g % 4 + 1}</idConfiguracion>\n"
+                f"        <nombre>Instancia {g}</nombre>\n"
+                "        <fechaInicio>01/01/2024</fechaInicio>\n"
+                "        <estado>Vigente</estado>\n"
+                "        <fechaFinal> </fechaFinal>\n"
+                "      </instancia>\n"
+                "    </listaInstancias>\n"
+                "  </cliente>\n"
+            )
+        f.write("</listaClientes>")
+
+
+def medir(directorio: str) -> dict:
+    os.chdir(directorio)
+    from services import facturacion_numpy
+    from services.facturacion_service import FacturacionService
+    from models.classes.consumo import COLUMNAS_CONSUMO
+    from models.classes.factura import Factura
+
+    import config
+    from models import bloqueo
+    from services import facturacion_paralela
+
+    # Las columnas de consumos se construyen una vez, fuera de la medición
+    COLUMNAS_CONSUMO.abrir().cerrar()
+    servicio = FacturacionService()
+    rango = ("01/01/2025", "31/01/2025", datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+    # Solo el cálculo de las facturas, sin guardarlas ni marcar los consumos
+    inicio = time.perf_counter()
+    if config.PROCESOS_FACTURACION > 1:
+        with bloqueo.escritura():
+            facturacion_paralela.generar_facturas(servicio, *rango[:2], config.PROCESOS_FACTURACION)
+    else:
+        servicio._calcular_facturas(*rango)
+    t_calculo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = servicio.facturar(*rango[:2])
+    t_facturar = time.perf_counter() - inicio
+
+    facturas = [f.to_dict() for f in Factura.get_all()]
+    for factura in facturas:
+        del factura["id"]
+    contenido = json.dumps(facturas, sort_keys=True).encode()
+    return {
+        "motor": ("numpy" if facturacion_numpy.ACTIVO else "python") + f" x{config.PROCESOS_FACTURACION}",
+        "calculo": t_calculo,
+        "facturar": t_facturar,
+        "facturas": resultado["facturas_generadas"],
+        "sha256": hashlib.sha256(contenido).hexdigest(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grupos", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=500)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir)))
+        return
+
+    resultados = []
+    for motor, procesos in (("python", 1), ("numpy", 1), ("python", args.procesos), ("numpy", args.procesos)):
+        with tempfile.TemporaryDirectory() as directorio:
+            generar_datos(directorio, args.grupos, args.filas)
+            generar_clientes(directorio, args.grupos)
+            for archivo in ("recursos.xml", "categorias.xml"):
+                shutil.copy(os.path.join(RAIZ_SERVICIO, "data", archivo), os.path.join(directorio, "data", archivo))
+            env = dict(os.environ, SERVICE2_MOTOR_FACTURACION=motor, SERVICE2_PROCESOS_FACTURACION=str(procesos))
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.facturacion", "--medir", directorio],
+                cwd=RAIZ_SERVICIO, env=env, capture_output=True, text=True, check=True
+            )
+            resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    print(f"consumos: {args.grupos * args.filas} filas en {args.grupos} instancias")
+    print(f"{'motor':<14}{'facturas':>10}{'calculo':>14}{'facturar':>14}")
+    for r in resultados:
+        print(f"{r['motor']:<14}{r['facturas']:>10}{r['calculo']:>13.3f}s{r['facturar']:>13.3f}s")
+    print("facturas idénticas:", "sí" if len({r["sha256"] for r in resultados}) == 1 else "NO")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Costo de una facturación periódica según el tamaño del historial de consumos. Con el
+historial de enero ya facturado se anexan --nuevas filas de febrero y se factura
+febrero: el tiempo depende de las filas nuevas y no de las de enero, y consumos.xml
+no se reescribe.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.facturacion_incremental [--grupos 500] [--historial 100 400 1600] [--nuevas 2]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from benchmarks.xml_backend import generar_datos
+from benchmarks.facturacion import generar_clientes
+
+
+def medir(directorio: str, grupos: int, nuevas: int) -> dict:
+    os.chdir(directorio)
+    from models.classes.consumo import GrupoConsumos, Consumo, RUTA_CONSUMOS
+    from models.repositorio import RepositorioXml
+    from services.facturacion_service import FacturacionService
+
+    servicio = FacturacionService()
+    # Historial ya facturado; las columnas se construyen aquí, fuera de la medición
+    servicio.facturar("01/01/2025", "31/01/2025")
+
+    lote = []
+    for g in range(grupos):
+        grupo = GrupoConsumos(nitCliente=f"{1000000 + g}-{g % 10}", idInstancia=g)
+        grupo.consumos = [Consumo(1.5, f"{i % 28 + 1:02d}/02/2025 08:00") for i in range(nuevas)]
+        lote.append(grupo)
+    GrupoConsumos.append_xml(lote)
+
+    firma = RepositorioXml.firma(RUTA_CONSUMOS)
+    inicio = time.perf_counter()
+    resultado = servicio.facturar("01/02/2025", "28/02/2025")
+    transcurrido = time.perf_counter() - inicio
+    return {
+        "facturar": transcurrido,
+        "facturas": resultado["facturas_generadas"],
+        "reescrito": RepositorioXml.firma(RUTA_CONSUMOS) != firma,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grupos", type=int, default=500)
+    parser.add_argument("--historial", type=int, nargs="+", default=[100, 400, 1600])
+    parser.add_argument("--nuevas", type=int, default=2)
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, args.grupos, args.nuevas)))
+        return
+
+    print(f"{'historial':>12}{'nuevas':>10}{'facturas':>10}{'facturar':>12}{'consumos.xml':>14}")
+    for filas in args.historial:
+        with tempfile.TemporaryDirectory() as directorio:
+            generar_datos(directorio, args.grupos, filas)
+            generar_clientes(directorio, args.grupos)
+            for archivo in ("recursos.xml", "categorias.xml"):
+                shutil.copy(os.path.join(RAIZ_SERVICIO, "data", archivo), os.path.join(directorio, "data", archivo))
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.facturacion_incremental", "--medir", directorio,
+                 "--grupos", str(args.grupos), "--nuevas", str(args.nuevas)],
+                cwd=RAIZ_SERVICIO, capture_output=True, text=True, check=True
+            )
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{args.grupos * filas:>12}{args.grupos * args.nuevas:>10}{r['facturas']:>10}"
+              f"{r['facturar']:>11.3f}s{'reescrito' if r['reescrito'] else 'intacto':>14}")
+
+
+if __name__ == "__main__":
+    main()
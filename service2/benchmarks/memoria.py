@@ -0,0 +1,96 @@
+"""
+Mide la memoria que ocupan los consumos cargados de un consumos.xml grande con las
+clases del modelo (con __slots__) y con clases equivalentes con __dict__ por
+instancia, como eran antes. Reporta bytes por fila y MB por millón de filas.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.memoria [--grupos 2000] [--filas 500]
+"""
+from __future__ import annotations
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from benchmarks.xml_backend import generar_datos
+
+
+class _FechaHoraDict:
+    def __init__(self, valor: str):
+        self.valor = valor
+
+
+class _ConsumoDict:
+    def __init__(self, tiempo: float, fechaHora: str, facturado: bool):
+        self.tiempo = tiempo
+        self.fechaHora = _FechaHoraDict(fechaHora)
+        self.facturado = facturado
+
+
+class _GrupoDict:
+    def __init__(self, nitCliente: str, idInstancia: int):
+        self.nitCliente = nitCliente
+        self.idInstancia = idInstancia
+        self.consumos = []
+
+
+def parsear_con_dict(ruta: str) -> list:
+    from models.xml_backend import ET
+
+    grupos = []
+    for el in ET.parse(ruta).getroot().findall("grupoConsumos"):
+        grupo = _GrupoDict(el.attrib["nitCliente"], int(el.attrib["idInstancia"]))
+        for consumo_el in el.findall("consumo"):
+            grupo.consumos.append(_ConsumoDict(
+                float(consumo_el.find("tiempo").text),
+                consumo_el.find("fechaHora").text.strip(),
+                consumo_el.get("facturado", "false").lower() == "true",
+            ))
+        grupos.append(grupo)
+    return grupos
+
+
+def medir(parsear, ruta: str) -> int:
+    """
+    Bytes retenidos por los objetos que retorna `parsear(ruta)`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    objetos = parsear(ruta)
+    gc.collect()
+    retenidos = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    del objetos
+    return retenidos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grupos", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=500)
+    args = parser.parse_args()
+    filas = args.grupos * args.filas
+
+    with tempfile.TemporaryDirectory() as directorio:
+        generar_datos(directorio, args.grupos, args.filas)
+        os.chdir(directorio)
+        from models.classes.consumo import GrupoConsumos, RUTA_CONSUMOS
+
+        print(f"{'modelo':<14}{'filas':>10}{'bytes/fila':>14}{'MB/millón':>12}")
+        resultados = {}
+        for nombre, parsear in (("__dict__", parsear_con_dict), ("__slots__", GrupoConsumos._parsear_xml)):
+            resultados[nombre] = medir(parsear, RUTA_CONSUMOS)
+            por_fila = resultados[nombre] / filas
+            print(f"{nombre:<14}{filas:>10}{por_fila:>14.1f}{por_fila * 1_000_000 / 2**20:>12.1f}")
+        ahorro = 1 - resultados["__slots__"] / resultados["__dict__"]
+        print(f"ahorro: {ahorro:.0%}")
+
+
+if __name__ == "__main__":
+    main()
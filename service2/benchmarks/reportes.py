@@ -0,0 +1,122 @@
+"""
+Latencia de los datos de los reportes 1 y 2 (POST /reporte/<id>) según la cantidad
+de facturas guardadas, para un rango fijo de --dias días. Los reportes leen los
+ingresos acumulados por día, así el tiempo depende de los días del rango y no de las
+facturas. También verifica que los totales coincidan con recorrer las facturas.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.reportes [--facturas 1000 10000 100000] [--dias 30]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+# Días de emisión de las facturas generadas (un año)
+DIAS_HISTORIAL = 365
+LOTE = 5000
+
+
+def generar_facturas(cantidad: int) -> None:
+    """
+    Guarda `cantidad` facturas repartidas en el año 2024, en lotes como la facturación.
+    """
+    from models.classes.factura import Factura
+    from models.classes.detalle_factura import DetalleFactura
+
+    inicio = date(2024, 1, 1)
+    for lote in range(0, cantidad, LOTE):
+        facturas = []
+        for i in range(lote, min(lote + LOTE, cantidad)):
+            fecha = (inicio + timedelta(days=i % DIAS_HISTORIAL)).strftime("%d/%m/%Y")
+            detalles = []
+            for d in range(3):
+                recursos = {(i + d) % 10 + 1: 2, 1: 1}
+                detalles.append(DetalleFactura(
+                    idInstancia=d, idConfiguracion=(i + d) % 6 + 1, horas=1.5 + d, subtotal=10.0 + (i % 7) + d,
+                    recursos_cantidad=recursos,
+                    recursos_monto={rid: cantidad * 0.75 * (1.5 + d) for rid, cantidad in recursos.items()},
+                    idCategoria=(i + d) % 3 + 1
+                ))
+            facturas.append(Factura.generar(f"{1000000 + i}-0", fecha, fecha, detalles,
+                                            sum(d.subtotal for d in detalles)))
+        Factura.write_xml(facturas)
+
+
+def recorrer_facturas(fecha_inicio: datetime, fecha_fin: datetime):
+    """
+    Totales calculados recorriendo las facturas del rango, para comparar.
+    """
+    from models.classes.factura import Factura
+    from models.classes.ingreso_diario import IngresoDiario
+
+    totales = {}
+    for (_, tipo, id_), monto in IngresoDiario.calcular(Factura.get_by_rango(fecha_inicio, fecha_fin)).items():
+        totales[(tipo, id_)] = totales.get((tipo, id_), 0.0) + monto
+    return totales
+
+
+def medir(directorio: str, facturas: int, dias: int) -> dict:
+    os.chdir(directorio)
+    from services.reporte_service import ReporteService
+
+    generar_facturas(facturas)
+    fecha_inicio = date(2024, 3, 1)
+    rango = (fecha_inicio.strftime("%d/%m/%Y"), (fecha_inicio + timedelta(days=dias - 1)).strftime("%d/%m/%Y"))
+
+    servicio = ReporteService(*rango)
+    servicio._generar_datos_reporte1(None)  # primera lectura del acumulado, fuera de la medición
+    repeticiones = 20
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        categorias, configuraciones = servicio._generar_datos_reporte1(None)
+        recursos = servicio._generar_datos_reporte2(None)
+    transcurrido = (time.perf_counter() - inicio) / repeticiones
+
+    obtenidos = {("categoria", k): v for k, v in categorias}
+    obtenidos.update({("configuracion", k): v for k, v in configuraciones})
+    obtenidos.update({("recurso", k): v for k, v in recursos})
+    esperados = recorrer_facturas(servicio.fecha_inicio, servicio.fecha_fin)
+    iguales = obtenidos.keys() == esperados.keys() and all(
+        abs(obtenidos[k] - esperados[k]) < 1e-6 * max(1.0, abs(esperados[k])) for k in esperados
+    )
+    return {"reportes": transcurrido, "iguales": iguales}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--facturas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, args.facturas[0], args.dias)))
+        return
+
+    print(f"{'facturas':>10}{'dias':>6}{'reportes 1 y 2':>16}{'totales':>10}")
+    for facturas in args.facturas:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.makedirs(os.path.join(directorio, "data"))
+            for archivo in ("recursos.xml", "categorias.xml"):
+                shutil.copy(os.path.join(RAIZ_SERVICIO, "data", archivo), os.path.join(directorio, "data", archivo))
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.reportes", "--medir", directorio,
+                 "--facturas", str(facturas), "--dias", str(args.dias)],
+                cwd=RAIZ_SERVICIO, capture_output=True, text=True, check=True
+            )
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{facturas:>10}{args.dias:>6}{r['reportes'] * 1000:>14.2f}ms{'iguales' if r['iguales'] else 'DISTINTOS':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compara el arranque en frío de consumos.xml y clientes.xml grandes: parseo y
+validación del XML contra la carga de su instantánea binaria (.snap).
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.snapshot [--grupos 2000] [--filas 200] [--clientes 20000]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from benchmarks.xml_backend import generar_datos
+
+
+def generar_clientes(directorio: str, clientes: int) -> None:
+    with open(os.path.join(directorio, "data", "clientes.xml"), "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<listaClientes>\n")
+        for c in range(clientes):
+            f.write(
+                f'  <cliente nit="{1000000 + c}-{c % 10}">\n'
+                f"    <nombre>Cliente {c}</nombre>\n"
+                f"    <usuario>u{c}</usuario>\n"
+                f"    <clave>c{c}</clave>\n"
+                "    <direccion>Ciudad</direccion>\n"
+                f"    <correoElectronico>c{c}@correo.com</correoElectronico>\n"
+                "    <listaInstancias>\n"
+            )
+            for i in range(3):
+                f.write(
+                    f'      <instancia id="{c * 3 + i}">\n'
+                    "        <idConfiguracion>1</idConfiguracion>\n"
+                    f"        <nombre>Instancia {i}</nombre>\n"
+                    "        <fechaInicio>01/01/2024</fechaInicio>\n"
+                    "        <estado>Vigente</estado>\n"
+                    "        <fechaFinal> </fechaFinal>\n"
+                    "      </instancia>\n"
+                )
+            f.write("    </listaInstancias>\n  </cliente>\n")
+        f.write("</listaClientes>")
+
+
+def medir(ruta: str, parsear) -> dict:
+    from models import snapshot
+
+    inicio = time.perf_counter()
+    objetos = parsear(ruta)
+    t_parseo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    snapshot.guardar(ruta, objetos)
+    t_guardar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cargados = snapshot.cargar(ruta)
+    t_cargar = time.perf_counter() - inicio
+    assert cargados is not None and len(cargados) == len(objetos)
+
+    return {
+        "objetos": len(objetos),
+        "parseo": t_parseo,
+        "guardar_snapshot": t_guardar,
+        "cargar_snapshot": t_cargar,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grupos", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=200)
+    parser.add_argument("--clientes", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        generar_datos(directorio, args.grupos, args.filas)
+        generar_clientes(directorio, args.clientes)
+        os.chdir(directorio)
+        from models.classes.consumo import GrupoConsumos, RUTA_CONSUMOS
+        from models.classes.cliente import Cliente, RUTA_CLIENTES
+
+        columnas = ["parseo", "guardar_snapshot", "cargar_snapshot"]
+        print(f"{'archivo':<14}{'objetos':>10}" + "".join(f"{c:>20}" for c in columnas) + f"{'mejora':>10}")
+        for ruta, parsear in ((RUTA_CONSUMOS, GrupoConsumos._parsear_xml), (RUTA_CLIENTES, Cliente._parsear_xml)):
+            r = medir(ruta, parsear)
+            print(
+                f"{os.path.basename(ruta):<14}{r['objetos']:>10}"
+                + "".join(f"{r[c]:>19.3f}s" for c in columnas)
+                + f"{r['parseo'] / r['cargar_snapshot']:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
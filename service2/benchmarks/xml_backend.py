@@ -0,0 +1,92 @@
+"""
+Compara los backends XML (etree y lxml) sobre un consumos.xml grande.
+
+Uso (desde la carpeta service2):
+    python -m benchmarks.xml_backend [--grupos 2000] [--filas 200]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generar_datos(directorio: str, grupos: int, filas: int) -> None:
+    os.makedirs(os.path.join(directorio, "data"), exist_ok=True)
+    with open(os.path.join(directorio, "data", "consumos.xml"), "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<listadoConsumos>\n")
+        for g in range(grupos):
+            f.write(f'  <grupoConsumos nitCliente="{1000000 + g}-{g % 10}" idInstancia="{g}">\n')
+            for i in range(filas):
+                dia = i % 28 + 1
+                hora = i % 24
+                f.write(
+                    '    <consumo facturado="false">\n'
+                    f"      <tiempo>{(i % 7) + 0.25}</tiempo>\n"
+                    f"      <fechaHora>{dia:02d}/01/2025 {hora:02d}:00</fechaHora>\n"
+                    "    </consumo>\n"
+                )
+            f.write("  </grupoConsumos>\n")
+        f.write("</listadoConsumos>")
+
+
+def medir(directorio: str) -> dict:
+    sys.path.insert(0, RAIZ_SERVICIO)
+    os.chdir(directorio)
+    from models.xml_backend import BACKEND
+    from models.classes.consumo import GrupoConsumos, RUTA_CONSUMOS
+
+    tiempos = {"backend": BACKEND}
+
+    inicio = time.perf_counter()
+    grupos = GrupoConsumos._leer_xml(RUTA_CONSUMOS)
+    tiempos["parse_completo"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    filas = sum(1 for _ in GrupoConsumos.iterar_consumos())
+    tiempos["iterparse"] = time.perf_counter() - inicio
+    tiempos["filas"] = filas
+
+    inicio = time.perf_counter()
+    GrupoConsumos.write_xml(grupos)
+    tiempos["escritura_completa"] = time.perf_counter() - inicio
+    return tiempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grupos", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=200)
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir)))
+        return
+
+    resultados = []
+    for backend in ("etree", "lxml"):
+        with tempfile.TemporaryDirectory() as directorio:
+            generar_datos(directorio, args.grupos, args.filas)
+            tamano = os.path.getsize(os.path.join(directorio, "data", "consumos.xml"))
+            env = dict(os.environ, SERVICE2_XML_BACKEND=backend, SERVICE2_SNAPSHOTS="0")
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.xml_backend", "--medir", directorio],
+                cwd=RAIZ_SERVICIO, env=env, capture_output=True, text=True, check=True
+            )
+            resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    print(f"consumos.xml: {tamano / 1024 / 1024:.1f} MB, {resultados[0]['filas']} filas")
+    columnas = ["parse_completo", "iterparse", "escritura_completa"]
+    print(f"{'backend':<10}" + "".join(f"{c:>26}" for c in columnas))
+    for r in resultados:
+        print(f"{r['backend']:<10}" + "".join(f"{r[c]:>25.3f}s" for c in columnas))
+
+
+if __name__ == "__main__":
+    main()
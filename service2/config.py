@@ -0,0 +1,57 @@
+import os
+
+# Máximo de objetos (filas de los archivos XML) que el repositorio mantiene en memoria
+# antes de desalojar las entradas menos usadas.
+REPOSITORIO_MAX_ELEMENTOS = int(os.environ.get("SERVICE2_CACHE_MAX_ELEMENTOS", "500000"))
+
+# Tamaño a partir del cual la bitácora de consumos se integra en consumos.xml
+BITACORA_MAX_BYTES = int(os.environ.get("SERVICE2_BITACORA_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Consumos por lote al procesar un archivo de carga: la memoria de una carga depende
+# de este tamaño y no del tamaño del archivo
+LOTE_CARGA_CONSUMOS = max(1, int(os.environ.get("SERVICE2_LOTE_CARGA_CONSUMOS", "10000")))
+
+# Backend XML de la capa de modelos: "etree" (librería estándar, por defecto) o "lxml"
+XML_BACKEND = os.environ.get("SERVICE2_XML_BACKEND", "etree").lower()
+
+# Motor de almacenamiento de los modelos: "xml" (archivos en data/, por defecto) o
+# "sqlite" (tablas indexadas en RUTA_SQLITE; XML queda como formato de carga/exportación)
+ALMACENAMIENTO = os.environ.get("SERVICE2_ALMACENAMIENTO", "xml").lower()
+RUTA_SQLITE = os.environ.get("SERVICE2_RUTA_SQLITE", "data/service2.db")
+
+# Ventana (ms) de la cola de escritura: las altas de recursos, categorías, clientes e
+# instancias que llegan en ráfaga, con menos de esta separación, se agrupan en una sola
+# reescritura del archivo; un alta sola se escribe sin esperar
+COLA_ESCRITURA_VENTANA_MS = float(os.environ.get("SERVICE2_COLA_VENTANA_MS", "10"))
+
+# Motor de cálculo de la facturación: "python" (por defecto) o "numpy" (vectorizado,
+# requiere numpy; genera las mismas facturas)
+MOTOR_FACTURACION = os.environ.get("SERVICE2_MOTOR_FACTURACION", "python").lower()
+
+# Procesos para facturar en paralelo, repartiendo los clientes por NIT; 1 factura en
+# el proceso de la petición
+PROCESOS_FACTURACION = max(1, int(os.environ.get("SERVICE2_PROCESOS_FACTURACION", "1")))
+
+# Cola de los trabajos en segundo plano (POST /factura y /reporte/<id> con
+# ?asincrono=1): "memoria" (del proceso, por defecto) o "sqlite" (compartida entre los
+# procesos del servicio, en RUTA_TRABAJOS)
+COLA_TRABAJOS = os.environ.get("SERVICE2_COLA_TRABAJOS", "memoria").lower()
+RUTA_TRABAJOS = os.environ.get("SERVICE2_RUTA_TRABAJOS", "data/trabajos.db")
+# Hilos de cada proceso que ejecutan los trabajos
+TRABAJOS_HILOS = max(1, int(os.environ.get("SERVICE2_TRABAJOS_HILOS", "2")))
+# Segundos que se conservan el estado y el resultado de un trabajo terminado
+TRABAJOS_TTL = float(os.environ.get("SERVICE2_TRABAJOS_TTL", "3600"))
+# Segundos sin latido tras los que un trabajo en proceso de la cola sqlite se
+# considera abandonado (su proceso terminó o se colgó) y vuelve a la cola
+TRABAJOS_LATIDO_MAX = float(os.environ.get("SERVICE2_TRABAJOS_LATIDO_MAX", "60"))
+
+# Tamaño máximo en disco de la caché de PDF de facturas (data/pdfs/facturas); al
+# superarlo se eliminan los menos usados
+PDF_CACHE_MAX_BYTES = int(os.environ.get("SERVICE2_PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Procesos que generan los PDF de POST /facturas/exportar
+PROCESOS_PDF = max(1, int(os.environ.get("SERVICE2_PROCESOS_PDF", str(os.cpu_count() or 1))))
+
+# Instantáneas binarias (.snap) de los objetos de cada archivo XML para evitar el
+# parseo y la validación en arranques en frío
+SNAPSHOTS = os.environ.get("SERVICE2_SNAPSHOTS", "1") != "0"
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Sequence
+import os
+import sqlite3
+import threading
+import config
+
+# Las tablas conservan la semántica de lista de los archivos XML: el orden es el de
+# inserción (rowid) y los identificadores no se declaran únicos. Los hijos referencian
+# al padre por su rowid. Los identificadores de instancias y facturas se generan con
+# uuid y no caben en un INTEGER de SQLite (64 bits con signo), por eso se guardan como TEXT.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recursos (
+    id INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    abreviatura TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    valorXhora REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recursos_id ON recursos(id);
+
+CREATE TABLE IF NOT EXISTS categorias (
+    id INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    descripcion TEXT NOT NULL,
+    cargaTrabajo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_categorias_id ON categorias(id);
+
+CREATE TABLE IF NOT EXISTS configuraciones (
+    categoria INTEGER NOT NULL, -- rowid de categorias
+    id INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    descripcion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_configuraciones_categoria ON configuraciones(categoria);
+CREATE INDEX IF NOT EXISTS idx_configuraciones_id ON configuraciones(id);
+
+CREATE TABLE IF NOT EXISTS configuracion_recursos (
+    configuracion INTEGER NOT NULL, -- rowid de configuraciones
+    idRecurso INTEGER NOT NULL,
+    cantidad REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_configuracion_recursos ON configuracion_recursos(configuracion);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    nit TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    usuario TEXT,
+    clave TEXT,
+    direccion TEXT,
+    correoElectronico TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_clientes_nit ON clientes(nit);
+
+CREATE TABLE IF NOT EXISTS instancias (
+    cliente INTEGER NOT NULL, -- rowid de clientes
+    id TEXT NOT NULL,
+    idConfiguracion INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    fechaInicio TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    fechaFinal TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_instancias_cliente ON instancias(cliente);
+
+CREATE TABLE IF NOT EXISTS consumos (
+    nitCliente TEXT NOT NULL,
+    idInstancia TEXT NOT NULL,
+    tiempo REAL NOT NULL,
+    fechaHora TEXT NOT NULL,
+    fechaOrden INTEGER NOT NULL, -- AAAAMMDDHHMM
+    facturado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_consumos_instancia ON consumos(nitCliente, idInstancia, fechaOrden);
+
+CREATE TABLE IF NOT EXISTS facturas (
+    id TEXT PRIMARY KEY,
+    nitCliente TEXT NOT NULL,
+    fechaEmision TEXT NOT NULL,
+    fechaOrden INTEGER NOT NULL, -- AAAAMMDD
+    xml TEXT NOT NULL -- elemento <factura> con sus detalles
+);
+CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas(fechaOrden);
+CREATE INDEX IF NOT EXISTS idx_facturas_cliente ON facturas(nitCliente);
+
+-- Ingresos facturados por día de emisión (ver models/classes/ingreso_diario.py)
+CREATE TABLE IF NOT EXISTS ingresos_diarios (
+    fechaOrden INTEGER NOT NULL, -- AAAAMMDD
+    fecha TEXT NOT NULL,
+    tipo TEXT NOT NULL, -- configuracion | categoria | recurso
+    id INTEGER NOT NULL,
+    monto REAL NOT NULL,
+    PRIMARY KEY (fechaOrden, tipo, id)
+);
+-- Facturas que incluyen los ingresos_diarios (una sola fila)
+CREATE TABLE IF NOT EXISTS ingresos_cobertura (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    facturas INTEGER NOT NULL
+);
+"""
+
+TABLAS = [
+    "ingresos_diarios", "ingresos_cobertura", "consumos", "facturas", "instancias", "clientes",
+    "configuracion_recursos", "configuraciones", "categorias", "recursos",
+]
+
+_local = threading.local()
+
+
+def activo() -> bool:
+    """
+    Indica si el motor de almacenamiento configurado es SQLite.
+    """
+    return config.ALMACENAMIENTO == "sqlite"
+
+
+def conexion() -> sqlite3.Connection:
+    """
+    Conexión del hilo actual (sqlite3 no permite compartirlas entre hilos). Las
+    transacciones se manejan explícitamente con `transaccion()`.
+    """
+    conn = getattr(_local, "conexion", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.RUTA_SQLITE) or ".", exist_ok=True)
+        conn = sqlite3.connect(config.RUTA_SQLITE, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(ESQUEMA)
+        _local.conexion = conn
+    return conn
+
+
+@contextmanager
+def transaccion() -> Iterator[sqlite3.Connection]:
+    """
+    Ejecuta el bloque dentro de una transacción de escritura (BEGIN IMMEDIATE). Dentro
+    de otra transacción del mismo hilo el bloque forma parte de ésta: se confirma o se
+    revierte con la exterior.
+    """
+    conn = conexion()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def consultar(sql: str, parametros: Sequence[Any] = ()) -> List[tuple]:
+    return conexion().execute(sql, parametros).fetchall()
+
+
+def iterar(sql: str, parametros: Sequence[Any] = ()) -> Iterator[tuple]:
+    """
+    Recorre el resultado fila por fila sin materializarlo.
+    """
+    yield from conexion().execute(sql, parametros)
+
+
+def vaciar() -> None:
+    with transaccion() as conn:
+        for tabla in TABLAS:
+            conn.execute(f"DELETE FROM {tabla}")
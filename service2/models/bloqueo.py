@@ -0,0 +1,138 @@
+"""
+Protocolo lector/escritor sobre el directorio data/ para varios procesos (p.ej. varios
+workers de gunicorn) y varios hilos.
+
+- `lectura()` toma un bloqueo compartido (flock LOCK_SH) sobre data/.lock: los
+  lectores no se bloquean entre sí, solo esperan a un escritor activo.
+- `escritura()` toma el bloqueo exclusivo (LOCK_EX) para todo un ciclo
+  leer-modificar-escribir, que puede abarcar varios archivos.
+- Cada archivo se escribe en un temporal, se sincroniza y se renombra sobre el
+  original (`archivo_temporal`, `escribir_arbol`), así que ningún lector ve un
+  archivo a medio escribir.
+
+Ambos bloqueos son reentrantes por hilo; pedir escritura mientras el hilo tiene
+lectura convierte el bloqueo a exclusivo hasta salir del bloque de escritura.
+
+Los procesos auxiliares que trabajan mientras su proceso padre tiene el bloqueo
+exclusivo (la facturación en paralelo) llaman a `bajo_bloqueo_del_padre()`: esperar
+el bloqueo los dejaría esperando al padre, que a su vez los espera a ellos.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Iterator
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se sincronizan los hilos del proceso
+    fcntl = None
+
+RUTA_BLOQUEO = "data/.lock"
+
+COMPARTIDO = "compartido"
+EXCLUSIVO = "exclusivo"
+
+
+class _EstadoHilo(threading.local):
+    def __init__(self):
+        self.fd = None
+        self.modos = []
+
+
+_estado = _EstadoHilo()
+_lock_local = threading.RLock()
+_bajo_padre = False
+
+
+def bajo_bloqueo_del_padre() -> None:
+    """
+    Marca el proceso actual como auxiliar de un proceso que tiene el bloqueo exclusivo
+    durante toda su vida: desde aquí `lectura()` y `escritura()` no bloquean.
+    """
+    global _bajo_padre
+    _bajo_padre = True
+
+
+def _bloquear(modo: str) -> None:
+    if fcntl is not None:
+        fcntl.flock(_estado.fd, fcntl.LOCK_EX if modo == EXCLUSIVO else fcntl.LOCK_SH)
+    elif modo == EXCLUSIVO:
+        _lock_local.acquire()
+
+
+def _adquirir(modo: str) -> None:
+    modos = _estado.modos
+    if not modos:
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(RUTA_BLOQUEO), exist_ok=True)
+            _estado.fd = os.open(RUTA_BLOQUEO, os.O_RDWR | os.O_CREAT, 0o644)
+        _bloquear(modo)
+    elif modo == EXCLUSIVO and EXCLUSIVO not in modos:
+        _bloquear(EXCLUSIVO)
+    modos.append(modo)
+
+
+def _liberar() -> None:
+    modos = _estado.modos
+    modo = modos.pop()
+    if fcntl is None:
+        if modo == EXCLUSIVO and EXCLUSIVO not in modos:
+            _lock_local.release()
+        return
+    if not modos:
+        fcntl.flock(_estado.fd, fcntl.LOCK_UN)
+        os.close(_estado.fd)
+        _estado.fd = None
+    elif modo == EXCLUSIVO and EXCLUSIVO not in modos:
+        _bloquear(COMPARTIDO)
+
+
+@contextmanager
+def lectura() -> Iterator[None]:
+    if _bajo_padre:
+        yield
+        return
+    _adquirir(COMPARTIDO)
+    try:
+        yield
+    finally:
+        _liberar()
+
+
+@contextmanager
+def escritura() -> Iterator[None]:
+    if _bajo_padre:
+        yield
+        return
+    _adquirir(EXCLUSIVO)
+    try:
+        yield
+    finally:
+        _liberar()
+
+
+@contextmanager
+def archivo_temporal(ruta: str) -> Iterator[str]:
+    """
+    Entrega una ruta temporal junto a `ruta`. Al salir sin errores el temporal se
+    sincroniza en disco y reemplaza atómicamente a `ruta`; si hubo un error se elimina.
+    """
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temporal
+        with open(temporal, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def escribir_arbol(tree, ruta: str) -> None:
+    """
+    Escribe un ElementTree con declaración XML de forma atómica.
+    """
+    with archivo_temporal(str(ruta)) as temporal:
+        tree.write(temporal, encoding="utf-8", xml_declaration=True)
@@ -2,7 +2,11 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from models.classes.configuracion import Configuracion
-import xml.etree.ElementTree as ET
+from models.xml_backend import ET
+from models.repositorio import repositorio
+from models import almacen_sqlite, bloqueo, cola_escritura, snapshot
+
+RUTA_CATEGORIAS = "data/categorias.xml"
 
 @dataclass
 class Categoria:
@@ -55,24 +59,31 @@ class Categoria:
 
     @staticmethod
     def write_xml(categorias: List[Categoria]):
+        if almacen_sqlite.activo():
+            return Categoria._sqlite_reemplazar(categorias)
+        Categoria._escribir_xml(categorias)
+
+    @staticmethod
+    def _escribir_xml(categorias: List[Categoria]):
         root = ET.Element("listaCategorias")
         for categoria in categorias:
             root.append(categoria.to_xml_element())
 
         tree = ET.ElementTree(root)
         ET.indent(tree, space="  ", level=0)
-        tree.write("data/categorias.xml", encoding="utf-8", xml_declaration=True)
+        with bloqueo.escritura():
+            try:
+                bloqueo.escribir_arbol(tree, RUTA_CATEGORIAS)
+                snapshot.guardar(RUTA_CATEGORIAS, categorias)
+            finally:
+                repositorio.invalidar(RUTA_CATEGORIAS)
 
     @staticmethod
     def get_all() -> List[Categoria]:
         try:
-            tree = ET.parse("data/categorias.xml")
-            root = tree.getroot()
-            categorias = []
-            for cat_el in root.findall("categoria"):
-                cat = Categoria.from_element(cat_el)
-                categorias.append(cat)
-            return categorias
+            if almacen_sqlite.activo():
+                return Categoria._sqlite_leer()
+            return list(repositorio.obtener(RUTA_CATEGORIAS, Categoria._leer_xml))
         except Exception as e:
             print(f"Error inesperado al leer categorias.xml: {e}")
             return []
@@ -84,17 +95,7 @@ class Categoria:
         Carga todas las categorias y devuelve un diccionario
         {id_categoria: diccionario}.
         """
-        try:
-            tree = ET.parse("data/categorias.xml")
-            root = tree.getroot()
-            categorias = {}
-            for cat_el in root.findall("categoria"):
-                cat = Categoria.from_element(cat_el)
-                categorias[cat.id] = cat.to_dict()
-            return categorias
-        except Exception as e:
-            print(f"Error inesperado al leer categorias.xml: {e}")
-            return {}
+        return {cat.id: cat.to_dict() for cat in Categoria.get_all()}
 
 
     @staticmethod
@@ -104,31 +105,113 @@ class Categoria:
         {id_configuracion: Configuracion}.
         """
         try:
-            tree = ET.parse("data/categorias.xml")
-            root = tree.getroot()
-            configs = {}
-            for cat_el in root.findall("categoria"):
-                cat = Categoria.from_element(cat_el)
-                for conf in cat.configuraciones:
-                    configs[conf.id] = conf
-            return configs
+            if almacen_sqlite.activo():
+                return {conf.id: conf for cat in Categoria._sqlite_leer() for conf in cat.configuraciones}
+            return dict(repositorio.obtener(RUTA_CATEGORIAS, Categoria._leer_configuraciones_xml, "configuraciones"))
         except Exception as e:
             print(f"Error inesperado al leer categorias.xml: {e}")
             return {}
 
+    @staticmethod
+    def _leer_xml(ruta: str) -> List[Categoria]:
+        return snapshot.leer(ruta, Categoria._parsear_xml)
+
+    @staticmethod
+    def _parsear_xml(ruta: str) -> List[Categoria]:
+        tree = ET.parse(ruta)
+        root = tree.getroot()
+        return [Categoria.from_element(cat_el) for cat_el in root.findall("categoria")]
+
+    @staticmethod
+    def _leer_configuraciones_xml(ruta: str) -> Dict[int, Configuracion]:
+        configs = {}
+        for cat in repositorio.obtener(ruta, Categoria._leer_xml):
+            for conf in cat.configuraciones:
+                configs[conf.id] = conf
+        return configs
+
     @staticmethod
     def add_categoria(nombre: str, descripcion: str, cargaTrabajo: str) -> None:
-        categorias = Categoria.get_all()
-        new_id = 100 + len(categorias) + 1
-        nueva_categoria = Categoria(
-            id=new_id,
-            nombre=nombre,
-            descripcion=descripcion,
-            cargaTrabajo=cargaTrabajo,
-            configuraciones=[]
-        )
-        categorias.append(nueva_categoria)
-        Categoria.write_xml(categorias)
+        if almacen_sqlite.activo():
+            return Categoria._sqlite_agregar(nombre, descripcion, cargaTrabajo)
+
+        def agregar(categorias: List[Categoria]) -> None:
+            new_id = 100 + len(categorias) + 1
+            nueva_categoria = Categoria(
+                id=new_id,
+                nombre=nombre,
+                descripcion=descripcion,
+                cargaTrabajo=cargaTrabajo,
+                configuraciones=[]
+            )
+            categorias.append(nueva_categoria)
+
+        cola_escritura.aplicar(RUTA_CATEGORIAS, Categoria.get_all, Categoria.write_xml, agregar)
+
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_leer() -> List[Categoria]:
+        categorias: Dict[int, Categoria] = {}
+        for fila, id_, nombre, descripcion, carga in almacen_sqlite.iterar(
+            "SELECT rowid, id, nombre, descripcion, cargaTrabajo FROM categorias ORDER BY rowid"
+        ):
+            categorias[fila] = Categoria(id=id_, nombre=nombre, descripcion=descripcion, cargaTrabajo=carga)
+
+        configuraciones: Dict[int, Configuracion] = {}
+        for fila, categoria, id_, nombre, descripcion in almacen_sqlite.iterar(
+            "SELECT rowid, categoria, id, nombre, descripcion FROM configuraciones ORDER BY rowid"
+        ):
+            conf = Configuracion(id=id_, nombre=nombre, descripcion=descripcion)
+            configuraciones[fila] = conf
+            if categoria in categorias:
+                categorias[categoria].configuraciones.append(conf)
+
+        for configuracion, id_recurso, cantidad in almacen_sqlite.iterar(
+            "SELECT configuracion, idRecurso, cantidad FROM configuracion_recursos ORDER BY rowid"
+        ):
+            if configuracion in configuraciones:
+                configuraciones[configuracion].recursos[id_recurso] = cantidad
+
+        return list(categorias.values())
+
+    @staticmethod
+    def _sqlite_insertar(conn, categoria: Categoria) -> None:
+        fila_categoria = conn.execute(
+            "INSERT INTO categorias (id, nombre, descripcion, cargaTrabajo) VALUES (?, ?, ?, ?)",
+            (categoria.id, categoria.nombre, categoria.descripcion, categoria.cargaTrabajo)
+        ).lastrowid
+        for conf in categoria.configuraciones:
+            fila_conf = conn.execute(
+                "INSERT INTO configuraciones (categoria, id, nombre, descripcion) VALUES (?, ?, ?, ?)",
+                (fila_categoria, conf.id, conf.nombre, conf.descripcion)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO configuracion_recursos (configuracion, idRecurso, cantidad) VALUES (?, ?, ?)",
+                [(fila_conf, rid, cantidad) for rid, cantidad in conf.recursos.items()]
+            )
+
+    @staticmethod
+    def _sqlite_reemplazar(categorias: List[Categoria]) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            conn.execute("DELETE FROM configuracion_recursos")
+            conn.execute("DELETE FROM configuraciones")
+            conn.execute("DELETE FROM categorias")
+            for categoria in categorias:
+                Categoria._sqlite_insertar(conn, categoria)
+
+    @staticmethod
+    def _sqlite_agregar(nombre: str, descripcion: str, cargaTrabajo: str) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            cantidad = conn.execute("SELECT COUNT(*) FROM categorias").fetchone()[0]
+            Categoria._sqlite_insertar(conn, Categoria(
+                id=100 + cantidad + 1,
+                nombre=nombre,
+                descripcion=descripcion,
+                cargaTrabajo=cargaTrabajo,
+                configuraciones=[]
+            ))
 
 
 class GestorCategoria:
@@ -137,19 +220,10 @@ class GestorCategoria:
         self.categorias: Dict[int, Categoria] = {}
         self.configuraciones: Dict[int, Tuple[Configuracion, int]] = {}
 
-        try:
-            tree = ET.parse("data/categorias.xml")
-            root = tree.getroot()
-            categorias = {}
-            configuraciones = {}
-            for cat_el in root.findall("categoria"):
-                categoria = Categoria.from_element(cat_el)
-                self.categorias[categoria.id] = categoria
-                for configuracion in categoria.configuraciones:
-                    self.configuraciones[configuracion.id] = (configuracion, categoria.id)
-        except Exception as e:
-            print(f"Error inesperado al leer categorias.xml: {e}")
-
+        for categoria in Categoria.get_all():
+            self.categorias[categoria.id] = categoria
+            for configuracion in categoria.configuraciones:
+                self.configuraciones[configuracion.id] = (configuracion, categoria.id)
 
     def get_categoria_by_id(self, id_categoria: int) -> Optional[Categoria]:
         return self.categorias.get(id_categoria)
@@ -1,15 +1,21 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List,Tuple, Optional
-import xml.etree.ElementTree as ET
+from models.xml_backend import ET
 import re
 import random
 import string
 from models.classes.instancia import Instancia
 from models.exceptions import ValidationError
+from models.repositorio import repositorio
+from models.indice import IndiceXml
+from models import almacen_sqlite, bloqueo, cola_escritura, snapshot
+import sys
 import uuid
 from datetime import datetime
 
+RUTA_CLIENTES = "data/clientes.xml"
+INDICE_CLIENTES = IndiceXml(RUTA_CLIENTES, "cliente", "nit")
 
 @dataclass
 class Cliente:
@@ -22,6 +28,8 @@ class Cliente:
     instancias: List[Instancia] = field(default_factory=list)
 
     def __post_init__(self):
+        if isinstance(self.nit, str):
+            self.nit = sys.intern(self.nit)
         self.validar_nit()
 
     def validar_nit(self):
@@ -29,7 +37,7 @@ class Cliente:
             Lanza una excepción {ValidationError} si el NIT no es válido.
         """
         patron = r'^\d+-[0-9Kk]$'
-        if not re.match(patron, self.nit):
+        if not isinstance(self.nit, str) or not re.match(patron, self.nit):
             raise ValidationError(f"NIT inválido '{self.nit}'. Formato permitido 1234567-0 o 1234567-K.")
 
     def to_dict(self) -> Dict:
@@ -86,24 +94,32 @@ class Cliente:
 
     @staticmethod
     def write_xml(clientes: List["Cliente"]):
+        if almacen_sqlite.activo():
+            return Cliente._sqlite_reemplazar(clientes)
+        Cliente._escribir_xml(clientes)
+
+    @staticmethod
+    def _escribir_xml(clientes: List["Cliente"]):
         root = ET.Element("listaClientes")
         for cliente in clientes:
             root.append(cliente.to_xml_element())
 
         tree = ET.ElementTree(root)
         ET.indent(tree, space="  ", level=0)
-        tree.write("data/clientes.xml", encoding="utf-8", xml_declaration=True)
+        with bloqueo.escritura():
+            try:
+                bloqueo.escribir_arbol(tree, RUTA_CLIENTES)
+                snapshot.guardar(RUTA_CLIENTES, clientes)
+            finally:
+                repositorio.invalidar(RUTA_CLIENTES)
+            INDICE_CLIENTES.reconstruir()
 
     @staticmethod
     def get_all() -> List[Cliente]:
         try:
-            tree = ET.parse("data/clientes.xml")
-            root = tree.getroot()
-            clientes = []
-            for cli_el in root.findall("cliente"):
-                cli, _ = Cliente.from_element(cli_el)
-                clientes.append(cli)
-            return clientes
+            if almacen_sqlite.activo():
+                return Cliente._sqlite_leer()
+            return list(repositorio.obtener(RUTA_CLIENTES, Cliente._leer_xml))
         except Exception as e:
             print(f"Error inesperado al leer clientes.xml: {e}")
             return []
@@ -112,13 +128,9 @@ class Cliente:
     @staticmethod
     def get_all_dict() -> Dict[str, Cliente]:
         try:
-            tree = ET.parse("data/clientes.xml")
-            root = tree.getroot()
-            clientes = {}
-            for cli_el in root.findall("cliente"):
-                cli, _ = Cliente.from_element(cli_el)
-                clientes[cli.nit] = cli
-            return clientes
+            if almacen_sqlite.activo():
+                return {cli.nit: cli for cli in Cliente._sqlite_leer()}
+            return dict(repositorio.obtener(RUTA_CLIENTES, Cliente._leer_dict_xml, "por_nit"))
         except Exception as e:
             print(f"Error inesperado al leer clientes.xml: {e}")
             return {}
@@ -126,10 +138,14 @@ class Cliente:
 
     @staticmethod
     def get_by_nit(nit_cliente:int) -> Optional[Cliente]:
+        """
+        Lee únicamente el elemento del cliente usando el índice NIT → posición.
+        """
+        if almacen_sqlite.activo():
+            clientes = Cliente._sqlite_leer("WHERE nit = ?", (nit_cliente,))
+            return clientes[0] if clientes else None
         try:
-            tree = ET.parse("data/clientes.xml")
-            root: ET.Element = tree.getroot()
-            resultado: Optional[ET.Element] = root.find(f".//cliente[@nit='{nit_cliente}']")
+            resultado: Optional[ET.Element] = INDICE_CLIENTES.buscar(nit_cliente)
             if resultado is not None:
                 cliente_obj, _ = Cliente.from_element(resultado)
                 return cliente_obj
@@ -138,9 +154,26 @@ class Cliente:
 
         return None
 
+    @staticmethod
+    def _leer_xml(ruta: str) -> List[Cliente]:
+        return snapshot.leer(ruta, Cliente._parsear_xml)
+
+    @staticmethod
+    def _parsear_xml(ruta: str) -> List[Cliente]:
+        tree = ET.parse(ruta)
+        root = tree.getroot()
+        clientes = []
+        for cli_el in root.findall("cliente"):
+            cli, _ = Cliente.from_element(cli_el)
+            clientes.append(cli)
+        return clientes
+
+    @staticmethod
+    def _leer_dict_xml(ruta: str) -> Dict[str, Cliente]:
+        return {cli.nit: cli for cli in repositorio.obtener(ruta, Cliente._leer_xml)}
+
     @staticmethod
     def add_cliente(nit: str, nombre: str, direccion: str, correoElectronico: str) -> None:
-        clientes = Cliente.get_all()
         usuario = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
         clave = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
         nuevo_cliente = Cliente(
@@ -152,12 +185,14 @@ class Cliente:
             correoElectronico=correoElectronico,
             instancias=[]
         )
-        clientes.append(nuevo_cliente)
-        Cliente.write_xml(clientes)
+        if almacen_sqlite.activo():
+            with almacen_sqlite.transaccion() as conn:
+                Cliente._sqlite_insertar(conn, nuevo_cliente)
+            return
+        cola_escritura.aplicar(RUTA_CLIENTES, Cliente.get_all, Cliente.write_xml, lambda clientes: clientes.append(nuevo_cliente))
 
     @staticmethod
     def add_instancia(nitCliente: str, idConfiguracion: int, nombre: str) -> None:
-        clientes = Cliente.get_all()
         nuevo_id = uuid.uuid4().int >> 16
         fecha_actual = datetime.now().strftime("%d/%m/%Y")
 
@@ -170,9 +205,78 @@ class Cliente:
             fechaFinal=""
         )
 
-        cliente_encontrado = next((c for c in clientes if c.nit == nitCliente), None)
-        if cliente_encontrado:
-            cliente_encontrado.instancias.append(nueva_instancia)
-            Cliente.write_xml(clientes)
+        if almacen_sqlite.activo():
+            return Cliente._sqlite_agregar_instancia(nitCliente, nueva_instancia)
+
+        def agregar(clientes: List[Cliente]) -> None:
+            cliente_encontrado = next((c for c in clientes if c.nit == nitCliente), None)
+            if cliente_encontrado:
+                cliente_encontrado.instancias.append(nueva_instancia)
 
+        # Las altas de clientes e instancias comparten la cola de clientes.xml, así
+        # una instancia siempre ve al cliente creado antes que ella
+        cola_escritura.aplicar(RUTA_CLIENTES, Cliente.get_all, Cliente.write_xml, agregar)
 
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_leer(filtro: str = "", parametros: Tuple = ()) -> List[Cliente]:
+        clientes: Dict[int, Cliente] = {}
+        for fila, nit, nombre, usuario, clave, direccion, correo in almacen_sqlite.iterar(
+            f"SELECT rowid, nit, nombre, usuario, clave, direccion, correoElectronico FROM clientes {filtro} ORDER BY rowid",
+            parametros
+        ):
+            clientes[fila] = Cliente(nit, nombre, usuario, clave, direccion, correo)
+
+        if filtro:
+            marcadores = ", ".join("?" * len(clientes))
+            consulta = f"WHERE cliente IN ({marcadores})"
+            parametros = tuple(clientes)
+        else:
+            consulta, parametros = "", ()
+        if clientes:
+            for cliente, id_, id_conf, nombre, inicio, estado, final in almacen_sqlite.iterar(
+                "SELECT cliente, id, idConfiguracion, nombre, fechaInicio, estado, fechaFinal "
+                f"FROM instancias {consulta} ORDER BY rowid",
+                parametros
+            ):
+                if cliente in clientes:
+                    clientes[cliente].instancias.append(Instancia(int(id_), id_conf, nombre, inicio, estado, final))
+
+        return list(clientes.values())
+
+    @staticmethod
+    def _sqlite_insertar(conn, cliente: Cliente) -> None:
+        fila = conn.execute(
+            "INSERT INTO clientes (nit, nombre, usuario, clave, direccion, correoElectronico) VALUES (?, ?, ?, ?, ?, ?)",
+            (cliente.nit, cliente.nombre, cliente.usuario, cliente.clave, cliente.direccion, cliente.correoElectronico)
+        ).lastrowid
+        for instancia in cliente.instancias:
+            Cliente._sqlite_insertar_instancia(conn, fila, instancia)
+
+    @staticmethod
+    def _sqlite_insertar_instancia(conn, fila_cliente: int, instancia: Instancia) -> None:
+        conn.execute(
+            "INSERT INTO instancias (cliente, id, idConfiguracion, nombre, fechaInicio, estado, fechaFinal) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (fila_cliente, str(instancia.id), instancia.idConfiguracion, instancia.nombre,
+             str(instancia.fechaInicio), instancia.estado, str(instancia.fechaFinal) if instancia.fechaFinal else "")
+        )
+
+    @staticmethod
+    def _sqlite_reemplazar(clientes: List[Cliente]) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            conn.execute("DELETE FROM instancias")
+            conn.execute("DELETE FROM clientes")
+            for cliente in clientes:
+                Cliente._sqlite_insertar(conn, cliente)
+
+    @staticmethod
+    def _sqlite_agregar_instancia(nit_cliente: str, instancia: Instancia) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            fila = conn.execute(
+                "SELECT rowid FROM clientes WHERE nit = ? ORDER BY rowid LIMIT 1", (nit_cliente,)
+            ).fetchone()
+            if fila:
+                Cliente._sqlite_insertar_instancia(conn, fila[0], instancia)
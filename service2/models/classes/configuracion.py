@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
-import xml.etree.ElementTree as ET
+from models.xml_backend import ET
 
 @dataclass
 class Configuracion:
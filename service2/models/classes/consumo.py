@@ -1,10 +1,40 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
-import xml.etree.ElementTree as ET
-from models.classes.fecha_hora import FechaHora
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
+from models.xml_backend import ET, escritor_xml
+from models.classes.fecha_hora import FechaHora, fecha_de_minuto, minuto_epoca
 from models.exceptions import ValidationError
+from models.repositorio import repositorio
+from models import almacen_sqlite, bloqueo, snapshot
+from models.columnas_consumo import ColumnasConsumo, DIR_COLUMNAS
+from models.marcas_facturado import MarcasFacturado, RUTA_MARCAS
+import config
+import os
+import pickle
 import re
+import shutil
+import sys
+import tempfile
+import threading
+
+RUTA_CONSUMOS = "data/consumos.xml"
+# Bitácora de solo-anexado: un encabezado <bitacora generacion="N"/> y luego un
+# segmento <segmento>...</segmento> por línea
+RUTA_BITACORA = "data/consumos.journal.xml"
+# Generación de una bitácora sin encabezado (anterior a las generaciones)
+GENERACION_SIN_ENCABEZADO = 1
+
+_lock_bitacora = threading.RLock()
+
+# Filas facturadas desde la última reescritura de consumos.xml (ver models/marcas_facturado.py)
+MARCAS_FACTURADO = MarcasFacturado(RUTA_MARCAS, RUTA_CONSUMOS)
+# Archivos que, junto con consumos.xml, determinan los grupos leídos
+_DEPENDENCIAS = (RUTA_BITACORA, RUTA_MARCAS)
+
+# Copia columnar de los consumos para la facturación (ver models/columnas_consumo.py)
+COLUMNAS_CONSUMO = ColumnasConsumo(DIR_COLUMNAS, (RUTA_CONSUMOS, RUTA_BITACORA, RUTA_MARCAS),
+                                   lambda: GrupoConsumos.iterar_consumos())
 
 
 @dataclass
@@ -14,6 +44,8 @@ class GrupoConsumos:
     consumos: List[Consumo] = field(default_factory=list)
 
     def __post_init__(self):
+        if isinstance(self.nitCliente, str):
+            self.nitCliente = sys.intern(self.nitCliente)
         self.validar_nit()
 
     def validar_nit(self):
@@ -21,7 +53,7 @@ class GrupoConsumos:
             Lanza una excepción {ValidationError} si el NIT no es válido.
         """
         patron = r'^\d+-[0-9Kk]$'
-        if not re.match(patron, self.nitCliente):
+        if not isinstance(self.nitCliente, str) or not re.match(patron, self.nitCliente):
             raise ValidationError(f"NIT inválido '{self.nitCliente}'.")
 
     def to_xml_element(self) -> ET.Element:
@@ -35,83 +67,541 @@ class GrupoConsumos:
 
         return grupo_elem
 
+    @staticmethod
+    def from_element(el: ET.Element) -> "GrupoConsumos":
+        grupo = GrupoConsumos(
+            nitCliente=el.attrib["nitCliente"],
+            idInstancia=int(el.attrib["idInstancia"])
+        )
+        for consumo_el in el.findall("consumo"):
+            grupo.consumos.append(Consumo.from_xml_element(consumo_el))
+        return grupo
+
     @staticmethod
     def write_xml(gruposComsumos: List["GrupoConsumos"]):
-        root = ET.Element("listadoConsumos")
-        for grupoComsumos in gruposComsumos:
-            root.append(grupoComsumos.to_xml_element())
+        """
+        Escribe el estado completo de los consumos en consumos.xml. Como los grupos
+        recibidos ya incluyen lo registrado en la bitácora y las marcas de facturado,
+        ambas se vacían.
+        """
+        if almacen_sqlite.activo():
+            return GrupoConsumos._sqlite_reemplazar(gruposComsumos)
+        GrupoConsumos._escribir_xml(gruposComsumos)
 
-        tree = ET.ElementTree(root)
-        ET.indent(tree, space="  ", level=0)
-        tree.write("data/consumos.xml", encoding="utf-8", xml_declaration=True)
+    @staticmethod
+    def _escribir_xml(gruposComsumos: List["GrupoConsumos"]):
+        """
+        consumos.xml guarda en su atributo "bitacora" la generación de la bitácora que
+        integra, y la bitácora se reinicia con la generación siguiente. Si el proceso se
+        interrumpe entre ambos pasos, la bitácora que quedó ya está integrada: los
+        lectores la ignoran y el siguiente anexado la reinicia, así sus consumos no se
+        duplican.
+        """
+        with bloqueo.escritura(), _lock_bitacora:
+            try:
+                generacion = max(GrupoConsumos._generacion_integrada(), GrupoConsumos._generacion_bitacora() or 0)
+                GrupoConsumos._escribir_base(gruposComsumos, generacion)
+                GrupoConsumos._reiniciar_bitacora(generacion + 1)
+            finally:
+                repositorio.invalidar(RUTA_CONSUMOS)
+                repositorio.invalidar(RUTA_BITACORA)
+                repositorio.invalidar(RUTA_MARCAS)
 
     @staticmethod
     def append_xml(nuevos_grupos: List[GrupoConsumos]):
-        try:
-            tree = ET.parse("data/consumos.xml")
-            root = tree.getroot()
-        except (ET.ParseError, FileNotFoundError):
-            root = ET.Element("listadoConsumos")
+        """
+        Agrega los grupos como un segmento autocontenido al final de la bitácora de
+        consumos, sin releer ni reescribir consumos.xml. Si la bitácora supera
+        BITACORA_MAX_BYTES se compacta.
+        """
+        if almacen_sqlite.activo():
+            with almacen_sqlite.transaccion() as conn:
+                GrupoConsumos._sqlite_insertar(conn, nuevos_grupos)
+            return
+        GrupoConsumos._escribir_segmento(*GrupoConsumos._preparar_segmento(nuevos_grupos))
+        GrupoConsumos._compactar_si_excede()
 
-        grupos_existentes: Dict[Tuple[str, int], GrupoConsumos] = {}
+    @staticmethod
+    def append_xml_lotes(lotes: Iterable[List[GrupoConsumos]]) -> int:
+        """
+        Igual que `append_xml` para una secuencia de lotes de grupos, que puede ir
+        produciéndose mientras se lee un archivo de carga. Los lotes se preparan en
+        archivos temporales, sin retener los anteriores en memoria, y se agregan a la
+        bitácora como un solo segmento después de consumir la secuencia completa: si
+        esta lanza una excepción no se agrega nada, y los lectores (o una escritura
+        interrumpida) ven la carga completa o nada de ella. La bitácora se compacta (si
+        corresponde) una sola vez al final. Con el motor SQLite todos los lotes se
+        insertan en una transacción. Retorna la cantidad de consumos agregados.
+        """
+        total = 0
+        if almacen_sqlite.activo():
+            with almacen_sqlite.transaccion() as conn:
+                for lote in lotes:
+                    GrupoConsumos._sqlite_insertar(conn, lote)
+                    total += sum(len(grupo.consumos) for grupo in lote)
+            return total
 
-        for grupo_elem in root.findall("grupoConsumos"):
-            nit = grupo_elem.get("nitCliente")
-            id_inst = int(grupo_elem.get("idInstancia"))
-            grupo = GrupoConsumos(nitCliente=nit, idInstancia=id_inst)
+        # Contenido del segmento (los grupos de todos los lotes) y filas de cada lote
+        with tempfile.TemporaryFile() as contenido, tempfile.TemporaryFile() as preparados:
+            for lote in lotes:
+                for grupo in lote:
+                    contenido.write(ET.tostring(grupo.to_xml_element(), encoding="utf-8"))
+                filas = GrupoConsumos._filas_segmento(lote)
+                pickle.dump(filas, preparados, pickle.HIGHEST_PROTOCOL)
+                total += len(filas)
 
-            for consumo_elem in grupo_elem.findall("consumo"):
-                grupo.consumos.append(Consumo.from_xml_element(consumo_elem))
+            def escribir(f) -> None:
+                contenido.seek(0)
+                f.write(b"<segmento>")
+                shutil.copyfileobj(contenido, f)
+                f.write(b"</segmento>\n")
 
-            grupos_existentes[(nit, id_inst)] = grupo
+            def filas_por_lote() -> Iterator[List[Tuple[str, int, int, float]]]:
+                preparados.seek(0)
+                while True:
+                    try:
+                        yield pickle.load(preparados)
+                    except EOFError:
+                        return
 
-        for nuevo in nuevos_grupos:
-            clave = (nuevo.nitCliente, nuevo.idInstancia)
-            if clave in grupos_existentes:
-                grupos_existentes[clave].consumos.extend(nuevo.consumos)
-            else:
-                grupos_existentes[clave] = nuevo
+            if total:
+                GrupoConsumos._anexar_a_bitacora(escribir, filas_por_lote())
+        GrupoConsumos._compactar_si_excede()
+        return total
+
+    @staticmethod
+    def _preparar_segmento(grupos: List[GrupoConsumos]) -> Tuple[bytes, List[Tuple[str, int, int, float]]]:
+        """
+        Retorna la línea del segmento de bitácora de los grupos y sus filas
+        (nitCliente, idInstancia, minuto, horas) para las columnas.
+        """
+        segmento = ET.Element("segmento")
+        for grupo in grupos:
+            segmento.append(grupo.to_xml_element())
+        return ET.tostring(segmento, encoding="utf-8") + b"\n", GrupoConsumos._filas_segmento(grupos)
 
-        GrupoConsumos.write_xml(list(grupos_existentes.values()))
+    @staticmethod
+    def _filas_segmento(grupos: List[GrupoConsumos]) -> List[Tuple[str, int, int, float]]:
+        return [
+            (grupo.nitCliente, grupo.idInstancia, c.fechaHora.minuto, c.tiempo)
+            for grupo in grupos for c in grupo.consumos
+        ]
 
+    @staticmethod
+    def _escribir_segmento(linea: bytes, filas: List[Tuple[str, int, int, float]]) -> None:
+        GrupoConsumos._anexar_a_bitacora(lambda f: f.write(linea), [filas])
+
+    @staticmethod
+    def _anexar_a_bitacora(escribir: Callable, filas_por_lote: Iterable[List[Tuple[str, int, int, float]]]) -> None:
+        """
+        Agrega a la bitácora la línea que `escribir(f)` escribe en el archivo y a las
+        columnas las filas de sus consumos, todo con el bloqueo de escritura.
+        """
+        with bloqueo.escritura(), _lock_bitacora:
+            try:
+                if not os.path.exists(RUTA_CONSUMOS):
+                    GrupoConsumos._escribir_base([], 0)
+                integrada = GrupoConsumos._generacion_integrada()
+                generacion = GrupoConsumos._generacion_bitacora()
+                if generacion is None or generacion <= integrada:
+                    GrupoConsumos._reiniciar_bitacora(integrada + 1)
+            finally:
+                repositorio.invalidar(RUTA_BITACORA)
+            firmas_previas = COLUMNAS_CONSUMO.firmas()
+            try:
+                with open(RUTA_BITACORA, "a+b") as f:
+                    GrupoConsumos._descartar_linea_incompleta(f)
+                    escribir(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                repositorio.invalidar(RUTA_BITACORA)
+            for filas in filas_por_lote:
+                COLUMNAS_CONSUMO.anexar(filas, firmas_previas)
+                firmas_previas = COLUMNAS_CONSUMO.firmas()
+
+    @staticmethod
+    def _descartar_linea_incompleta(f) -> None:
+        """
+        Quita del final de la bitácora abierta en `f` lo que haya quedado de una
+        escritura interrumpida (una línea sin su salto), para no unirlo a la siguiente.
+        """
+        tamano = f.seek(0, os.SEEK_END)
+        fin = tamano
+        while fin > 0:
+            inicio = max(0, fin - 64 * 1024)
+            f.seek(inicio)
+            bloque = f.read(fin - inicio)
+            salto = bloque.rfind(b"\n")
+            if salto >= 0:
+                fin = inicio + salto + 1
+                break
+            fin = inicio
+        if fin < tamano:
+            f.truncate(fin)
+
+    @staticmethod
+    def _compactar_si_excede() -> None:
+        with bloqueo.escritura(), _lock_bitacora:
+            if os.path.exists(RUTA_BITACORA) and os.path.getsize(RUTA_BITACORA) > config.BITACORA_MAX_BYTES:
+                GrupoConsumos.compactar()
+
+    @staticmethod
+    def compactar() -> int:
+        """
+        Integra los segmentos de la bitácora en consumos.xml y la vacía.
+        Retorna la cantidad de grupos resultantes.
+        """
+        if almacen_sqlite.activo():
+            return almacen_sqlite.consultar(
+                "SELECT COUNT(*) FROM (SELECT DISTINCT nitCliente, idInstancia FROM consumos)"
+            )[0][0]
+        with bloqueo.escritura(), _lock_bitacora:
+            grupos = GrupoConsumos._leer_completo()
+            GrupoConsumos._escribir_xml(grupos)
+            return len(grupos)
+
+    @staticmethod
+    def iterar_consumos() -> Iterator[Tuple[str, int, Consumo]]:
+        """
+        Recorre consumos.xml y luego la bitácora fila por fila, produciendo
+        (nitCliente, idInstancia, Consumo) con las marcas de facturado aplicadas. Usa
+        iterparse y libera cada elemento ya procesado, por lo que la memoria no crece
+        con el tamaño del archivo.
+        """
+        if almacen_sqlite.activo():
+            for nit, id_inst, tiempo, fecha_hora, facturado in almacen_sqlite.iterar(
+                "SELECT nitCliente, idInstancia, tiempo, fechaHora, facturado FROM consumos ORDER BY rowid"
+            ):
+                yield nit, int(id_inst), Consumo(tiempo, fecha_hora, bool(facturado))
+            return
+
+        with bloqueo.lectura():
+            marcas = MARCAS_FACTURADO.leer()
+            fila = 0
+            integrada = 0
+            if os.path.exists(RUTA_CONSUMOS):
+                contexto = ET.iterparse(RUTA_CONSUMOS, events=("start", "end"))
+                _, root = next(contexto)
+                integrada = int(root.get("bitacora", "0"))
+                grupo_el = None
+                for evento, el in contexto:
+                    if evento == "start":
+                        if el.tag == "grupoConsumos":
+                            grupo_el = el
+                            nit = el.attrib["nitCliente"]
+                            id_inst = int(el.attrib["idInstancia"])
+                        continue
+                    if el.tag == "consumo":
+                        consumo = Consumo.from_xml_element(el)
+                        if fila < len(marcas) and marcas[fila]:
+                            consumo.facturado = True
+                        fila += 1
+                        yield nit, id_inst, consumo
+                        grupo_el.clear()
+                    elif el.tag == "grupoConsumos":
+                        root.clear()
+
+            for segmento in GrupoConsumos._segmentos_bitacora(integrada):
+                for grupo_el in segmento.findall("grupoConsumos"):
+                    nit = grupo_el.attrib["nitCliente"]
+                    id_inst = int(grupo_el.attrib["idInstancia"])
+                    for consumo_el in grupo_el.findall("consumo"):
+                        consumo = Consumo.from_xml_element(consumo_el)
+                        if fila < len(marcas) and marcas[fila]:
+                            consumo.facturado = True
+                        fila += 1
+                        yield nit, id_inst, consumo
+
+    @staticmethod
+    def marcar_facturados(claves: Set[Tuple[str, int]], fecha_ini: datetime, fecha_fin: datetime) -> None:
+        """
+        Marca como facturados los consumos de las claves (nitCliente, idInstancia)
+        indicadas cuya fecha está dentro del rango. Con el motor XML las filas se
+        buscan en las columnas desde la primera no facturada y se anexan a las marcas
+        de facturado, sin reescribir consumos.xml ni la bitácora.
+        """
+        if almacen_sqlite.activo():
+            return GrupoConsumos._sqlite_marcar_facturados(claves, fecha_ini, fecha_fin)
+
+        desde, hasta = minuto_epoca(fecha_ini), minuto_epoca(fecha_fin)
+        with bloqueo.escritura(), _lock_bitacora:
+            with COLUMNAS_CONSUMO.abrir() as columnas:
+                filas = COLUMNAS_CONSUMO.seleccionar(columnas, claves, desde, hasta)
+            firmas_previas = COLUMNAS_CONSUMO.firmas()
+            try:
+                MARCAS_FACTURADO.marcar(filas)
+            finally:
+                repositorio.invalidar(RUTA_MARCAS)
+            COLUMNAS_CONSUMO.marcar_filas(filas, firmas_previas)
+
+    @staticmethod
+    def iterar_pendientes(fecha_ini: datetime, fecha_fin: datetime,
+                          filtro_nit: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[str, int, Consumo]]:
+        """
+        Produce (nitCliente, idInstancia, Consumo) de los consumos no facturados dentro
+        del rango y, si se indica `filtro_nit`, de los NIT que acepta. Con el motor XML
+        recorre las columnas mapeadas en memoria en lugar de parsear los archivos; solo
+        se crean objetos para las filas seleccionadas.
+        """
+        if almacen_sqlite.activo():
+            for nit, id_inst, tiempo, fecha_hora in almacen_sqlite.iterar(
+                "SELECT nitCliente, idInstancia, tiempo, fechaHora FROM consumos "
+                "WHERE facturado = 0 AND fechaOrden BETWEEN ? AND ? ORDER BY rowid",
+                (GrupoConsumos._sqlite_orden(fecha_ini), GrupoConsumos._sqlite_orden(fecha_fin))
+            ):
+                if filtro_nit is None or filtro_nit(nit):
+                    yield nit, int(id_inst), Consumo(tiempo, fecha_hora)
+            return
+
+        desde, hasta = minuto_epoca(fecha_ini), minuto_epoca(fecha_fin)
+        with bloqueo.lectura(), COLUMNAS_CONSUMO.abrir() as columnas:
+            facturado, minuto, instancia = columnas.facturado, columnas.minuto, columnas.instancia
+            permitidas = None if filtro_nit is None else [filtro_nit(nit) for nit, _ in columnas.claves]
+            for fila in range(columnas.primera_pendiente, columnas.filas):
+                if facturado[fila] or not desde <= minuto[fila] <= hasta:
+                    continue
+                if permitidas is not None and not permitidas[instancia[fila]]:
+                    continue
+                nit, id_inst = columnas.claves[instancia[fila]]
+                yield nit, id_inst, Consumo(columnas.horas[fila], fecha_de_minuto(minuto[fila]))
+
+    @staticmethod
     def get_all() -> List[GrupoConsumos]:
         try:
-            tree = ET.parse("data/consumos.xml")
-            root = tree.getroot()
-            grupos = []
-            for grupo_el in root.findall("grupoConsumos"):
-                nit = grupo_el.attrib["nitCliente"]
-                id_inst = int(grupo_el.attrib["idInstancia"])
-                grupo = GrupoConsumos(nitCliente=nit, idInstancia=id_inst)
-                for consumo_el in grupo_el.findall("consumo"):
-                    grupo.consumos.append(Consumo.from_xml_element(consumo_el))
-                grupos.append(grupo)
-            return grupos
+            if almacen_sqlite.activo():
+                return GrupoConsumos._sqlite_leer()
+            return list(repositorio.obtener(RUTA_CONSUMOS, GrupoConsumos._leer_xml, dependencias=_DEPENDENCIAS))
         except Exception as e:
             print(f"Error inesperado al leer consumos.xml: {e}")
             return []
 
+    @staticmethod
     def get_all_dict() -> Dict[str, GrupoConsumos]:
         try:
-            tree = ET.parse("data/consumos.xml")
-            root = tree.getroot()
-            grupos = {}
-            for grupo_el in root.findall("grupoConsumos"):
-                nit = grupo_el.attrib["nitCliente"]
-                id_inst = int(grupo_el.attrib["idInstancia"])
-                grupo = GrupoConsumos(nitCliente=nit, idInstancia=id_inst)
-                for consumo_el in grupo_el.findall("consumo"):
-                    grupo.consumos.append(Consumo.from_xml_element(consumo_el))
-                grupos[f"{grupo.nitCliente.lower()}-{str(grupo.idInstancia)}"] = grupo
-            return grupos
+            if almacen_sqlite.activo():
+                return GrupoConsumos._por_clave(GrupoConsumos._sqlite_leer())
+            return dict(repositorio.obtener(RUTA_CONSUMOS, GrupoConsumos._leer_dict_xml, "por_clave", _DEPENDENCIAS))
         except Exception as e:
             print(f"Error inesperado al leer consumos.xml: {e}")
             return {}
 
+    @staticmethod
+    def _escribir_base(gruposComsumos: List["GrupoConsumos"], generacion: int):
+        """
+        Escribe consumos.xml grupo por grupo, sin construir el árbol completo.
+        `generacion` es la última generación de la bitácora que incluyen los grupos.
+        """
+        with bloqueo.archivo_temporal(RUTA_CONSUMOS) as temporal, escritor_xml(temporal) as escritor:
+            escritor.abrir("listadoConsumos", {"bitacora": str(generacion)})
+            escritor.texto("\n")
+            for grupoComsumos in gruposComsumos:
+                grupo_el = grupoComsumos.to_xml_element()
+                ET.indent(grupo_el, space="  ", level=1)
+                escritor.texto("  ")
+                escritor.escribir(grupo_el)
+                escritor.texto("\n")
+            escritor.cerrar()
+        snapshot.guardar(RUTA_CONSUMOS, gruposComsumos)
+        # Los grupos ya incluyen las marcas de facturado
+        MARCAS_FACTURADO.reiniciar()
+
+    @staticmethod
+    def _reiniciar_bitacora(generacion: int) -> None:
+        with bloqueo.archivo_temporal(RUTA_BITACORA) as temporal, open(temporal, "wb") as f:
+            f.write(GrupoConsumos._encabezado_bitacora(generacion))
+
+    @staticmethod
+    def _encabezado_bitacora(generacion: int) -> bytes:
+        return ET.tostring(ET.Element("bitacora", attrib={"generacion": str(generacion)}), encoding="utf-8") + b"\n"
+
+    @staticmethod
+    def _generacion_integrada() -> int:
+        """
+        Generación de la bitácora integrada en consumos.xml (0 si no existe o es
+        anterior a las generaciones). Solo lee el elemento raíz.
+        """
+        try:
+            with open(RUTA_CONSUMOS, "rb") as f:
+                _, root = next(ET.iterparse(f, events=("start",)))
+        except FileNotFoundError:
+            return 0
+        return int(root.get("bitacora", "0"))
+
+    @staticmethod
+    def _generacion_bitacora() -> Optional[int]:
+        """
+        Generación de la bitácora, o None si no existe o está vacía.
+        """
+        try:
+            with open(RUTA_BITACORA, "rb") as f:
+                primera = f.readline()
+        except FileNotFoundError:
+            return None
+        if not primera.strip():
+            return None
+        return GrupoConsumos._generacion_linea(primera)
+
+    @staticmethod
+    def _generacion_linea(primera: bytes) -> int:
+        if primera.startswith(b"<bitacora "):
+            try:
+                return int(ET.fromstring(primera).get("generacion", "0"))
+            except (ET.ParseError, ValueError):
+                pass
+        return GENERACION_SIN_ENCABEZADO
+
+    @staticmethod
+    def _leer_completo() -> List[GrupoConsumos]:
+        """
+        Los grupos de consumos.xml, si existe, y de la bitácora con las marcas de
+        facturado aplicadas.
+        """
+        if os.path.exists(RUTA_CONSUMOS):
+            return GrupoConsumos._leer_xml(RUTA_CONSUMOS)
+        grupos = GrupoConsumos._leer_bitacora()
+        MARCAS_FACTURADO.aplicar(consumo for grupo in grupos for consumo in grupo.consumos)
+        return GrupoConsumos._combinar(grupos)
+
+    @staticmethod
+    def _leer_xml(ruta: str) -> List[GrupoConsumos]:
+        """
+        Lee consumos.xml y le integra los segmentos de la bitácora y las marcas de
+        facturado.
+        """
+        grupos = list(snapshot.leer(ruta, GrupoConsumos._parsear_xml))
+        grupos.extend(GrupoConsumos._leer_bitacora())
+        MARCAS_FACTURADO.aplicar(consumo for grupo in grupos for consumo in grupo.consumos)
+        return GrupoConsumos._combinar(grupos)
+
+    @staticmethod
+    def _parsear_xml(ruta: str) -> List[GrupoConsumos]:
+        tree = ET.parse(ruta)
+        root = tree.getroot()
+        return [GrupoConsumos.from_element(grupo_el) for grupo_el in root.findall("grupoConsumos")]
+
+    @staticmethod
+    def _leer_bitacora() -> List[GrupoConsumos]:
+        grupos = []
+        for segmento in GrupoConsumos._segmentos_bitacora():
+            for grupo_el in segmento.findall("grupoConsumos"):
+                grupos.append(GrupoConsumos.from_element(grupo_el))
+        return grupos
+
+    @staticmethod
+    def _segmentos_bitacora(integrada: Optional[int] = None) -> Iterator[ET.Element]:
+        """
+        Lee los segmentos de la bitácora, uno por línea. Una línea incompleta (escritura
+        interrumpida) se descarta. Si la generación de la bitácora ya está integrada en
+        consumos.xml (`integrada`, se lee si no se indica) no produce ninguno.
+        """
+        try:
+            with open(RUTA_BITACORA, "rb") as f:
+                primera = f.readline()
+                if not primera.strip():
+                    return
+                if integrada is None:
+                    integrada = GrupoConsumos._generacion_integrada()
+                if GrupoConsumos._generacion_linea(primera) <= integrada:
+                    return
+                if not primera.startswith(b"<bitacora "):
+                    f.seek(0)
+                for linea in f:
+                    if not linea.strip():
+                        continue
+                    try:
+                        yield ET.fromstring(linea)
+                    except ET.ParseError as e:
+                        print(f"Segmento inválido en la bitácora de consumos: {e}")
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _combinar(grupos: List[GrupoConsumos]) -> List[GrupoConsumos]:
+        """
+        Une los grupos con el mismo (nitCliente, idInstancia) conservando el orden de llegada.
+        """
+        combinados: Dict[Tuple[str, int], GrupoConsumos] = {}
+        for grupo in grupos:
+            clave = (grupo.nitCliente, grupo.idInstancia)
+            if clave in combinados:
+                combinados[clave].consumos.extend(grupo.consumos)
+            else:
+                combinados[clave] = grupo
+        return list(combinados.values())
+
+    @staticmethod
+    def _leer_dict_xml(ruta: str) -> Dict[str, GrupoConsumos]:
+        return GrupoConsumos._por_clave(repositorio.obtener(ruta, GrupoConsumos._leer_xml, dependencias=_DEPENDENCIAS))
+
+    @staticmethod
+    def _por_clave(lista: List[GrupoConsumos]) -> Dict[str, GrupoConsumos]:
+        grupos = {}
+        for grupo in lista:
+            grupos[f"{grupo.nitCliente.lower()}-{str(grupo.idInstancia)}"] = grupo
+        return grupos
+
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_leer() -> List[GrupoConsumos]:
+        grupos: Dict[Tuple[str, int], GrupoConsumos] = {}
+        for nit, id_inst, consumo in GrupoConsumos.iterar_consumos():
+            clave = (nit, id_inst)
+            if clave not in grupos:
+                grupos[clave] = GrupoConsumos(nitCliente=nit, idInstancia=id_inst)
+            grupos[clave].consumos.append(consumo)
+        return list(grupos.values())
+
+    @staticmethod
+    def _sqlite_orden(fecha_hora: datetime) -> int:
+        """
+        Fecha y hora como entero AAAAMMDDHHMM (columna fechaOrden).
+        """
+        return int(fecha_hora.strftime("%Y%m%d%H%M"))
+
+    @staticmethod
+    def _sqlite_orden_texto(t: str) -> int:
+        """
+        Igual que `_sqlite_orden` para un texto "dd/mm/aaaa hh:mm" ya validado.
+        """
+        return int(t[6:10] + t[3:5] + t[:2] + t[-5:-3] + t[-2:])
+
+    @staticmethod
+    def _sqlite_insertar(conn, grupos: List[GrupoConsumos]) -> None:
+        conn.executemany(
+            "INSERT INTO consumos (nitCliente, idInstancia, tiempo, fechaHora, fechaOrden, facturado) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (grupo.nitCliente, str(grupo.idInstancia), consumo.tiempo, str(consumo.fechaHora),
+                 GrupoConsumos._sqlite_orden_texto(consumo.fechaHora.valor),
+                 int(consumo.facturado))
+                for grupo in grupos for consumo in grupo.consumos
+            )
+        )
+
+    @staticmethod
+    def _sqlite_reemplazar(grupos: List[GrupoConsumos]) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            conn.execute("DELETE FROM consumos")
+            GrupoConsumos._sqlite_insertar(conn, grupos)
+
+    @staticmethod
+    def _sqlite_marcar_facturados(claves: Set[Tuple[str, int]], fecha_ini: datetime, fecha_fin: datetime) -> None:
+        desde = GrupoConsumos._sqlite_orden(fecha_ini)
+        hasta = GrupoConsumos._sqlite_orden(fecha_fin)
+        with almacen_sqlite.transaccion() as conn:
+            conn.executemany(
+                "UPDATE consumos SET facturado = 1 WHERE nitCliente = ? AND idInstancia = ? "
+                "AND facturado = 0 AND fechaOrden BETWEEN ? AND ?",
+                ((nit, str(id_inst), desde, hasta) for nit, id_inst in claves)
+            )
+
 
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class Consumo:
     tiempo: float
     fechaHora: FechaHora
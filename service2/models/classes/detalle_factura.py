@@ -1,9 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-import xml.etree.ElementTree as ET
+from models.xml_backend import ET
 
 
-@dataclass
+@dataclass(slots=True)
 class DetalleFactura:
     """
     Representa el detalle de una factura (una línea por instancia).
@@ -13,7 +13,11 @@ class DetalleFactura:
     horas: float
     subtotal: float
     recursos_cantidad: Dict[int, float] = field(default_factory=dict)
+    # Aporte de cada recurso (cantidad * precio * horas) con el precio al facturar
+    recursos_monto: Dict[int, float] = field(default_factory=dict)
     consumos: List[ConsumoFactura] = field(default_factory=list)
+    # Categoría de la configuración al facturar
+    idCategoria: Optional[int] = None
 
     def to_dict(self) -> dict:
         return {
@@ -35,8 +39,10 @@ class DetalleFactura:
             "horas": f"{self.horas:.2f}",
             "subtotal": f"Q{self.subtotal:.2f}"
         })
-        ET.SubElement(detalle_el, "recursos").extend(self.recursos_to_xml_element())
-        ET.SubElement(detalle_el, "consumos").extend(self.consumos_to_xml_element())
+        if self.idCategoria is not None:
+            detalle_el.set("idCategoria", str(self.idCategoria))
+        ET.SubElement(detalle_el, "recursos").extend(list(self.recursos_to_xml_element()))
+        ET.SubElement(detalle_el, "consumos").extend(list(self.consumos_to_xml_element()))
         return detalle_el
 
     def recursos_to_xml_element(self) -> ET.Element:
@@ -46,6 +52,8 @@ class DetalleFactura:
                 "id": str(rid),
                 "cantidad": f"{cantidad:.2f}"
             })
+            if rid in self.recursos_monto:
+                recurso_el.set("monto", repr(self.recursos_monto[rid]))
         return recursos_el
 
     def consumos_to_xml_element(self) -> ET.Element:
@@ -67,13 +75,19 @@ class DetalleFactura:
         except ValueError:
             subtotal = 0.0
 
+        id_categoria = element.get("idCategoria")
+
         recursos_cantidad: Dict[int, float] = {}
+        recursos_monto: Dict[int, float] = {}
         recursos_el = element.find("recursos")
         if recursos_el is not None:
             for recurso_el in recursos_el.findall("recurso"):
                 rid = int(recurso_el.get("id", "0"))
                 cantidad = float(recurso_el.get("cantidad", "0"))
                 recursos_cantidad[rid] = cantidad
+                monto = recurso_el.get("monto")
+                if monto is not None:
+                    recursos_monto[rid] = float(monto)
 
         consumos: List[ConsumoFactura] = []
         consumos_el = element.find("consumos")
@@ -87,10 +101,12 @@ class DetalleFactura:
             horas=horas,
             subtotal=subtotal,
             recursos_cantidad=recursos_cantidad,
-            consumos=consumos
+            recursos_monto=recursos_monto,
+            consumos=consumos,
+            idCategoria=int(id_categoria) if id_categoria is not None else None
         )
 
-@dataclass
+@dataclass(slots=True)
 class ConsumoFactura:
     tiempo: float
     fechaHora: str
@@ -1,10 +1,29 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict
-import xml.etree.ElementTree as ET
+from models.xml_backend import ET
+import glob
+import os
+import sys
+import threading
 import uuid
+from datetime import datetime
 from pathlib import Path
 from models.classes.detalle_factura import DetalleFactura
+from models.classes.fecha import ordinal_fecha
+from models.classes.ingreso_diario import IngresoDiario
+from models.repositorio import repositorio
+from models.indice import IndiceXml
+from models import almacen_sqlite, bloqueo, snapshot
+
+# Las facturas se guardan particionadas por mes de emisión: data/facturas/AAAA-MM.xml
+DIR_FACTURAS = "data/facturas"
+RUTA_MANIFIESTO = os.path.join(DIR_FACTURAS, "manifiesto.xml")
+PARTICION_SIN_FECHA = "sin-fecha"
+# Archivo único usado antes de particionar, se migra al primer acceso
+RUTA_FACTURAS_LEGADO = "data/facturas.xml"
+
+_lock_migracion = threading.Lock()
 
 
 @dataclass
@@ -15,6 +34,14 @@ class Factura:
     rango_inicio: str
     detalles: List[DetalleFactura] = field(default_factory=list)
     total: float = 0.0
+    # fechaEmision como date.toordinal(), None si no es una fecha válida
+    ordinalEmision: Optional[int] = field(init=False, default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        try:
+            self.ordinalEmision = ordinal_fecha(self.fechaEmision)
+        except ValueError:
+            self.ordinalEmision = None
 
     @staticmethod
     def generar(nitCliente: str, rango_inicio: str, rango_fin: str, detalles: List[DetalleFactura], total: float) -> "Factura":
@@ -62,7 +89,7 @@ class Factura:
     @staticmethod
     def from_element(element: ET.Element) -> "Factura":
         id_ = int(element.get("id", "0"))
-        nit_cliente = element.get("nitCliente", "")
+        nit_cliente = sys.intern(element.get("nitCliente", ""))
         fecha_emision = element.findtext("fechaEmision", "")
         rango_inicio = element.findtext("rangoInicio", "")
         total_str = element.findtext("total", "Q0.00").replace("Q", "").strip()
@@ -90,43 +117,143 @@ class Factura:
     @staticmethod
     def get_all() -> List[Factura]:
         try:
-            tree = ET.parse("data/facturas.xml")
-            root = tree.getroot()
+            if almacen_sqlite.activo():
+                return Factura._sqlite_leer()
+            Factura._migrar_archivo_unico()
             facturas = []
-            for r in root.findall("factura"):
-                facturas.append(Factura.from_element(r))
+            for particion in Factura.get_particiones():
+                facturas.extend(Factura._leer_particion(particion))
             return facturas
         except Exception as e:
-            print(f"Error inesperado al leer facturas.xml: {e}")
+            print(f"Error inesperado al leer facturas: {e}")
+            return []
+
+    @staticmethod
+    def get_by_rango(fecha_inicio: datetime, fecha_fin: datetime) -> List[Factura]:
+        """
+        Retorna las facturas con fechaEmision dentro del rango (inclusive), abriendo
+        solo las particiones mensuales cuyo rango de fechas se traslapa con él.
+        """
+        try:
+            if almacen_sqlite.activo():
+                return Factura._sqlite_leer(
+                    "WHERE fechaOrden BETWEEN ? AND ?",
+                    (Factura._sqlite_orden(fecha_inicio), Factura._sqlite_orden(fecha_fin))
+                )
+            Factura._migrar_archivo_unico()
+            desde, hasta = fecha_inicio.toordinal(), fecha_fin.toordinal()
+            facturas = []
+            for particion in Factura.get_particiones():
+                if not particion.traslapa(fecha_inicio, fecha_fin):
+                    continue
+                for factura in Factura._leer_particion(particion):
+                    if factura.ordinalEmision is not None and desde <= factura.ordinalEmision <= hasta:
+                        facturas.append(factura)
+            return facturas
+        except Exception as e:
+            print(f"Error inesperado al leer facturas: {e}")
             return []
 
     @staticmethod
     def get_by_id(factura_id: int) -> Optional[Factura]:
         """
-        Busca y retorna una factura por su ID desde el archivo XML.
+        Busca y retorna una factura por su ID. En cada partición se consulta el índice
+        id → posición y solo se lee el elemento de la factura.
         """
         try:
-            tree: ET.ElementTree = ET.parse("data/facturas.xml")
-            root: ET.Element = tree.getroot()
-            resultado: Optional[ET.Element] = root.find(f".//factura[@id='{factura_id}']")
-            if resultado is not None:
-                return Factura.from_element(resultado)
+            if almacen_sqlite.activo():
+                facturas = Factura._sqlite_leer("WHERE id = ?", (str(factura_id),))
+                return facturas[0] if facturas else None
+            Factura._migrar_archivo_unico()
+            for particion in reversed(Factura.get_particiones()):
+                resultado: Optional[ET.Element] = particion.indice().buscar(str(factura_id))
+                if resultado is not None:
+                    return Factura.from_element(resultado)
         except (FileNotFoundError, ET.ParseError):
             pass
 
         return None
 
+    @staticmethod
+    def get_particiones() -> List[ParticionFacturas]:
+        """
+        Retorna las particiones registradas en el manifiesto, ordenadas por mes.
+        Si el manifiesto no existe se reconstruye a partir de los archivos de partición.
+        """
+        if not os.path.exists(RUTA_MANIFIESTO):
+            if not glob.glob(os.path.join(DIR_FACTURAS, "*.xml")):
+                return []
+            with bloqueo.escritura():
+                if not os.path.exists(RUTA_MANIFIESTO):
+                    Factura._reconstruir_manifiesto()
+        return list(repositorio.obtener(RUTA_MANIFIESTO, ParticionFacturas.leer_manifiesto))
+
+    @staticmethod
+    def _leer_particion(particion: ParticionFacturas) -> List[Factura]:
+        try:
+            return repositorio.obtener(particion.ruta, Factura._leer_xml)
+        except FileNotFoundError:
+            return []
 
     @staticmethod
-    def write_xml(facturas: List["Factura"], ruta: Path = Path("data/facturas.xml")) -> None:
+    def _leer_xml(ruta: str) -> List[Factura]:
+        return snapshot.leer(ruta, Factura._parsear_xml)
+
+    @staticmethod
+    def _parsear_xml(ruta: str) -> List[Factura]:
+        tree = ET.parse(ruta)
+        root = tree.getroot()
+        return [Factura.from_element(r) for r in root.findall("factura")]
+
+    @staticmethod
+    def _mes_de(fecha_emision: str) -> str:
         """
-        Guarda las facturas nuevas en el archivo XML, manteniendo las existentes.
+        Nombre de la partición (AAAA-MM) a la que pertenece una fecha dd/mm/aaaa.
         """
         try:
-            tree = ET.parse(ruta)
-            root = tree.getroot()
-        except (FileNotFoundError, ET.ParseError):
-            root = ET.Element("listaFacturas")
+            return datetime.strptime(fecha_emision, "%d/%m/%Y").strftime("%Y-%m")
+        except ValueError:
+            return PARTICION_SIN_FECHA
+
+
+    @staticmethod
+    def write_xml(facturas: List["Factura"]) -> None:
+        """
+        Guarda las facturas nuevas en su partición mensual, manteniendo las existentes.
+        Solo se reescriben las particiones afectadas y el manifiesto.
+        """
+        if almacen_sqlite.activo():
+            return Factura._sqlite_agregar(facturas)
+        with bloqueo.escritura():
+            Factura._migrar_archivo_unico()
+            Factura._agregar_a_particiones(facturas)
+
+    @staticmethod
+    def _agregar_a_particiones(facturas: List["Factura"]) -> None:
+        por_mes: Dict[str, List[Factura]] = {}
+        for factura in facturas:
+            por_mes.setdefault(Factura._mes_de(factura.fechaEmision), []).append(factura)
+
+        particiones = {p.mes: p for p in Factura.get_particiones()}
+        for mes, nuevas in por_mes.items():
+            particion = particiones.get(mes) or ParticionFacturas(mes=mes)
+            Factura._escribir_particion(particion, nuevas)
+            for factura in nuevas:
+                particion.registrar(factura.fechaEmision)
+            particiones[mes] = particion
+
+        ParticionFacturas.escribir_manifiesto(list(particiones.values()))
+        IngresoDiario._xml_acumular(facturas)
+
+    @staticmethod
+    def _escribir_particion(particion: ParticionFacturas, facturas: List["Factura"]) -> None:
+        ruta = Path(particion.ruta)
+        root = ET.Element("listaFacturas")
+        if ruta.exists():
+            try:
+                root = ET.parse(str(ruta)).getroot()
+            except ET.ParseError:
+                pass
 
         for factura in facturas:
             root.append(factura.to_xml_element())
@@ -134,4 +261,148 @@ class Factura:
         tree = ET.ElementTree(root)
         ET.indent(tree, space="  ", level=0)
         ruta.parent.mkdir(parents=True, exist_ok=True)
-        tree.write(ruta, encoding="utf-8", xml_declaration=True)
+        try:
+            bloqueo.escribir_arbol(tree, ruta)
+            snapshot.guardar(particion.ruta, [Factura.from_element(el) for el in root.findall("factura")])
+        finally:
+            repositorio.invalidar(particion.ruta)
+        particion.indice().reconstruir()
+
+    @staticmethod
+    def _reconstruir_manifiesto() -> None:
+        particiones = []
+        for ruta in sorted(glob.glob(os.path.join(DIR_FACTURAS, "*.xml"))):
+            if ruta == RUTA_MANIFIESTO:
+                continue
+            mes = os.path.splitext(os.path.basename(ruta))[0]
+            particion = ParticionFacturas(mes=mes)
+            for factura in Factura._leer_xml(ruta):
+                particion.registrar(factura.fechaEmision)
+            particiones.append(particion)
+        ParticionFacturas.escribir_manifiesto(particiones)
+
+    @staticmethod
+    def _migrar_archivo_unico() -> None:
+        """
+        Reparte el antiguo data/facturas.xml en particiones mensuales y lo elimina.
+        """
+        if not os.path.exists(RUTA_FACTURAS_LEGADO):
+            return
+        with bloqueo.escritura(), _lock_migracion:
+            if not os.path.exists(RUTA_FACTURAS_LEGADO):
+                return
+            facturas = Factura._parsear_xml(RUTA_FACTURAS_LEGADO)
+            if facturas:
+                Factura._agregar_a_particiones(facturas)
+            os.remove(RUTA_FACTURAS_LEGADO)
+
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_orden(fecha: datetime) -> int:
+        """
+        Fecha como entero AAAAMMDD (columna fechaOrden).
+        """
+        return int(fecha.strftime("%Y%m%d"))
+
+    @staticmethod
+    def _sqlite_leer(filtro: str = "", parametros: tuple = ()) -> List[Factura]:
+        """
+        Cada fila guarda el elemento <factura> completo; las columnas id, nitCliente
+        y fechaOrden solo sirven para las búsquedas indexadas.
+        """
+        return [
+            Factura.from_element(ET.fromstring(xml.encode("utf-8")))
+            for (xml,) in almacen_sqlite.iterar(f"SELECT xml FROM facturas {filtro} ORDER BY rowid", parametros)
+        ]
+
+    @staticmethod
+    def _sqlite_agregar(facturas: List[Factura]) -> None:
+        filas = []
+        for factura in facturas:
+            try:
+                orden = Factura._sqlite_orden(datetime.strptime(factura.fechaEmision, "%d/%m/%Y"))
+            except ValueError:
+                orden = 0
+            xml = ET.tostring(factura.to_xml_element(), encoding="utf-8").decode("utf-8")
+            filas.append((str(factura.id), factura.nitCliente, factura.fechaEmision, orden, xml))
+        ingresos = IngresoDiario.calcular(facturas)
+
+        with almacen_sqlite.transaccion() as conn:
+            conn.executemany(
+                "INSERT INTO facturas (id, nitCliente, fechaEmision, fechaOrden, xml) VALUES (?, ?, ?, ?, ?)",
+                filas
+            )
+            IngresoDiario._sqlite_acumular(conn, ingresos, len(facturas))
+
+
+@dataclass
+class ParticionFacturas:
+    """
+    Entrada del manifiesto de facturas: una partición mensual con el rango de
+    fechas de emisión que contiene y la cantidad de facturas.
+    """
+    mes: str # "AAAA-MM"
+    desde: str = ""
+    hasta: str = ""
+    cantidad: int = 0
+
+    @property
+    def ruta(self) -> str:
+        return os.path.join(DIR_FACTURAS, f"{self.mes}.xml")
+
+    def indice(self) -> IndiceXml:
+        return IndiceXml(self.ruta, "factura", "id")
+
+    def registrar(self, fecha_emision: str) -> None:
+        self.cantidad += 1
+        try:
+            fecha = ordinal_fecha(fecha_emision)
+        except ValueError:
+            return
+        if not self.desde or fecha < ordinal_fecha(self.desde):
+            self.desde = fecha_emision
+        if not self.hasta or fecha > ordinal_fecha(self.hasta):
+            self.hasta = fecha_emision
+
+    def traslapa(self, fecha_inicio: datetime, fecha_fin: datetime) -> bool:
+        if not self.desde or not self.hasta:
+            return False
+        return ordinal_fecha(self.desde) <= fecha_fin.toordinal() and fecha_inicio.toordinal() <= ordinal_fecha(self.hasta)
+
+    def to_xml_element(self) -> ET.Element:
+        return ET.Element("particion", attrib={
+            "mes": self.mes,
+            "desde": self.desde,
+            "hasta": self.hasta,
+            "cantidad": str(self.cantidad)
+        })
+
+    @staticmethod
+    def from_element(el: ET.Element) -> "ParticionFacturas":
+        return ParticionFacturas(
+            mes=el.get("mes", ""),
+            desde=el.get("desde", ""),
+            hasta=el.get("hasta", ""),
+            cantidad=int(el.get("cantidad", "0"))
+        )
+
+    @staticmethod
+    def leer_manifiesto(ruta: str) -> List[ParticionFacturas]:
+        tree = ET.parse(ruta)
+        return [ParticionFacturas.from_element(el) for el in tree.getroot().findall("particion")]
+
+    @staticmethod
+    def escribir_manifiesto(particiones: List[ParticionFacturas]) -> None:
+        root = ET.Element("manifiestoFacturas")
+        for particion in sorted(particiones, key=lambda p: p.mes):
+            root.append(particion.to_xml_element())
+
+        tree = ET.ElementTree(root)
+        ET.indent(tree, space="  ", level=0)
+        os.makedirs(DIR_FACTURAS, exist_ok=True)
+        try:
+            bloqueo.escribir_arbol(tree, RUTA_MANIFIESTO)
+        finally:
+            repositorio.invalidar(RUTA_MANIFIESTO)
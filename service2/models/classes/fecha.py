@@ -1,18 +1,30 @@
 import re
 from dataclasses import dataclass
+from datetime import date
 from models.exceptions import ValidationError
 
-@dataclass
+PATRON_FECHA = re.compile(r'\b\d{2}/\d{2}/\d{4}\b')
+
+@dataclass(slots=True)
 class Fecha:
+    valor: str
+    ordinal: int # date.toordinal(), para comparar rangos sin reparsear
 
     def __init__(self, text):
         self.valor = self.extraer_fecha(text)
+        try:
+            self.ordinal = ordinal_fecha(self.valor)
+        except ValueError:
+            raise ValidationError(f"Fecha inválida '{self.valor}'.")
 
     def extraer_fecha(self, text):
-        patron = r'\b\d{2}/\d{2}/\d{4}\b'
-        coincidencias = re.findall(patron, text)
-        if coincidencias:
-            return coincidencias[0]
+        # Formato canónico dd/mm/aaaa sin texto alrededor
+        if len(text) == 10 and text[2] == "/" and text[5] == "/" \
+                and text[:2].isdigit() and text[3:5].isdigit() and text[6:].isdigit():
+            return text
+        coincidencia = PATRON_FECHA.search(text)
+        if coincidencia:
+            return coincidencia.group(0)
         else:
             raise ValidationError(f"Sin coincidencias en fecha '{text}'.")
 
@@ -20,3 +32,10 @@ class Fecha:
         return self.valor
 
 
+def ordinal_fecha(texto: str) -> int:
+    """
+    Ordinal (date.toordinal) de una fecha dd/mm/aaaa. Lanza ValueError si no es válida.
+    """
+    if texto[2:3] != "/" or texto[5:6] != "/":
+        raise ValueError(f"Fecha inválida '{texto}'.")
+    return date(int(texto[6:10]), int(texto[3:5]), int(texto[:2])).toordinal()
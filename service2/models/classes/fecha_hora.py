@@ -1,21 +1,56 @@
 import re
 from dataclasses import dataclass
+from datetime import date, datetime
+from models.classes.fecha import ordinal_fecha
 from models.exceptions import ValidationError
 
-@dataclass
+PATRON_FECHA_HORA = re.compile(r'\b\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}\b')
+EPOCA_ORDINAL = date(1970, 1, 1).toordinal()
+
+@dataclass(slots=True)
 class FechaHora:
+    valor: str
+    minuto: int # minutos desde 01/01/1970 00:00, para comparar rangos sin reparsear
 
     def __init__(self, text):
         self.valor = self.extraer_fecha_hora(text)
+        try:
+            self.minuto = minuto_fecha_hora(self.valor)
+        except ValueError:
+            raise ValidationError(f"Fecha y hora inválida '{self.valor}'.")
 
     def extraer_fecha_hora(self, text):
-        patron = r'\b\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}\b'
-        coincidencias = re.findall(patron, text)
-        if coincidencias:
-            return coincidencias[0]
+        # Formato canónico dd/mm/aaaa hh:mm sin texto alrededor
+        if len(text) == 16 and text[2] == "/" and text[5] == "/" and text[10] == " " and text[13] == ":" \
+                and text[:2].isdigit() and text[3:5].isdigit() and text[6:10].isdigit() \
+                and text[11:13].isdigit() and text[14:].isdigit():
+            return text
+        coincidencia = PATRON_FECHA_HORA.search(text)
+        if coincidencia:
+            return coincidencia.group(0)
         else:
             raise ValidationError(f"Sin coincidencias en fecha y hora '{text}'.")
 
     def __str__(self):
         return self.valor
 
+
+def minuto_fecha_hora(texto: str) -> int:
+    """
+    Minutos desde la época de un texto "dd/mm/aaaa hh:mm" (la hora son siempre los
+    últimos 5 caracteres). Lanza ValueError si no es válido.
+    """
+    hora, minuto = int(texto[-5:-3]), int(texto[-2:])
+    if hora > 23 or minuto > 59:
+        raise ValueError(texto)
+    return (ordinal_fecha(texto) - EPOCA_ORDINAL) * 1440 + hora * 60 + minuto
+
+
+def minuto_epoca(fecha: datetime) -> int:
+    return (fecha.toordinal() - EPOCA_ORDINAL) * 1440 + fecha.hour * 60 + fecha.minute
+
+
+def fecha_de_minuto(minuto: int) -> str:
+    dia = date.fromordinal(EPOCA_ORDINAL + minuto // 1440)
+    hora, minuto = divmod(minuto % 1440, 60)
+    return f"{dia.day:02d}/{dia.month:02d}/{dia.year:04d} {hora:02d}:{minuto:02d}"
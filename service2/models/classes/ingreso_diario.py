@@ -0,0 +1,300 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from models.xml_backend import ET
+from models.classes.fecha import ordinal_fecha
+from models.repositorio import repositorio
+from models import almacen_sqlite, bloqueo
+
+if TYPE_CHECKING:
+    from models.classes.factura import Factura
+
+# Ingresos facturados por día de emisión, por configuración, categoría y recurso. Se
+# actualizan al guardar cada lote de facturas, así los reportes leen solo los días
+# del rango y no las facturas.
+RUTA_INGRESOS = "data/ingresos_diarios.xml"
+
+TIPOS = ("configuracion", "categoria", "recurso")
+
+# (fechaEmision, tipo, id) -> monto
+Totales = Dict[Tuple[str, str, int], float]
+
+
+@dataclass(slots=True)
+class IngresoDiario:
+    fecha: str # fechaEmision dd/mm/aaaa
+    tipo: str # "configuracion" | "categoria" | "recurso"
+    id: int
+    monto: float
+    ordinal: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.ordinal = ordinal_fecha(self.fecha)
+
+    def to_xml_element(self) -> ET.Element:
+        return ET.Element("ingreso", attrib={
+            "fecha": self.fecha,
+            "tipo": self.tipo,
+            "id": str(self.id),
+            "monto": repr(self.monto)
+        })
+
+    @staticmethod
+    def from_element(el: ET.Element) -> IngresoDiario:
+        return IngresoDiario(
+            fecha=el.get("fecha", ""),
+            tipo=el.get("tipo", ""),
+            id=int(el.get("id", "0")),
+            monto=float(el.get("monto", "0"))
+        )
+
+    @staticmethod
+    def calcular(facturas: List[Factura]) -> Totales:
+        """
+        Ingresos de las facturas por día, con los valores guardados en cada detalle al
+        facturar: el subtotal (en centavos, como en la factura) suma a su configuración
+        y a la categoría de ésta, y cada recurso aporta su monto. Los detalles
+        facturados antes de guardar la categoría y los montos se calculan como antes,
+        con la categoría actual de la configuración y cantidad * valorXhora * horas.
+        Las facturas sin fecha de emisión válida no se incluyen (no entran en ningún
+        rango).
+        """
+        totales: Totales = {}
+        actuales = _ValoresActuales()
+        for factura in facturas:
+            if factura.ordinalEmision is None:
+                continue
+            fecha = factura.fechaEmision
+            for detalle in factura.detalles:
+                subtotal = round(detalle.subtotal, 2)
+                IngresoDiario._sumar(totales, (fecha, "configuracion", detalle.idConfiguracion), subtotal)
+                id_categoria = detalle.idCategoria
+                if id_categoria is None:
+                    id_categoria = actuales.categoria(detalle.idConfiguracion)
+                if id_categoria is not None:
+                    IngresoDiario._sumar(totales, (fecha, "categoria", id_categoria), subtotal)
+                for rid, cantidad in detalle.recursos_cantidad.items():
+                    monto = detalle.recursos_monto.get(rid)
+                    if monto is None:
+                        monto = actuales.aporte(rid, cantidad, detalle.horas)
+                    if monto is not None:
+                        IngresoDiario._sumar(totales, (fecha, "recurso", rid), monto)
+        return totales
+
+    @staticmethod
+    def get_totales(fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Dict[int, float]]:
+        """
+        Retorna {tipo: {id: monto}} con la suma de los ingresos de los días del rango
+        (inclusive).
+        """
+        totales: Dict[str, Dict[int, float]] = {tipo: {} for tipo in TIPOS}
+        if almacen_sqlite.activo():
+            filas = IngresoDiario._sqlite_sumar(fecha_inicio, fecha_fin)
+        else:
+            filas = ((i.tipo, i.id, i.monto) for i in IngresoDiario._xml_rango(fecha_inicio, fecha_fin))
+        for tipo, id_, monto in filas:
+            grupo = totales.setdefault(tipo, {})
+            grupo[id_] = grupo.get(id_, 0.0) + monto
+        return totales
+
+    @staticmethod
+    def reconstruir() -> int:
+        """
+        Vuelve a calcular los ingresos acumulados recorriendo todas las facturas
+        guardadas (p.ej. facturas de antes de los acumulados). Retorna la cantidad de
+        facturas recorridas.
+        """
+        if almacen_sqlite.activo():
+            return IngresoDiario._sqlite_reconstruir()
+        with bloqueo.escritura():
+            return IngresoDiario._xml_reconstruir()
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    @staticmethod
+    def _sumar(totales: Totales, clave: Tuple[str, str, int], monto: float) -> None:
+        totales[clave] = totales.get(clave, 0.0) + monto
+
+    @staticmethod
+    def _total_facturas() -> int:
+        """
+        Facturas guardadas, con o sin fecha de emisión válida: es la cantidad que
+        cubren los acumulados (las que no tienen fecha se cuentan aunque no sumen).
+        """
+        from models.classes.factura import Factura
+
+        return sum(particion.cantidad for particion in Factura.get_particiones())
+
+    @staticmethod
+    def _xml_leer() -> IngresosDiarios:
+        try:
+            return repositorio.obtener(RUTA_INGRESOS, IngresosDiarios.leer)
+        except FileNotFoundError:
+            return IngresosDiarios(facturas=0, filas=[], ordinales=[])
+
+    @staticmethod
+    def _xml_acumular(facturas: List[Factura]) -> None:
+        """
+        Suma los ingresos de las facturas recién guardadas en data/ingresos_diarios.xml.
+        Se llama con el bloqueo de escritura, después de escribir las particiones.
+        """
+        ingresos = IngresoDiario._xml_leer()
+        totales = IngresoDiario.calcular(facturas)
+        for ingreso in ingresos.filas:
+            IngresoDiario._sumar(totales, (ingreso.fecha, ingreso.tipo, ingreso.id), ingreso.monto)
+        IngresoDiario._xml_escribir(totales, ingresos.facturas + len(facturas))
+
+    @staticmethod
+    def _xml_rango(fecha_inicio: datetime, fecha_fin: datetime) -> List[IngresoDiario]:
+        from models.classes.factura import Factura
+
+        Factura._migrar_archivo_unico()
+        ingresos = IngresoDiario._xml_leer()
+        if ingresos.facturas != IngresoDiario._total_facturas():
+            # Facturas guardadas sin acumular (p.ej. anteriores a los acumulados)
+            with bloqueo.escritura():
+                ingresos = IngresoDiario._xml_leer()
+                if ingresos.facturas != IngresoDiario._total_facturas():
+                    IngresoDiario._xml_reconstruir()
+                    ingresos = IngresoDiario._xml_leer()
+        desde = bisect_left(ingresos.ordinales, fecha_inicio.toordinal())
+        hasta = bisect_right(ingresos.ordinales, fecha_fin.toordinal())
+        return ingresos.filas[desde:hasta]
+
+    @staticmethod
+    def _xml_reconstruir() -> int:
+        from models.classes.factura import Factura
+
+        Factura._migrar_archivo_unico()
+        facturas = []
+        for particion in Factura.get_particiones():
+            facturas.extend(Factura._leer_particion(particion))
+        IngresoDiario._xml_escribir(IngresoDiario.calcular(facturas), len(facturas))
+        return len(facturas)
+
+    @staticmethod
+    def _xml_escribir(totales: Totales, cantidad_facturas: int) -> None:
+        filas = [IngresoDiario(fecha, tipo, id_, monto) for (fecha, tipo, id_), monto in totales.items()]
+        filas.sort(key=lambda i: (i.ordinal, i.tipo, i.id))
+
+        root = ET.Element("ingresosDiarios", attrib={"facturas": str(cantidad_facturas)})
+        for ingreso in filas:
+            root.append(ingreso.to_xml_element())
+        tree = ET.ElementTree(root)
+        ET.indent(tree, space="  ", level=0)
+        try:
+            bloqueo.escribir_arbol(tree, RUTA_INGRESOS)
+        finally:
+            repositorio.invalidar(RUTA_INGRESOS)
+
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_orden(fecha: datetime) -> int:
+        return int(fecha.strftime("%Y%m%d"))
+
+    @staticmethod
+    def _sqlite_acumular(conn, totales: Totales, cantidad_facturas: int) -> None:
+        """
+        Suma los totales de `cantidad_facturas` facturas en la tabla ingresos_diarios
+        dentro de la transacción `conn` en la que se insertan las facturas.
+        """
+        conn.executemany(
+            "INSERT INTO ingresos_diarios (fechaOrden, fecha, tipo, id, monto) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (fechaOrden, tipo, id) DO UPDATE SET monto = monto + excluded.monto",
+            [
+                (IngresoDiario._sqlite_orden(datetime.strptime(fecha, "%d/%m/%Y")), fecha, tipo, id_, monto)
+                for (fecha, tipo, id_), monto in totales.items()
+            ]
+        )
+        conn.execute(
+            "INSERT INTO ingresos_cobertura (id, facturas) VALUES (1, ?) "
+            "ON CONFLICT (id) DO UPDATE SET facturas = facturas + excluded.facturas",
+            (cantidad_facturas,)
+        )
+
+    @staticmethod
+    def _sqlite_sumar(fecha_inicio: datetime, fecha_fin: datetime) -> List[Tuple[str, int, float]]:
+        if not IngresoDiario._sqlite_completos(almacen_sqlite.conexion()):
+            IngresoDiario._sqlite_reconstruir(solo_incompletos=True)
+        return almacen_sqlite.consultar(
+            "SELECT tipo, id, SUM(monto) FROM ingresos_diarios WHERE fechaOrden BETWEEN ? AND ? GROUP BY tipo, id",
+            (IngresoDiario._sqlite_orden(fecha_inicio), IngresoDiario._sqlite_orden(fecha_fin))
+        )
+
+    @staticmethod
+    def _sqlite_completos(conn) -> bool:
+        # Como en el motor xml, se cuentan todas las facturas, con o sin fecha válida
+        fila = conn.execute("SELECT facturas FROM ingresos_cobertura WHERE id = 1").fetchone()
+        total = conn.execute("SELECT COUNT(*) FROM facturas").fetchone()[0]
+        return (fila[0] if fila else 0) == total
+
+    @staticmethod
+    def _sqlite_reconstruir(solo_incompletos: bool = False) -> int:
+        from models.classes.factura import Factura
+
+        with almacen_sqlite.transaccion() as conn:
+            if solo_incompletos and IngresoDiario._sqlite_completos(conn):
+                return 0
+            facturas = [
+                Factura.from_element(ET.fromstring(xml.encode("utf-8")))
+                for (xml,) in conn.execute("SELECT xml FROM facturas ORDER BY rowid")
+            ]
+            conn.execute("DELETE FROM ingresos_diarios")
+            conn.execute("DELETE FROM ingresos_cobertura")
+            IngresoDiario._sqlite_acumular(conn, IngresoDiario.calcular(facturas), len(facturas))
+        return len(facturas)
+
+
+@dataclass
+class IngresosDiarios:
+    """
+    Contenido de data/ingresos_diarios.xml: las filas ordenadas por fecha y la
+    cantidad de facturas que acumulan (todas las guardadas, ver `_total_facturas`).
+    """
+    facturas: int
+    filas: List[IngresoDiario]
+    ordinales: List[int]
+
+    def __len__(self) -> int:
+        return len(self.filas)
+
+    @staticmethod
+    def leer(ruta: str) -> IngresosDiarios:
+        root = ET.parse(ruta).getroot()
+        filas = [IngresoDiario.from_element(el) for el in root.findall("ingreso")]
+        return IngresosDiarios(
+            facturas=int(root.get("facturas", "0")),
+            filas=filas,
+            ordinales=[ingreso.ordinal for ingreso in filas]
+        )
+
+
+class _ValoresActuales:
+    """
+    Categoría de cada configuración y precio de cada recurso actuales, para los
+    detalles facturados sin esos valores. Se leen solo si hacen falta.
+    """
+
+    def __init__(self):
+        self._gestor = None
+        self._recursos = None
+
+    def categoria(self, id_configuracion: int) -> Optional[int]:
+        if self._gestor is None:
+            from models.classes.categoria import GestorCategoria
+            self._gestor = GestorCategoria()
+        return self._gestor.get_categoria_id_by_config_id(id_configuracion)
+
+    def aporte(self, id_recurso: int, cantidad: float, horas: float) -> Optional[float]:
+        if self._recursos is None:
+            from models.classes.recurso import Recurso
+            self._recursos = Recurso.get_dict_recursos()
+        recurso = self._recursos.get(id_recurso)
+        if recurso is None:
+            return None
+        return cantidad * recurso.valorXhora * horas
@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import Dict, List, Optional
-import xml.etree.ElementTree as ET
+import sys
+from models.xml_backend import ET
 from dataclasses import dataclass
 from models.classes.fecha import Fecha
 from models.exceptions import ValidationError
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class Instancia:
     id: int
     idConfiguracion: int
@@ -19,7 +20,7 @@ class Instancia:
         self.idConfiguracion = idConfiguracion
         self.nombre = nombre
         self.fechaInicio = Fecha(fechaInicio)
-        self.estado = estado.capitalize()
+        self.estado = sys.intern(estado.capitalize())
         self.fechaFinal = Fecha(fechaFinal) if fechaFinal != "" else None
         self.check_state()
 
@@ -1,8 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
-import xml.etree.ElementTree as ET
+import sys
+from models.xml_backend import ET
 from models.exceptions import ValidationError
+from models.repositorio import repositorio
+from models import almacen_sqlite, bloqueo, cola_escritura, snapshot
+
+RUTA_RECURSOS = "data/recursos.xml"
 
 @dataclass
 class Recurso:
@@ -14,7 +19,9 @@ class Recurso:
     valorXhora: float
 
     def __post_init__(self):
-        self.tipo = self.tipo.capitalize()
+        if isinstance(self.metrica, str):
+            self.metrica = sys.intern(self.metrica)
+        self.tipo = sys.intern(self.tipo.capitalize())
         if self.tipo not in ["Hardware", "Software"]:
             raise ValidationError(f"Tipo de recurso inválido '{self.tipo}'.")
 
@@ -40,13 +47,9 @@ class Recurso:
     @staticmethod
     def get_all() -> List[Recurso]:
         try:
-            tree = ET.parse("data/recursos.xml")
-            root = tree.getroot()
-            recursos = []
-            for r in root.findall("recurso"):
-                rec = Recurso.from_element(r)
-                recursos.append(rec)
-            return recursos
+            if almacen_sqlite.activo():
+                return Recurso._sqlite_leer()
+            return list(repositorio.obtener(RUTA_RECURSOS, Recurso._leer_xml))
         except Exception as e:
             print(f"Error inesperado al leer recursos.xml: {e}")
             return []
@@ -55,18 +58,27 @@ class Recurso:
     @staticmethod
     def get_dict_recursos() -> Dict[int, Recurso]:
         try:
-            tree = ET.parse("data/recursos.xml")
-            root = tree.getroot()
-            recursos = {}
-            for r in root.findall("recurso"):
-                rec = Recurso.from_element(r)
-                recursos[rec.id] = rec
-            return recursos
+            if almacen_sqlite.activo():
+                return {rec.id: rec for rec in Recurso._sqlite_leer()}
+            return dict(repositorio.obtener(RUTA_RECURSOS, Recurso._leer_dict_xml, "por_id"))
         except Exception as e:
             print(f"Error inesperado al leer recursos.xml: {e}")
             return {}
 
- 
+    @staticmethod
+    def _leer_xml(ruta: str) -> List[Recurso]:
+        return snapshot.leer(ruta, Recurso._parsear_xml)
+
+    @staticmethod
+    def _parsear_xml(ruta: str) -> List[Recurso]:
+        tree = ET.parse(ruta)
+        root = tree.getroot()
+        return [Recurso.from_element(r) for r in root.findall("recurso")]
+
+    @staticmethod
+    def _leer_dict_xml(ruta: str) -> Dict[int, Recurso]:
+        recursos = repositorio.obtener(ruta, Recurso._leer_xml)
+        return {rec.id: rec for rec in recursos}
 
     @staticmethod
     def from_element(el: ET.Element) -> "Recurso":
@@ -81,25 +93,76 @@ class Recurso:
 
     @staticmethod
     def write_xml(recursos: List["Recurso"]):
+        if almacen_sqlite.activo():
+            return Recurso._sqlite_reemplazar(recursos)
+        Recurso._escribir_xml(recursos)
+
+    @staticmethod
+    def _escribir_xml(recursos: List["Recurso"]):
         root = ET.Element("listaRecursos")
         for recurso in recursos:
             root.append(recurso.to_xml_element())
 
         tree = ET.ElementTree(root)
         ET.indent(tree, space="  ", level=0)
-        tree.write("data/recursos.xml", encoding="utf-8", xml_declaration=True)
+        with bloqueo.escritura():
+            try:
+                bloqueo.escribir_arbol(tree, RUTA_RECURSOS)
+                snapshot.guardar(RUTA_RECURSOS, recursos)
+            finally:
+                repositorio.invalidar(RUTA_RECURSOS)
 
     @staticmethod
     def add_recurso(nombre:str, abreviatura:str, metrica:str, tipo:str, valorXhora: float ) -> None:
-        recursos = Recurso.get_all()
-        new_recurso = Recurso(
-            id= 100 + len(recursos) + 1,
-            nombre=nombre,
-            abreviatura=abreviatura,
-            metrica=metrica,
-            tipo=tipo,
-            valorXhora=valorXhora
+        if almacen_sqlite.activo():
+            return Recurso._sqlite_agregar(nombre, abreviatura, metrica, tipo, valorXhora)
+
+        def agregar(recursos: List[Recurso]) -> None:
+            new_recurso = Recurso(
+                id= 100 + len(recursos) + 1,
+                nombre=nombre,
+                abreviatura=abreviatura,
+                metrica=metrica,
+                tipo=tipo,
+                valorXhora=valorXhora
+            )
+            recursos.append(new_recurso)
+
+        cola_escritura.aplicar(RUTA_RECURSOS, Recurso.get_all, Recurso.write_xml, agregar)
+
+    # ------------------------------
+    # MOTOR SQLITE
+    # ------------------------------
+    @staticmethod
+    def _sqlite_leer() -> List[Recurso]:
+        filas = almacen_sqlite.consultar(
+            "SELECT id, nombre, abreviatura, metrica, tipo, valorXhora FROM recursos ORDER BY rowid"
         )
-        recursos.append(new_recurso)
-        Recurso.write_xml(recursos)
+        return [Recurso(*fila) for fila in filas]
 
+    @staticmethod
+    def _sqlite_insertar(conn, recurso: Recurso) -> None:
+        conn.execute(
+            "INSERT INTO recursos (id, nombre, abreviatura, metrica, tipo, valorXhora) VALUES (?, ?, ?, ?, ?, ?)",
+            (recurso.id, recurso.nombre, recurso.abreviatura, recurso.metrica, recurso.tipo, recurso.valorXhora)
+        )
+
+    @staticmethod
+    def _sqlite_reemplazar(recursos: List[Recurso]) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            conn.execute("DELETE FROM recursos")
+            for recurso in recursos:
+                Recurso._sqlite_insertar(conn, recurso)
+
+    @staticmethod
+    def _sqlite_agregar(nombre: str, abreviatura: str, metrica: str, tipo: str, valorXhora: float) -> None:
+        with almacen_sqlite.transaccion() as conn:
+            cantidad = conn.execute("SELECT COUNT(*) FROM recursos").fetchone()[0]
+            Recurso._sqlite_insertar(conn, Recurso(
+                id=100 + cantidad + 1,
+                nombre=nombre,
+                abreviatura=abreviatura,
+                metrica=metrica,
+                tipo=tipo,
+                valorXhora=valorXhora
+            ))
@@ -0,0 +1,115 @@
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+import copy
+import threading
+import time
+import config
+from models import bloqueo
+
+Mutacion = Callable[[List], None]
+
+# Espera máxima de un lote, en ventanas, aunque sigan llegando mutaciones
+VENTANAS_MAXIMAS = 10
+
+
+class ColaEscritura:
+    """
+    Cola de escritura diferida (group commit) para un archivo XML.
+
+    Una mutación que llega sola se escribe de inmediato. Las que llegan mientras se
+    escribe el lote anterior forman el siguiente, que espera a las que sigan llegando
+    con menos de `ventana` segundos entre una y otra (como máximo VENTANAS_MAXIMAS
+    ventanas). Las mutaciones del lote se aplican en orden de llegada sobre una copia
+    de una única lectura del archivo, así los objetos del repositorio no cambian hasta
+    que la escritura (atómica, con fsync) los reemplaza. El futuro de cada mutación se
+    resuelve cuando su lote quedó escrito; si la mutación falla, el futuro recibe su
+    excepción y el resto del lote se escribe igualmente.
+    """
+
+    def __init__(self, ruta: str, leer: Callable[[], List], escribir: Callable[[List], None], ventana: float):
+        self.ruta = ruta
+        self._leer = leer
+        self._escribir = escribir
+        self._ventana = ventana
+        self._pendientes: List[Tuple[Mutacion, Future]] = []
+        self._condicion = threading.Condition()
+        self._hilo = None
+
+    def encolar(self, mutacion: Mutacion) -> Future:
+        futuro: Future = Future()
+        with self._condicion:
+            self._pendientes.append((mutacion, futuro))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name=f"cola-{self.ruta}", daemon=True)
+                self._hilo.start()
+            self._condicion.notify()
+        return futuro
+
+    def _trabajar(self) -> None:
+        while True:
+            with self._condicion:
+                while not self._pendientes:
+                    self._condicion.wait()
+                # Ráfaga: se espera mientras sigan llegando mutaciones
+                limite = time.monotonic() + self._ventana * VENTANAS_MAXIMAS
+                while len(self._pendientes) > 1:
+                    cantidad = len(self._pendientes)
+                    espera = min(self._ventana, limite - time.monotonic())
+                    if espera <= 0:
+                        break
+                    self._condicion.wait(espera)
+                    if len(self._pendientes) == cantidad:
+                        break
+                lote, self._pendientes = self._pendientes, []
+            self._aplicar(lote)
+
+    def _aplicar(self, lote: List[Tuple[Mutacion, Future]]) -> None:
+        # La lectura y la escritura del lote forman un único ciclo con bloqueo exclusivo,
+        # así otro proceso no puede escribir el archivo entre ambas
+        with bloqueo.escritura():
+            self._aplicar_bloqueado(lote)
+
+    def _aplicar_bloqueado(self, lote: List[Tuple[Mutacion, Future]]) -> None:
+        try:
+            datos = copy.deepcopy(self._leer())
+        except Exception as e:
+            for _, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        aplicados = []
+        for mutacion, futuro in lote:
+            try:
+                mutacion(datos)
+                aplicados.append(futuro)
+            except Exception as e:
+                futuro.set_exception(e)
+
+        if aplicados:
+            try:
+                self._escribir(datos)
+            except Exception as e:
+                for futuro in aplicados:
+                    futuro.set_exception(e)
+                return
+
+        for futuro in aplicados:
+            futuro.set_result(len(lote))
+
+
+_colas: Dict[str, ColaEscritura] = {}
+_lock_colas = threading.Lock()
+
+
+def aplicar(ruta: str, leer: Callable[[], List], escribir: Callable[[List], None], mutacion: Mutacion) -> None:
+    """
+    Encola `mutacion` en la cola del archivo y espera a que su lote se escriba.
+    Relanza la excepción de la mutación o de la escritura.
+    """
+    with _lock_colas:
+        cola = _colas.get(ruta)
+        if cola is None:
+            cola = ColaEscritura(ruta, leer, escribir, config.COLA_ESCRITURA_VENTANA_MS / 1000)
+            _colas[ruta] = cola
+    cola.encolar(mutacion).result()
@@ -0,0 +1,251 @@
+"""
+Almacén columnar de los consumos, mapeado en memoria desde data/consumos.columnas/.
+
+Cada fila de consumo (en el mismo orden que `GrupoConsumos.iterar_consumos`) ocupa
+una posición en cuatro archivos binarios de ancho fijo:
+
+    instancia  int32    índice en claves.tsv (nitCliente, idInstancia)
+    minuto     int32    fecha y hora en minutos desde 01/01/1970
+    horas      float64  tiempo consumido
+    facturado  uint8    1 si el consumo ya fue facturado
+
+Los lectores obtienen vistas `memoryview` sobre los mapas, sin copiar los datos; como
+los archivos se mapean compartidos, varios procesos usan las mismas páginas.
+
+El archivo `estado` guarda la cantidad de filas válidas, la primera fila no facturada
+y la firma de los archivos fuente (consumos.xml, su bitácora y las marcas de
+facturado) con la que las columnas están sincronizadas. Las cargas de consumos y el
+marcado de facturados actualizan las columnas en el mismo paso; cualquier otro
+cambio (compactación, edición externa) se detecta por la firma y las columnas se
+reconstruyen al abrirlas.
+
+Las filas anteriores a la primera no facturada no se recorren al buscar pendientes,
+así una facturación recorre solo los consumos posteriores a lo ya facturado.
+"""
+from __future__ import annotations
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import mmap
+import os
+import sys
+from models import bloqueo
+from models.classes.fecha_hora import fecha_de_minuto, minuto_epoca
+from models.repositorio import repositorio, RepositorioXml, Firma
+
+DIR_COLUMNAS = "data/consumos.columnas"
+COLUMNAS = {"instancia": "i", "minuto": "i", "horas": "d", "facturado": "B"}
+
+Clave = Tuple[str, int]
+# (filas, primera fila no facturada, firmas de los archivos fuente)
+Estado = Tuple[int, int, Tuple[Optional[Firma], ...]]
+
+
+class VistaColumnas:
+    """
+    Vista de solo lectura sobre las columnas. Usar como context manager para liberar
+    los mapas al terminar.
+    """
+
+    def __init__(self, directorio: str, filas: int, claves: List[Clave], primera_pendiente: int = 0):
+        self.filas = filas
+        self.primera_pendiente = primera_pendiente
+        self.claves = claves
+        self._mapas: List[mmap.mmap] = []
+        self._vistas: List[memoryview] = []
+        self.instancia = self._mapear(directorio, "instancia")
+        self.minuto = self._mapear(directorio, "minuto")
+        self.horas = self._mapear(directorio, "horas")
+        self.facturado = self._mapear(directorio, "facturado")
+
+    def _mapear(self, directorio: str, nombre: str) -> memoryview:
+        tipo = COLUMNAS[nombre]
+        tamano = array(tipo).itemsize * self.filas
+        if tamano == 0:
+            return memoryview(b"").cast(tipo)
+        with open(os.path.join(directorio, nombre), "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(mapa)[:tamano].cast(tipo)
+        self._mapas.append(mapa)
+        self._vistas.append(vista)
+        return vista
+
+    def cerrar(self) -> None:
+        for vista in self._vistas:
+            vista.release()
+        for mapa in self._mapas:
+            mapa.close()
+        self._vistas, self._mapas = [], []
+
+    def __enter__(self) -> "VistaColumnas":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.cerrar()
+
+
+class ColumnasConsumo:
+    """
+    Mantiene las columnas sincronizadas con los archivos fuente `fuentes` (consumos.xml
+    y su bitácora). `iterar` recorre las filas de los XML para reconstruirlas.
+    """
+
+    def __init__(self, directorio: str, fuentes: Tuple[str, ...],
+                 iterar: Callable[[], Iterable[Tuple[str, int, object]]]):
+        self.directorio = directorio
+        self.fuentes = fuentes
+        self._iterar = iterar
+        self.ruta_estado = os.path.join(directorio, "estado")
+        self.ruta_claves = os.path.join(directorio, "claves.tsv")
+
+    def abrir(self) -> VistaColumnas:
+        """
+        Retorna una vista de las columnas, reconstruyéndolas antes si los XML cambiaron.
+        """
+        estado = self._leer_estado()
+        if estado is None or estado[2] != self.firmas():
+            with bloqueo.escritura():
+                estado = self._leer_estado()
+                if estado is None or estado[2] != self.firmas():
+                    estado = self.reconstruir()
+        return VistaColumnas(self.directorio, estado[0], self._claves(), estado[1])
+
+    def reconstruir(self) -> Estado:
+        """
+        Regenera todas las columnas recorriendo los XML.
+        """
+        with bloqueo.escritura():
+            firmas = self.firmas()
+            claves: Dict[Clave, int] = {}
+            columnas = {nombre: array(tipo) for nombre, tipo in COLUMNAS.items()}
+            for nit, id_instancia, consumo in self._iterar():
+                columnas["instancia"].append(claves.setdefault((nit, id_instancia), len(claves)))
+                columnas["minuto"].append(consumo.fechaHora.minuto)
+                columnas["horas"].append(consumo.tiempo)
+                columnas["facturado"].append(1 if consumo.facturado else 0)
+
+            os.makedirs(self.directorio, exist_ok=True)
+            for nombre, datos in columnas.items():
+                with bloqueo.archivo_temporal(os.path.join(self.directorio, nombre)) as temporal, open(temporal, "wb") as f:
+                    datos.tofile(f)
+            self._escribir_claves(list(claves))
+            filas = len(columnas["instancia"])
+            primera = columnas["facturado"].tobytes().find(0)
+            estado = (filas, filas if primera < 0 else primera, firmas)
+            self._escribir_estado(estado)
+            return estado
+
+    def anexar(self, filas: List[Tuple[str, int, int, float]], firmas_previas: Tuple[Optional[Firma], ...]) -> None:
+        """
+        Agrega al final las filas (nit, idInstancia, minuto, horas) recién anexadas a los
+        XML. `firmas_previas` son las firmas de los XML antes de anexarlas; si las
+        columnas no estaban sincronizadas con ellas no se tocan y se reconstruirán.
+        """
+        with bloqueo.escritura():
+            estado = self._leer_estado()
+            if estado is None or estado[2] != firmas_previas:
+                return
+            lista_claves = self._claves()
+            claves = {clave: i for i, clave in enumerate(lista_claves)}
+            columnas = {nombre: array(tipo) for nombre, tipo in COLUMNAS.items()}
+            for nit, id_instancia, minuto, horas in filas:
+                clave = (nit, id_instancia)
+                if clave not in claves:
+                    claves[clave] = len(lista_claves)
+                    lista_claves.append(clave)
+                columnas["instancia"].append(claves[clave])
+                columnas["minuto"].append(minuto)
+                columnas["horas"].append(horas)
+                columnas["facturado"].append(0)
+
+            for nombre, datos in columnas.items():
+                with open(os.path.join(self.directorio, nombre), "r+b") as f:
+                    # Descarta lo que haya quedado de una escritura interrumpida
+                    f.truncate(estado[0] * datos.itemsize)
+                    f.seek(0, os.SEEK_END)
+                    datos.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if len(lista_claves) > len(self._claves()):
+                self._escribir_claves(lista_claves)
+            self._escribir_estado((estado[0] + len(filas), estado[1], self.firmas()))
+
+    def seleccionar(self, vista: VistaColumnas, claves: Set[Clave], minuto_inicio: int,
+                    minuto_fin: int) -> List[int]:
+        """
+        Filas no facturadas de `claves` dentro del rango, en orden creciente.
+        """
+        indices = {i for i, clave in enumerate(vista.claves) if clave in claves}
+        if not indices:
+            return []
+        facturado, minuto, instancia = vista.facturado, vista.minuto, vista.instancia
+        return [
+            fila for fila in range(vista.primera_pendiente, vista.filas)
+            if not facturado[fila] and instancia[fila] in indices and minuto_inicio <= minuto[fila] <= minuto_fin
+        ]
+
+    def marcar_filas(self, filas: List[int], firmas_previas: Tuple[Optional[Firma], ...]) -> None:
+        """
+        Marca en su lugar las filas indicadas como facturadas, igual que se marcaron en
+        los archivos fuente, y avanza la primera fila no facturada.
+        """
+        with bloqueo.escritura():
+            estado = self._leer_estado()
+            if estado is None or estado[2] != firmas_previas:
+                return
+            total, primera, _ = estado
+            if filas and total > 0:
+                with open(os.path.join(self.directorio, "facturado"), "r+b") as f, \
+                        mmap.mmap(f.fileno(), 0) as mapa:
+                    facturado = memoryview(mapa)[:total].cast("B")
+                    for fila in filas:
+                        facturado[fila] = 1
+                    while primera < total and facturado[primera]:
+                        primera += 1
+                    facturado.release()
+                    mapa.flush()
+            self._escribir_estado((total, primera, self.firmas()))
+
+    def firmas(self) -> Tuple[Optional[Firma], ...]:
+        """
+        Firmas actuales de los archivos fuente.
+        """
+        return tuple(RepositorioXml.firma_opcional(ruta) for ruta in self.fuentes)
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _leer_estado(self) -> Optional[Estado]:
+        try:
+            with open(self.ruta_estado, "r", encoding="utf-8") as f:
+                partes = f.read().split()
+        except FileNotFoundError:
+            return None
+        try:
+            firmas = tuple(None if p == "-" else tuple(int(v) for v in p.split(",")) for p in partes[2:])
+            return int(partes[0]), int(partes[1]), firmas
+        except (ValueError, IndexError):
+            return None
+
+    def _escribir_estado(self, estado: Estado) -> None:
+        filas, primera, firmas = estado
+        texto = " ".join([str(filas), str(primera)] + ["-" if f is None else ",".join(map(str, f)) for f in firmas])
+        with bloqueo.archivo_temporal(self.ruta_estado) as temporal, open(temporal, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+
+    def _claves(self) -> List[Clave]:
+        return list(repositorio.obtener(self.ruta_claves, ColumnasConsumo._leer_claves))
+
+    @staticmethod
+    def _leer_claves(ruta: str) -> List[Clave]:
+        claves = []
+        with open(ruta, "r", encoding="utf-8") as f:
+            for linea in f:
+                nit, id_instancia = linea.rstrip("\n").split("\t")
+                claves.append((sys.intern(nit), int(id_instancia)))
+        return claves
+
+    def _escribir_claves(self, claves: List[Clave]) -> None:
+        with bloqueo.archivo_temporal(self.ruta_claves) as temporal, open(temporal, "w", encoding="utf-8") as f:
+            for nit, id_instancia in claves:
+                f.write(f"{nit}\t{id_instancia}\n")
+        repositorio.invalidar(self.ruta_claves)
@@ -2,3 +2,7 @@ class ValidationError(ValueError):
     """Errores de validación."""
     pass
 
+
+class XmlInvalidoError(ValueError):
+    """Archivo XML mal formado o que no cumple su esquema XSD."""
+    pass
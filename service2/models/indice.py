@@ -0,0 +1,95 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import unescape
+from models.xml_backend import ET
+import mmap
+import os
+import re
+from models.repositorio import repositorio, RepositorioXml
+from models import bloqueo
+
+# (desplazamiento en bytes, longitud en bytes) del elemento dentro del archivo XML
+Posicion = Tuple[int, int]
+
+
+class IndiceXml:
+    """
+    Índice persistente (archivo `<ruta_xml>.idx`) que asocia el valor de un atributo
+    de los elementos `etiqueta` con su posición en bytes dentro del archivo XML.
+
+    Permite leer un único elemento con seek + parse sin cargar el archivo completo.
+    El índice guarda la firma del XML con la que se construyó y se reconstruye si
+    esta ya no coincide (p.ej. el archivo fue editado externamente).
+    """
+
+    def __init__(self, ruta_xml: str, etiqueta: str, atributo: str):
+        self.ruta_xml = ruta_xml
+        self.ruta_indice = f"{ruta_xml}.idx"
+        self.etiqueta = etiqueta
+        self._patron_inicio = re.compile(
+            rb"<" + etiqueta.encode() + rb"\b[^>]*?\b" + atributo.encode() + rb"=\"([^\"]*)\"[^>]*>"
+        )
+        self._cierre = b"</" + etiqueta.encode() + b">"
+
+    def buscar(self, clave: str) -> Optional[ET.Element]:
+        """
+        Retorna el elemento con el valor de atributo indicado o None si no existe.
+        """
+        with bloqueo.lectura():
+            if not os.path.exists(self.ruta_xml):
+                return None
+            posicion = self._entradas().get(str(clave))
+            if posicion is None:
+                return None
+            desplazamiento, longitud = posicion
+            with open(self.ruta_xml, "rb") as f:
+                f.seek(desplazamiento)
+                return ET.fromstring(f.read(longitud))
+
+    def reconstruir(self) -> Dict[str, Posicion]:
+        """
+        Recorre el archivo XML y reescribe el índice. Retorna las entradas.
+        """
+        firma = RepositorioXml.firma(self.ruta_xml)
+        entradas: Dict[str, Posicion] = {}
+        with open(self.ruta_xml, "rb") as f:
+            if firma[1] > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                    for m in self._patron_inicio.finditer(datos):
+                        inicio = m.start()
+                        if datos[m.end() - 2:m.end()] == b"/>":
+                            fin = m.end()
+                        else:
+                            fin = datos.find(self._cierre, m.end())
+                            if fin < 0:
+                                break
+                            fin += len(self._cierre)
+                        clave = unescape(m.group(1).decode("utf-8"), {"&quot;": '"'})
+                        entradas.setdefault(clave, (inicio, fin - inicio))
+
+        with bloqueo.archivo_temporal(self.ruta_indice) as temporal, open(temporal, "w", encoding="utf-8") as f:
+            f.write("# {} {} {}\n".format(*firma))
+            for clave, (desplazamiento, longitud) in entradas.items():
+                f.write(f"{clave}\t{desplazamiento}\t{longitud}\n")
+        repositorio.invalidar(self.ruta_indice)
+        return entradas
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _entradas(self) -> Dict[str, Posicion]:
+        if not os.path.exists(self.ruta_indice):
+            self.reconstruir()
+        return repositorio.obtener(self.ruta_indice, self._leer, "indice", (self.ruta_xml,))
+
+    def _leer(self, ruta: str) -> Dict[str, Posicion]:
+        with open(ruta, "r", encoding="utf-8") as f:
+            encabezado = f.readline().split()
+            firma = tuple(int(v) for v in encabezado[1:]) if encabezado[:1] == ["#"] else None
+            if firma != RepositorioXml.firma(self.ruta_xml):
+                return self.reconstruir()
+            entradas: Dict[str, Posicion] = {}
+            for linea in f:
+                clave, desplazamiento, longitud = linea.rstrip("\n").split("\t")
+                entradas[clave] = (int(desplazamiento), int(longitud))
+            return entradas
@@ -0,0 +1,129 @@
+"""
+Marcas de facturado de los consumos del motor XML, en data/consumos.facturados.
+
+Facturar no reescribe consumos.xml ni su bitácora: las filas facturadas se anexan a
+este archivo como tramos (primera fila, cantidad), con las filas numeradas en el
+orden de `GrupoConsumos.iterar_consumos`. Un consumo está facturado si lo indica su
+atributo en el XML o si su fila está marcada. El costo de marcar depende solo de las
+filas marcadas y no del tamaño del historial.
+
+El encabezado guarda la firma de consumos.xml a la que corresponden las marcas.
+Cuando consumos.xml se reescribe (compactación o escritura completa) los grupos ya
+incluyen las marcas y el archivo se reinicia; si la firma no coincide (consumos.xml
+cambió por fuera del servicio) las marcas se descartan.
+"""
+from __future__ import annotations
+from typing import Iterable, List, Optional
+import os
+import struct
+from models import bloqueo
+from models.repositorio import RepositorioXml, Firma
+
+RUTA_MARCAS = "data/consumos.facturados"
+
+MAGIA = b"S2FACT01"
+# magia, firma (mtime en ns, tamaño, inodo) de consumos.xml
+_ENCABEZADO = struct.Struct(">8sqqq")
+# primera fila, cantidad de filas
+_TRAMO = struct.Struct(">II")
+_SIN_FIRMA = (-1, -1, -1)
+
+
+class MarcasFacturado:
+    """
+    Archivo de marcas `ruta` para los consumos cuya base es `ruta_base`.
+    """
+
+    def __init__(self, ruta: str, ruta_base: str):
+        self.ruta = ruta
+        self.ruta_base = ruta_base
+
+    def leer(self) -> bytearray:
+        """
+        Retorna un byte por fila (1 si está marcada) hasta la última fila marcada, o
+        vacío si no hay marcas vigentes para la consumos.xml actual.
+        """
+        try:
+            with open(self.ruta, "rb") as f:
+                datos = f.read()
+        except FileNotFoundError:
+            return bytearray()
+        if not self._vigente(datos):
+            if len(datos) > _ENCABEZADO.size:
+                print(f"Las marcas de facturado de '{self.ruta}' no corresponden a '{self.ruta_base}'; se descartan.")
+            return bytearray()
+
+        marcas = bytearray()
+        # Un tramo incompleto al final (escritura interrumpida) se ignora
+        fin = len(datos) - (len(datos) - _ENCABEZADO.size) % _TRAMO.size
+        for primera, cantidad in _TRAMO.iter_unpack(datos[_ENCABEZADO.size:fin]):
+            if len(marcas) < primera + cantidad:
+                marcas.extend(bytes(primera + cantidad - len(marcas)))
+            marcas[primera:primera + cantidad] = b"\x01" * cantidad
+        return marcas
+
+    def aplicar(self, consumos: Iterable) -> None:
+        """
+        Marca como facturados los consumos, recibidos en orden de fila, que tengan su
+        marca.
+        """
+        marcas = self.leer()
+        if not marcas:
+            return
+        for fila, consumo in enumerate(consumos):
+            if fila >= len(marcas):
+                break
+            if marcas[fila]:
+                consumo.facturado = True
+
+    def marcar(self, filas: List[int]) -> None:
+        """
+        Anexa las filas indicadas (en orden creciente) como facturadas.
+        """
+        if not filas:
+            return
+        with bloqueo.escritura():
+            datos = self._leer_encabezado()
+            if datos is None or not self._vigente(datos):
+                self.reiniciar()
+            tramos = bytearray()
+            primera = anterior = filas[0]
+            for fila in filas[1:]:
+                if fila != anterior + 1:
+                    tramos += _TRAMO.pack(primera, anterior - primera + 1)
+                    primera = fila
+                anterior = fila
+            tramos += _TRAMO.pack(primera, anterior - primera + 1)
+            with open(self.ruta, "r+b") as f:
+                # Descarta lo que haya quedado de una escritura interrumpida
+                tamano = os.fstat(f.fileno()).st_size
+                f.truncate(tamano - (tamano - _ENCABEZADO.size) % _TRAMO.size)
+                f.seek(0, os.SEEK_END)
+                f.write(tramos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def reiniciar(self) -> None:
+        """
+        Deja el archivo sin marcas, asociado a la consumos.xml actual.
+        """
+        firma = RepositorioXml.firma_opcional(self.ruta_base) or _SIN_FIRMA
+        with bloqueo.archivo_temporal(self.ruta) as temporal, open(temporal, "wb") as f:
+            f.write(_ENCABEZADO.pack(MAGIA, *firma))
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _leer_encabezado(self) -> Optional[bytes]:
+        try:
+            with open(self.ruta, "rb") as f:
+                return f.read(_ENCABEZADO.size)
+        except FileNotFoundError:
+            return None
+
+    def _vigente(self, datos: bytes) -> bool:
+        if len(datos) < _ENCABEZADO.size:
+            return False
+        magia, *firma = _ENCABEZADO.unpack_from(datos)
+        firma_base: Optional[Firma] = RepositorioXml.firma_opcional(self.ruta_base)
+        return magia == MAGIA and tuple(firma) == (firma_base or _SIN_FIRMA)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import threading
+import config
+from models import bloqueo
+
+# (mtime en ns, tamaño, inodo) del archivo al momento de cargarlo
+Firma = Tuple[int, int, int]
+
+
+@dataclass
+class _Entrada:
+    rutas: Tuple[str, ...]
+    firma: Tuple[Optional[Firma], ...]
+    valor: Any
+    tamano: int
+
+
+class RepositorioXml:
+    """
+    Caché compartida por todo el proceso para los objetos leídos de los archivos XML.
+
+    Cada entrada se identifica por la ruta del archivo y un nombre de vista (la lista de
+    objetos, un diccionario por id, etc.). Una entrada es válida mientras la firma del
+    archivo (mtime, tamaño e inodo) no cambie; las escrituras del propio proceso la
+    invalidan explícitamente. Al superar `max_elementos` se desalojan las entradas menos
+    usadas recientemente.
+
+    Una vista puede depender de archivos adicionales (`dependencias`), por ejemplo un
+    archivo base más su bitácora; la entrada se invalida si cambia cualquiera de ellos.
+    """
+
+    def __init__(self, max_elementos: int):
+        self.max_elementos = max_elementos
+        self._entradas: "OrderedDict[Tuple[str, str], _Entrada]" = OrderedDict()
+        self._tamano_total = 0
+        self._lock = threading.RLock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    @staticmethod
+    def firma(ruta: str) -> Firma:
+        st = os.stat(ruta)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @staticmethod
+    def firma_opcional(ruta: str) -> Optional[Firma]:
+        try:
+            return RepositorioXml.firma(ruta)
+        except FileNotFoundError:
+            return None
+
+    def _firma_vista(self, ruta: str, dependencias: Tuple[str, ...]) -> Tuple[Optional[Firma], ...]:
+        return (self.firma(ruta),) + tuple(self.firma_opcional(d) for d in dependencias)
+
+    def obtener(self, ruta: str, cargar: Callable[[str], Any], vista: str = "lista",
+                dependencias: Tuple[str, ...] = ()) -> Any:
+        """
+        Retorna el valor en caché para (ruta, vista) o lo carga con `cargar(ruta)`.
+        Lanza FileNotFoundError si el archivo principal no existe; las dependencias
+        pueden no existir. La carga se hace con el bloqueo de lectura de data/.
+        """
+        clave = (ruta, vista)
+        firma = self._firma_vista(ruta, dependencias)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.firma == firma:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada.valor
+            self.fallos += 1
+
+        with bloqueo.lectura():
+            firma = self._firma_vista(ruta, dependencias)
+            valor = cargar(ruta)
+        self._guardar(clave, (ruta,) + tuple(dependencias), firma, valor)
+        return valor
+
+    def invalidar(self, ruta: str) -> None:
+        """
+        Descarta todas las vistas en caché que dependen de un archivo.
+        """
+        with self._lock:
+            for clave in [c for c, e in self._entradas.items() if ruta in e.rutas]:
+                self._quitar(clave)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._tamano_total = 0
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "elementos": self._tamano_total,
+                "max_elementos": self.max_elementos,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+            }
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _guardar(self, clave: Tuple[str, str], rutas: Tuple[str, ...],
+                 firma: Tuple[Optional[Firma], ...], valor: Any) -> None:
+        tamano = len(valor) if hasattr(valor, "__len__") else 1
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            if tamano > self.max_elementos:
+                # No cabe en la caché, se entrega sin guardar
+                return
+            self._entradas[clave] = _Entrada(rutas, firma, valor, tamano)
+            self._tamano_total += tamano
+            while self._tamano_total > self.max_elementos:
+                self._quitar(next(iter(self._entradas)))
+                self.desalojos += 1
+
+    def _quitar(self, clave: Tuple[str, str]) -> None:
+        entrada = self._entradas.pop(clave, None)
+        if entrada is not None:
+            self._tamano_total -= entrada.tamano
+
+
+repositorio = RepositorioXml(config.REPOSITORIO_MAX_ELEMENTOS)
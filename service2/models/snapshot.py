@@ -0,0 +1,121 @@
+"""
+Instantáneas binarias (`<archivo>.xml.snap`) de los objetos ya validados de cada
+archivo XML de data/.
+
+Formato: encabezado fijo seguido de los objetos serializados con pickle.
+
+    magia (6 bytes) | versión (uint16) | sha256 del XML | sha256 de los datos |
+    firma del XML al escribir (mtime_ns, tamaño, inodo)
+
+Una instantánea se usa solo si coincide la versión y el XML es el mismo con el que se
+generó: se compara primero la firma del archivo y, si cambió (p.ej. el archivo fue
+copiado), el sha256 de su contenido. Los datos se verifican con su propio sha256. En
+cualquier otro caso el XML se parsea normalmente y la instantánea se regenera.
+
+VERSION debe incrementarse cuando cambie la estructura de las clases serializadas.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+import gc
+import hashlib
+import os
+import pickle
+import struct
+import config
+from models import bloqueo
+from models.repositorio import RepositorioXml
+
+MAGIA = b"S2SNAP"
+VERSION = 3
+_ENCABEZADO = struct.Struct(">6sH32s32sqqq")
+
+T = TypeVar("T")
+
+
+def ruta_snapshot(ruta_xml: str) -> str:
+    return f"{ruta_xml}.snap"
+
+
+def leer(ruta_xml: str, parsear: Callable[[str], T]) -> T:
+    """
+    Retorna los objetos de la instantánea de `ruta_xml` o, si no es válida, los obtiene
+    con `parsear(ruta_xml)` y guarda una nueva instantánea.
+    """
+    if not config.SNAPSHOTS:
+        return parsear(ruta_xml)
+    objetos = cargar(ruta_xml)
+    if objetos is None:
+        objetos = parsear(ruta_xml)
+        guardar(ruta_xml, objetos)
+    return objetos
+
+
+def cargar(ruta_xml: str) -> Optional[Any]:
+    try:
+        with open(ruta_snapshot(ruta_xml), "rb") as f:
+            datos = f.read()
+        firma_xml = RepositorioXml.firma(ruta_xml)
+    except FileNotFoundError:
+        return None
+    if len(datos) < _ENCABEZADO.size:
+        return None
+
+    magia, version, sha_xml, sha_datos, *firma = _ENCABEZADO.unpack_from(datos)
+    if magia != MAGIA or version != VERSION:
+        return None
+    if tuple(firma) != firma_xml and _sha256_archivo(ruta_xml) != sha_xml:
+        return None
+    contenido = memoryview(datos)[_ENCABEZADO.size:]
+    if hashlib.sha256(contenido).digest() != sha_datos:
+        return None
+    try:
+        with _sin_gc():
+            return pickle.loads(contenido)
+    except Exception as e:
+        print(f"Instantánea inválida '{ruta_snapshot(ruta_xml)}': {e}")
+        return None
+
+
+def guardar(ruta_xml: str, objetos: Any) -> None:
+    """
+    Escribe la instantánea de `objetos`, que deben corresponder al contenido actual
+    de `ruta_xml`. Un error al escribirla no afecta la escritura del XML.
+    """
+    if not config.SNAPSHOTS:
+        return
+    try:
+        with _sin_gc():
+            contenido = pickle.dumps(objetos, protocol=pickle.HIGHEST_PROTOCOL)
+        encabezado = _ENCABEZADO.pack(
+            MAGIA, VERSION, _sha256_archivo(ruta_xml), hashlib.sha256(contenido).digest(),
+            *RepositorioXml.firma(ruta_xml)
+        )
+        with bloqueo.archivo_temporal(ruta_snapshot(ruta_xml)) as temporal, open(temporal, "wb") as f:
+            f.write(encabezado)
+            f.write(contenido)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"No se pudo escribir la instantánea de '{ruta_xml}': {e}")
+
+
+@contextmanager
+def _sin_gc() -> Iterator[None]:
+    """
+    Suspende el recolector cíclico mientras se crean o recorren miles de objetos que
+    no forman ciclos; con él activo (de)serializar toma varias veces más.
+    """
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if activo:
+            gc.enable()
+
+
+def _sha256_archivo(ruta: str) -> bytes:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.digest()
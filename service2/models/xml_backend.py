@@ -0,0 +1,88 @@
+"""
+Backend de parseo y serialización XML de la capa de modelos.
+
+Los modelos importan `ET` desde este módulo en lugar de `xml.etree.ElementTree`.
+Por defecto (SERVICE2_XML_BACKEND=etree) se usa la librería estándar; con
+SERVICE2_XML_BACKEND=lxml se usa `lxml.etree`, con su parser en C, XPath y escritura
+incremental (`xmlfile`), o la librería estándar si lxml no está instalado. Ambas
+exponen la misma API de ElementTree que utilizan los modelos.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+import config
+
+BACKEND = "etree"
+if config.XML_BACKEND == "lxml":
+    try:
+        from lxml import etree as ET
+        BACKEND = "lxml"
+    except ImportError:
+        print("lxml no está disponible, se usa xml.etree.ElementTree.")
+if BACKEND == "etree":
+    import xml.etree.ElementTree as ET
+
+
+class _EscritorEtree:
+    """
+    Escribe un documento elemento por elemento sobre un archivo de texto.
+    """
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+        self._abiertos: List[str] = []
+        archivo.write("<?xml version='1.0' encoding='utf-8'?>\n")
+
+    def abrir(self, etiqueta: str, atributos: Optional[Dict[str, str]] = None) -> None:
+        attrs = "".join(f" {k}={quoteattr(v)}" for k, v in (atributos or {}).items())
+        self._archivo.write(f"<{etiqueta}{attrs}>")
+        self._abiertos.append(etiqueta)
+
+    def cerrar(self) -> None:
+        self._archivo.write(f"</{self._abiertos.pop()}>")
+
+    def escribir(self, el: ET.Element) -> None:
+        self._archivo.write(ET.tostring(el, encoding="unicode"))
+
+    def texto(self, texto: str) -> None:
+        self._archivo.write(escape(texto))
+
+
+class _EscritorLxml:
+    """
+    Igual que _EscritorEtree pero sobre `lxml.etree.xmlfile`.
+    """
+
+    def __init__(self, xf):
+        self._xf = xf
+        self._abiertos = []
+        xf.write_declaration()
+
+    def abrir(self, etiqueta: str, atributos: Optional[Dict[str, str]] = None) -> None:
+        contexto = self._xf.element(etiqueta, atributos or {})
+        contexto.__enter__()
+        self._abiertos.append(contexto)
+
+    def cerrar(self) -> None:
+        self._abiertos.pop().__exit__(None, None, None)
+
+    def escribir(self, el: ET.Element) -> None:
+        self._xf.write(el)
+
+    def texto(self, texto: str) -> None:
+        self._xf.write(texto)
+
+
+@contextmanager
+def escritor_xml(ruta: str) -> Iterator:
+    """
+    Abre `ruta` para escribir un documento XML de forma incremental, sin construir el
+    árbol completo en memoria.
+    """
+    if BACKEND == "lxml":
+        with ET.xmlfile(ruta, encoding="utf-8") as xf:
+            yield _EscritorLxml(xf)
+    else:
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            yield _EscritorEtree(archivo)
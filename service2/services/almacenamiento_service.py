@@ -0,0 +1,83 @@
+from __future__ import annotations
+from typing import Dict
+import glob
+import os
+from models import almacen_sqlite, bloqueo
+from models.classes.recurso import Recurso, RUTA_RECURSOS
+from models.classes.categoria import Categoria, RUTA_CATEGORIAS
+from models.classes.cliente import Cliente, RUTA_CLIENTES
+from models.classes.consumo import GrupoConsumos
+from models.classes.factura import Factura, DIR_FACTURAS
+from models.classes.ingreso_diario import RUTA_INGRESOS
+from models.repositorio import repositorio
+
+
+def exportar_xml() -> Dict[str, int]:
+    """
+    Regenera los archivos XML de data/ con el contenido actual de la base SQLite.
+    Los archivos resultantes son los que usa el motor "xml".
+    """
+    with bloqueo.escritura():
+        return _exportar_xml()
+
+
+def _exportar_xml() -> Dict[str, int]:
+    recursos = Recurso.get_all()
+    categorias = Categoria.get_all()
+    clientes = Cliente.get_all()
+    grupos = GrupoConsumos.get_all()
+    facturas = Factura.get_all()
+
+    Recurso._escribir_xml(recursos)
+    Categoria._escribir_xml(categorias)
+    Cliente._escribir_xml(clientes)
+    GrupoConsumos._escribir_xml(grupos)
+
+    for ruta in glob.glob(os.path.join(DIR_FACTURAS, "*.xml*")) + glob.glob(f"{RUTA_INGRESOS}*"):
+        os.remove(ruta)
+    repositorio.limpiar()
+    Factura._agregar_a_particiones(facturas)
+
+    return {
+        "recursos": len(recursos),
+        "categorias": len(categorias),
+        "clientes": len(clientes),
+        "grupos_consumo": len(grupos),
+        "facturas": len(facturas),
+    }
+
+
+def importar_xml() -> Dict[str, int]:
+    """
+    Reemplaza el contenido de la base SQLite con los archivos XML de data/, en una
+    sola transacción: si algo falla la base queda como estaba.
+    """
+    with bloqueo.escritura():
+        return _importar_xml()
+
+
+def _importar_xml() -> Dict[str, int]:
+    recursos = Recurso._leer_xml(RUTA_RECURSOS) if os.path.exists(RUTA_RECURSOS) else []
+    categorias = Categoria._leer_xml(RUTA_CATEGORIAS) if os.path.exists(RUTA_CATEGORIAS) else []
+    clientes = Cliente._leer_xml(RUTA_CLIENTES) if os.path.exists(RUTA_CLIENTES) else []
+    grupos = GrupoConsumos._leer_completo()
+    Factura._migrar_archivo_unico()
+    facturas = []
+    for particion in Factura.get_particiones():
+        facturas.extend(Factura._leer_particion(particion))
+
+    with almacen_sqlite.transaccion():
+        almacen_sqlite.vaciar()
+        Recurso._sqlite_reemplazar(recursos)
+        Categoria._sqlite_reemplazar(categorias)
+        Cliente._sqlite_reemplazar(clientes)
+        GrupoConsumos._sqlite_reemplazar(grupos)
+        Factura._sqlite_agregar(facturas)
+
+    return {
+        "recursos": len(recursos),
+        "categorias": len(categorias),
+        "clientes": len(clientes),
+        "grupos_consumo": len(grupos),
+        "facturas": len(facturas),
+    }
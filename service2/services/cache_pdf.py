@@ -0,0 +1,93 @@
+"""
+Caché en disco de los PDF de facturas, en data/pdfs/facturas.
+
+Cada PDF se guarda como `factura_<id>_<variante>_<huella>.pdf`: la variante es el
+detalle completo o uno de los resúmenes y la huella resume los datos con los que se
+generó (factura, cliente, instancias y recursos). Una factura emitida no cambia, así
+que mientras la huella coincida el archivo se entrega tal cual; si los datos cambian
+la huella es otra y se genera un PDF nuevo.
+
+El tamaño total del directorio se limita a config.PDF_CACHE_MAX_BYTES: al guardar un
+PDF se eliminan los menos usados (por fecha de acceso, que se actualiza en cada
+entrega) hasta quedar por debajo del límite.
+"""
+from __future__ import annotations
+from typing import Callable, List, Optional, Tuple
+import glob
+import os
+import time
+import config
+from models import bloqueo
+
+DIR_CACHE_PDF = "data/pdfs/facturas"
+
+
+class CachePdf:
+
+    def __init__(self, directorio: str = DIR_CACHE_PDF, max_bytes: Optional[int] = None):
+        self.directorio = directorio
+        self.max_bytes = config.PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    def ruta(self, id_factura: int, variante: str, huella: str) -> str:
+        return os.path.join(self.directorio, f"factura_{id_factura}_{variante}_{huella[:16]}.pdf")
+
+    def obtener(self, id_factura: int, variante: str, huella: str) -> Optional[str]:
+        """
+        Retorna la ruta del PDF en caché, o None si no existe. Marca el archivo como
+        usado sin cambiar su fecha de modificación (la de generación).
+        """
+        ruta = self.ruta(id_factura, variante, huella)
+        try:
+            os.utime(ruta, ns=(time.time_ns(), os.stat(ruta).st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        return ruta
+
+    def guardar(self, id_factura: int, variante: str, huella: str, generar: Callable[[str], None]) -> str:
+        """
+        Genera el PDF con `generar(ruta_temporal)`, lo publica de forma atómica en la
+        caché y retorna su ruta. Elimina las versiones anteriores de la misma factura y
+        variante y aplica el límite de tamaño.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(id_factura, variante, huella)
+        with bloqueo.archivo_temporal(ruta) as temporal:
+            generar(temporal)
+
+        for anterior in glob.glob(os.path.join(self.directorio, f"factura_{id_factura}_{variante}_*.pdf")):
+            if anterior != ruta:
+                self._eliminar(anterior)
+        self._desalojar(conservar=ruta)
+        return ruta
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _desalojar(self, conservar: str) -> None:
+        archivos: List[Tuple[int, int, str]] = []
+        for ruta in glob.glob(os.path.join(self.directorio, "*.pdf")):
+            try:
+                info = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            archivos.append((info.st_atime_ns, info.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.max_bytes:
+                break
+            # El recién generado se entrega aunque por sí solo supere el límite
+            if ruta == conservar:
+                continue
+            self._eliminar(ruta)
+            total -= tamano
+
+    @staticmethod
+    def _eliminar(ruta: str) -> None:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+cache_pdf = CachePdf()
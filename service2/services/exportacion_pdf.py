@@ -0,0 +1,142 @@
+"""
+Exportación de los PDF de varias facturas en un ZIP (POST /facturas/exportar).
+
+Los PDF se generan con `FacturaPdfService` en SERVICE2_PROCESOS_PDF procesos y se
+agregan al ZIP en el orden de las facturas a medida que terminan, mientras la
+respuesta ya se está enviando. Solo hay unas pocas facturas en curso a la vez y cada
+PDF se copia al ZIP por bloques desde la caché de disco, así la memoria no depende de
+la cantidad de facturas.
+
+Los procesos se crean con "spawn" (el servicio puede tener otros hilos activos) y
+toman el bloqueo de data/ como cualquier lector. Las facturas que no se pueden
+generar se listan en `errores.txt` al final del ZIP.
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+import io
+import multiprocessing
+import zipfile
+import config
+from models.classes.factura import Factura
+from services.factura_pdf_service import FacturaPdfService
+
+# Facturas en curso por proceso: acota la memoria y mantiene ocupados los procesos
+EN_CURSO_POR_PROCESO = 2
+BLOQUE = 64 * 1024
+
+
+def seleccionar_facturas(fecha_inicio: Optional[str] = None, fecha_fin: Optional[str] = None,
+                         nits: Optional[Iterable[str]] = None) -> List[int]:
+    """
+    Retorna los ids de las facturas emitidas en el rango (inclusive) y/o de los NIT
+    indicados, en orden de emisión.
+    """
+    if fecha_inicio or fecha_fin:
+        if not (fecha_inicio and fecha_fin):
+            raise ValueError("Rango de fecha incompleto.")
+        facturas = Factura.get_by_rango(
+            datetime.strptime(fecha_inicio, "%d/%m/%Y"), datetime.strptime(fecha_fin, "%d/%m/%Y")
+        )
+    elif nits is not None:
+        facturas = Factura.get_all()
+    else:
+        raise ValueError("Debe indicar un rango de fecha o una lista de NIT.")
+
+    if nits is not None:
+        buscados = {nit.lower() for nit in nits}
+        facturas = [factura for factura in facturas if factura.nitCliente.lower() in buscados]
+    return [factura.id for factura in facturas]
+
+
+def exportar_zip(ids: List[int], resumen: Optional[str] = None,
+                 procesos: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Genera el ZIP con el PDF de cada factura de `ids` como `factura_<id>.pdf`,
+    entregándolo por partes. `resumen` es la agrupación de los consumos (ver
+    `FacturaPdfService`).
+    """
+    procesos = procesos or config.PROCESOS_PDF
+    salida = _SalidaZip()
+    errores: List[Tuple[int, str]] = []
+    pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+            for id_factura, ruta, error in _generar_en_orden(pool, ids, resumen, procesos * EN_CURSO_POR_PROCESO):
+                if error is not None:
+                    errores.append((id_factura, error))
+                    continue
+                try:
+                    pdf = open(ruta, "rb")
+                except FileNotFoundError:
+                    # Desalojado de la caché antes de copiarlo
+                    id_factura, ruta, error = _generar(id_factura, resumen)
+                    if error is not None:
+                        errores.append((id_factura, error))
+                        continue
+                    pdf = open(ruta, "rb")
+                with pdf, archivo_zip.open(f"factura_{id_factura}.pdf", "w") as destino:
+                    while bloque := pdf.read(BLOQUE):
+                        destino.write(bloque)
+                        yield from salida.vaciar()
+                yield from salida.vaciar()
+
+            if errores:
+                archivo_zip.writestr(
+                    "errores.txt", "".join(f"Factura {i}: {error}\n" for i, error in errores)
+                )
+        yield from salida.vaciar()
+    finally:
+        # Si el cliente se desconecta no se generan las facturas pendientes
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ------------------------------
+# MÉTODOS AUXILIARES
+# ------------------------------
+def _generar_en_orden(pool: ProcessPoolExecutor, ids: List[int], resumen: Optional[str],
+                      en_curso: int) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    pendientes = iter(ids)
+    futuros: Deque[Future] = deque()
+    for id_factura in pendientes:
+        futuros.append(pool.submit(_generar, id_factura, resumen))
+        if len(futuros) >= en_curso:
+            break
+    while futuros:
+        resultado = futuros.popleft().result()
+        siguiente = next(pendientes, None)
+        if siguiente is not None:
+            futuros.append(pool.submit(_generar, siguiente, resumen))
+        yield resultado
+
+
+def _generar(id_factura: int, resumen: Optional[str]) -> Tuple[int, Optional[str], Optional[str]]:
+    try:
+        ruta, _ = FacturaPdfService(id_factura, resumen).obtener_pdf()
+        return id_factura, ruta, None
+    except Exception as e:
+        return id_factura, None, str(e)
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino no posicionable del ZIP: acumula lo escrito hasta que se vacía.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.partes: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self) -> Iterator[bytes]:
+        partes, self.partes = self.partes, []
+        if partes:
+            yield b"".join(partes)
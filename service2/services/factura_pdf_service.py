@@ -1,7 +1,11 @@
 from __future__ import annotations
 import xml.etree.ElementTree as ET
-from datetime import datetime
-from typing import Dict, List, Tuple
+import csv
+import hashlib
+import io
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 from models.classes.consumo import GrupoConsumos, Consumo
 from models.classes.factura import Factura
 from models.classes.detalle_factura import DetalleFactura, ConsumoFactura
@@ -9,19 +13,43 @@ from models.classes.recurso import Recurso
 from models.classes.categoria import Categoria
 from models.classes.cliente import Cliente
 from models.classes.instancia import Instancia
+from services.cache_pdf import cache_pdf
 
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from datetime import datetime
+
+# Versión del formato del documento: cambiarla invalida los PDF en caché
+VERSION_PLANTILLA = 2
+
+# Agrupaciones del modo resumido: los consumos de cada instancia se suman por día o
+# por semana (desde el lunes) y el detalle completo se descarga en CSV
+RESUMENES = ("dia", "semana")
+
+# Filas por tabla de consumos. Una sola tabla con miles de filas se vuelve a medir
+# cada vez que se parte en una página (el costo crece con el cuadrado de las filas);
+# en tablas de este tamaño, con encabezado repetido, crece linealmente.
+FILAS_POR_TABLA = 100
+
+ESTILO_TABLA_CONSUMOS = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#003366")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.gray),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+])
 
 
 class FacturaPdfService:
 
-    def __init__(self, id_factura: int):
+    def __init__(self, id_factura: int, resumen: Optional[str] = None):
+        if resumen is not None and resumen not in RESUMENES:
+            raise ValueError(f"Resumen inválido '{resumen}', debe ser uno de: {', '.join(RESUMENES)}.")
         self.base_path = "data/pdfs"
+        self.resumen = resumen
 
         self.recursos = Recurso.get_dict_recursos()
         factura = Factura.get_by_id(id_factura)
@@ -38,8 +66,61 @@ class FacturaPdfService:
         self.cliente = cliente
         self.instancias_dict = instancias_dict
 
-    def generar_pdf(self):
-        file_path = f"{self.base_path}/factura_{str(self.factura.id)}.pdf"
+    def huella(self) -> str:
+        """
+        Hash de los datos con los que se genera el PDF: factura, cliente y las
+        instancias y recursos que aparecen en ella.
+        """
+        ids_recursos = {rid for detalle in self.factura.detalles for rid in detalle.recursos_cantidad}
+        datos = {
+            "plantilla": VERSION_PLANTILLA,
+            "resumen": self.resumen,
+            "factura": self.factura.to_dict(),
+            "cliente": [self.cliente.nombre, self.cliente.nit, self.cliente.direccion, self.cliente.correoElectronico],
+            "instancias": {
+                str(detalle.idInstancia): self.instancias_dict[detalle.idInstancia].nombre
+                for detalle in self.factura.detalles if detalle.idInstancia in self.instancias_dict
+            },
+            "recursos": {
+                str(rid): [self.recursos[rid].nombre, self.recursos[rid].metrica, self.recursos[rid].valorXhora]
+                for rid in ids_recursos if rid in self.recursos
+            },
+        }
+        contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def obtener_pdf(self) -> Tuple[str, str]:
+        """
+        Retorna la ruta del PDF de la factura y su huella. Solo se genera si no está
+        en la caché.
+        """
+        huella = self.huella()
+        variante = self.resumen or "detalle"
+        ruta = cache_pdf.obtener(self.factura.id, variante, huella)
+        if ruta is None:
+            ruta = cache_pdf.guardar(self.factura.id, variante, huella, self.generar_pdf)
+        return ruta, huella
+
+    def consumos_csv(self) -> Iterator[str]:
+        """
+        Detalle completo de los consumos de la factura en CSV, línea por línea.
+        """
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(["idInstancia", "instancia", "fechaHora", "tiempo"])
+        for detalle in self.factura.detalles:
+            inst = self.instancias_dict.get(detalle.idInstancia)
+            nombre = inst.nombre if inst else ""
+            for c in detalle.consumos:
+                escritor.writerow([detalle.idInstancia, nombre, c.fechaHora, f"{c.tiempo:.2f}"])
+                if buffer.tell() >= 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue()
+
+    def generar_pdf(self, file_path: Optional[str] = None):
+        file_path = file_path or f"{self.base_path}/factura_{str(self.factura.id)}.pdf"
 
         # Configuración base del documento
         doc = SimpleDocTemplate(
@@ -93,21 +174,7 @@ class FacturaPdfService:
                 elements.append(Spacer(1, 0.1 * inch))
 
             # Tabla de consumos
-            elements.append(Paragraph("Consumos", styles["Subtitulo"]))
-            data_consumos = [["Fecha/Hora", "Tiempo (h)"]]
-            for c in detalle.consumos:
-                data_consumos.append([c.fechaHora, f"{c.tiempo:.2f}"])
-
-            tabla_consumos = Table(data_consumos, colWidths=[3 * inch, 1.5 * inch])
-            tabla_consumos.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#003366")),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                ("GRID", (0, 0), (-1, -1), 0.25, colors.gray),
-                ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ]))
-            elements.append(tabla_consumos)
+            elements.extend(self._tablas_consumos(detalle, styles))
             elements.append(Spacer(1, 0.15 * inch))
 
             # Tabla de recursos
@@ -150,3 +217,57 @@ class FacturaPdfService:
         doc.build(elements)
         return file_path
 
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _tablas_consumos(self, detalle: DetalleFactura, styles) -> list:
+        if self.resumen is None:
+            elements = [Paragraph("Consumos", styles["Subtitulo"])]
+            encabezado = ["Fecha/Hora", "Tiempo (h)"]
+            anchos = [3 * inch, 1.5 * inch]
+            filas = [[c.fechaHora, f"{c.tiempo:.2f}"] for c in detalle.consumos]
+        else:
+            titulo = "Consumos por día" if self.resumen == "dia" else "Consumos por semana"
+            elements = [
+                Paragraph(titulo, styles["Subtitulo"]),
+                Paragraph(
+                    f"Detalle completo ({len(detalle.consumos)} consumos): "
+                    f"/facturas/{self.factura.id}/consumos.csv", styles["Campo"]
+                ),
+            ]
+            encabezado = ["Día" if self.resumen == "dia" else "Semana del", "Consumos", "Tiempo (h)"]
+            anchos = [2 * inch, 1.25 * inch, 1.25 * inch]
+            filas = [
+                [periodo.strftime("%d/%m/%Y"), str(cantidad), f"{tiempo:.2f}"]
+                for periodo, (cantidad, tiempo) in self._agrupar_consumos(detalle.consumos).items()
+            ]
+
+        for inicio in range(0, max(len(filas), 1), FILAS_POR_TABLA):
+            tabla = Table([encabezado] + filas[inicio:inicio + FILAS_POR_TABLA],
+                          colWidths=anchos, repeatRows=1)
+            tabla.setStyle(ESTILO_TABLA_CONSUMOS)
+            elements.append(tabla)
+        return elements
+
+    def _agrupar_consumos(self, consumos: List[ConsumoFactura]) -> Dict[date, Tuple[int, float]]:
+        """
+        Cantidad y tiempo de los consumos por día o por semana, en orden cronológico.
+        """
+        periodos: Dict[str, date] = {}
+        totales: Dict[date, List] = {}
+        for c in consumos:
+            dia = c.fechaHora[:10]
+            periodo = periodos.get(dia)
+            if periodo is None:
+                try:
+                    periodo = datetime.strptime(dia, "%d/%m/%Y").date()
+                except ValueError:
+                    periodo = date.min
+                if self.resumen == "semana" and periodo != date.min:
+                    periodo -= timedelta(days=periodo.weekday())
+                periodos[dia] = periodo
+            total = totales.setdefault(periodo, [0, 0.0])
+            total[0] += 1
+            total[1] += c.tiempo
+        return {periodo: (cantidad, tiempo) for periodo, (cantidad, tiempo) in sorted(totales.items())}
+
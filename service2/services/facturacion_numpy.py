@@ -0,0 +1,211 @@
+"""
+Motor de facturación vectorizado con NumPy (SERVICE2_MOTOR_FACTURACION=numpy).
+
+Genera las mismas facturas que `FacturacionService._generar_facturas`: mismos
+clientes, detalles y consumos en el mismo orden y los mismos valores de punto
+flotante. Para eso las sumas se acumulan en el mismo orden que el motor en Python:
+
+- el rango de fechas y la marca de facturado se aplican como una sola máscara sobre
+  las columnas de consumos (con el motor xml, las mapeadas en memoria sin copiarlas,
+  desde la primera fila no facturada);
+- las horas de cada instancia se suman con `sum` sobre sus filas contiguas (ya
+  ordenadas por instancia), igual que el motor en Python: desde Python 3.12 `sum`
+  compensa el redondeo y una suma de numpy no daría siempre el mismo valor;
+- el aporte de cada recurso es la matriz configuración x (cantidad * precio) de los
+  detalles por sus horas, en una sola operación sobre todos los detalles, y el
+  subtotal la suma de esas columnas en el orden de los recursos de la configuración;
+- el total de cada cliente se acumula con `bincount` en el orden de sus detalles.
+
+Una configuración que no existe es un error (ValueError), igual que en el motor en
+Python.
+
+Si numpy no está instalado se usa el motor en Python.
+"""
+from __future__ import annotations
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+import config
+from models import almacen_sqlite, bloqueo
+from models.classes.consumo import GrupoConsumos, COLUMNAS_CONSUMO
+from models.classes.detalle_factura import DetalleFactura, ConsumoFactura
+from models.classes.factura import Factura
+from models.classes.fecha_hora import fecha_de_minuto, minuto_epoca
+
+if TYPE_CHECKING:
+    from services.facturacion_service import FacturacionService
+
+ACTIVO = False
+if config.MOTOR_FACTURACION == "numpy":
+    try:
+        import numpy as np
+        ACTIVO = True
+    except ImportError:
+        print("numpy no está disponible, se usa el motor de facturación en Python.")
+
+Clave = Tuple[str, int]
+
+
+def generar_facturas(servicio: FacturacionService, fecha_inicio: str, fecha_fin: str, fecha_ini: datetime,
+                     fecha_fn: datetime) -> Tuple[List[Tuple[int, Factura]], List[Tuple[int, str]], Set[Clave]]:
+    """
+    Equivalente vectorizado de `FacturacionService._generar_facturas`.
+    """
+    claves, instancia, tiempos, fechas = _cargar_pendientes(fecha_ini, fecha_fn, servicio._filtro_nit())
+
+    # Grupos (nitCliente, idInstancia) en orden de primera aparición, con sus filas
+    # en el orden original
+    orden = np.argsort(instancia, kind="stable")
+    usadas, primera, cuenta = np.unique(instancia, return_index=True, return_counts=True)
+    inicio = np.concatenate(([0], np.cumsum(cuenta)[:-1]))
+    por_aparicion = np.argsort(primera, kind="stable").tolist()
+    usadas, inicio, cuenta = usadas.tolist(), inicio.tolist(), cuenta.tolist()
+    orden = orden.tolist()
+    tiempos_ordenados = tiempos[orden].tolist() if orden else []
+
+    grupos_por_nit: Dict[str, List[int]] = {}
+    for g in por_aparicion:
+        grupos_por_nit.setdefault(claves[usadas[g]][0].lower(), []).append(g)
+
+    # Filas de la matriz de precios por configuración: cantidad * valorXhora de cada
+    # recurso existente, en el orden de la configuración
+    filas_config: Dict[int, int] = {}
+    precios: List[List[float]] = []
+    cantidades: List[Dict[int, float]] = []
+
+    def fila_config(id_conf: int) -> int:
+        if id_conf not in filas_config:
+            recursos_cantidad: Dict[int, float] = {}
+            fila: List[float] = []
+            for rid, cantidad in servicio._configuracion(id_conf).recursos.items():
+                recurso = servicio.recursos.get(rid)
+                if recurso:
+                    recursos_cantidad[rid] = cantidad
+                    fila.append(cantidad * recurso.valorXhora)
+            filas_config[id_conf] = len(precios)
+            precios.append(fila)
+            cantidades.append(recursos_cantidad)
+        return filas_config[id_conf]
+
+    errors: List[Tuple[int, str]] = []
+    # Detalles a facturar: (índice de cliente, grupo, configuración)
+    detalle_cliente: List[int] = []
+    detalle_grupo: List[int] = []
+    detalle_config: List[int] = []
+    facturados: Set[int] = set()
+    for c, cliente in enumerate(servicio.clientes):
+        configuraciones = servicio._indexar_configuraciones(cliente)
+        for g in grupos_por_nit.get(cliente.nit.lower(), ()):
+            # Un grupo ya facturado a otro cliente con el mismo NIT no tiene pendientes
+            if g in facturados:
+                continue
+            id_instancia = claves[usadas[g]][1]
+            id_conf = configuraciones.get(id_instancia)
+            if id_conf is None:
+                errors.append((c, f"Id de configuración no encontrado para el cliente '{cliente.nit}' y la instancia '{id_instancia}'."))
+                continue
+            detalle_cliente.append(c)
+            detalle_grupo.append(g)
+            detalle_config.append(fila_config(id_conf))
+            facturados.add(g)
+        servicio._avanzar(c + 1)
+
+    if not detalle_grupo:
+        return [], errors, set()
+
+    ancho = max(len(fila) for fila in precios)
+    matriz = np.zeros((len(precios), ancho))
+    for i, fila in enumerate(precios):
+        matriz[i, :len(fila)] = fila
+    horas = np.array([sum(tiempos_ordenados[inicio[g]:inicio[g] + cuenta[g]]) for g in detalle_grupo])
+    # Aporte de cada recurso de cada detalle (cantidad * precio * horas) y subtotal,
+    # sumando los aportes recurso por recurso como el motor en Python (las columnas
+    # de relleno suman 0.0 y no cambian el resultado)
+    aportes = matriz[detalle_config] * horas[:, None]
+    subtotales = np.zeros(len(detalle_grupo))
+    for columna in range(ancho):
+        subtotales += aportes[:, columna]
+    montos = aportes.tolist()
+    totales = np.bincount(detalle_cliente, weights=subtotales, minlength=len(servicio.clientes)).tolist()
+    subtotales, detalle_horas = subtotales.tolist(), horas.tolist()
+
+    id_configuraciones = {fila: id_conf for id_conf, fila in filas_config.items()}
+    detalles_por_cliente: Dict[int, List[DetalleFactura]] = {}
+    claves_facturadas: Set[Clave] = set()
+    for d, g in enumerate(detalle_grupo):
+        nit, id_instancia = claves[usadas[g]]
+        filas = orden[inicio[g]:inicio[g] + cuenta[g]]
+        detalles_por_cliente.setdefault(detalle_cliente[d], []).append(
+            DetalleFactura(
+                idInstancia=id_instancia,
+                idConfiguracion=id_configuraciones[detalle_config[d]],
+                horas=detalle_horas[d],
+                subtotal=subtotales[d],
+                recursos_cantidad=dict(cantidades[detalle_config[d]]),
+                recursos_monto=dict(zip(cantidades[detalle_config[d]], montos[d])),
+                consumos=[
+                    ConsumoFactura(tiempo=t, fechaHora=fechas[fila])
+                    for t, fila in zip(tiempos_ordenados[inicio[g]:inicio[g] + cuenta[g]], filas)
+                ]
+            )
+        )
+        claves_facturadas.add((nit, id_instancia))
+
+    facturas = [
+        (c, Factura.generar(
+            nitCliente=servicio.clientes[c].nit,
+            rango_inicio=fecha_inicio,
+            rango_fin=fecha_fin,
+            detalles=detalles,
+            total=totales[c]
+        ))
+        for c, detalles in sorted(detalles_por_cliente.items())
+    ]
+    return facturas, errors, claves_facturadas
+
+
+def _cargar_pendientes(fecha_ini: datetime, fecha_fin: datetime, filtro_nit: Optional[Callable[[str], bool]] = None):
+    """
+    Retorna (claves, instancia, tiempos, fechas) de los consumos no facturados dentro
+    del rango (y de los NIT aceptados por `filtro_nit`), en el orden de
+    `GrupoConsumos.iterar_pendientes`: `claves` es la lista (nitCliente, idInstancia)
+    a la que apunta el arreglo `instancia` y `fechas` el texto de fecha y hora de
+    cada fila.
+    """
+    if almacen_sqlite.activo():
+        claves: List[Clave] = []
+        indices: Dict[Clave, int] = {}
+        instancia, tiempos, fechas = [], [], []
+        for nit, id_instancia, consumo in GrupoConsumos.iterar_pendientes(fecha_ini, fecha_fin, filtro_nit):
+            clave = (nit, id_instancia)
+            if clave not in indices:
+                indices[clave] = len(claves)
+                claves.append(clave)
+            instancia.append(indices[clave])
+            tiempos.append(consumo.tiempo)
+            fechas.append(str(consumo.fechaHora))
+        return claves, np.array(instancia, dtype=np.intc), np.array(tiempos, dtype=np.float64), fechas
+
+    desde, hasta = minuto_epoca(fecha_ini), minuto_epoca(fecha_fin)
+    with bloqueo.lectura(), COLUMNAS_CONSUMO.abrir() as columnas:
+        # Las filas anteriores a la primera no facturada no se recorren
+        primera = columnas.primera_pendiente
+        minuto = np.frombuffer(columnas.minuto, dtype=np.intc)[primera:]
+        facturado = np.frombuffer(columnas.facturado, dtype=np.uint8)[primera:]
+        todas = np.frombuffer(columnas.instancia, dtype=np.intc)[primera:]
+        mascara = (facturado == 0) & (minuto >= desde) & (minuto <= hasta)
+        if filtro_nit is not None:
+            permitidas = np.array([filtro_nit(nit) for nit, _ in columnas.claves], dtype=bool)
+            mascara &= permitidas[todas]
+        seleccion = np.flatnonzero(mascara)
+        instancia = todas[seleccion]
+        tiempos = np.frombuffer(columnas.horas, dtype=np.float64)[primera:][seleccion]
+        minutos = minuto[seleccion]
+        claves = columnas.claves
+        # Los arreglos anteriores son copias; las vistas sobre los mapas deben
+        # soltarse antes de cerrarlos
+        del minuto, facturado, todas
+
+    unicos, posiciones = np.unique(minutos, return_inverse=True)
+    textos = [fecha_de_minuto(m) for m in unicos.tolist()]
+    fechas = [textos[p] for p in posiciones.tolist()]
+    return claves, instancia, tiempos, fechas
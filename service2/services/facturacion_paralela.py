@@ -0,0 +1,91 @@
+"""
+Facturación en paralelo (SERVICE2_PROCESOS_FACTURACION > 1).
+
+Los clientes se reparten en particiones por un hash estable de su NIT en minúsculas,
+así los clientes con el mismo NIT y los grupos de consumos que les corresponden
+quedan en la misma partición. Cada proceso arma las facturas de su partición con el
+motor configurado (python o numpy) y retorna las facturas, los errores y las claves
+a marcar como facturadas; el proceso padre las ordena según la lista de clientes y
+hace una única escritura, igual que en serie.
+
+Los procesos se crean con "spawn" (el servicio puede tener otros hilos activos) y no
+toman el bloqueo de data/: trabajan mientras el padre tiene el bloqueo exclusivo.
+Leen los consumos de las columnas mapeadas en memoria, cuyas páginas comparten.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import multiprocessing
+import zlib
+from models import almacen_sqlite, bloqueo
+from models.classes.cliente import Cliente
+from models.classes.configuracion import Configuracion
+from models.classes.consumo import COLUMNAS_CONSUMO
+from models.classes.recurso import Recurso
+
+if TYPE_CHECKING:
+    from services.facturacion_service import FacturacionService, ResultadoFacturacion
+
+
+def particion_de(nit: str, particiones: int) -> int:
+    return zlib.crc32(nit.lower().encode("utf-8")) % particiones
+
+
+def generar_facturas(servicio: FacturacionService, fecha_inicio: str, fecha_fin: str,
+                     procesos: int) -> ResultadoFacturacion:
+    """
+    Equivalente en paralelo de `FacturacionService._calcular_facturas`, con los
+    índices referidos a `servicio.clientes`.
+    """
+    if not almacen_sqlite.activo():
+        # Reconstruir las columnas es una escritura: debe ocurrir antes de repartir
+        COLUMNAS_CONSUMO.abrir().cerrar()
+
+    particiones: List[List[Tuple[int, Cliente]]] = [[] for _ in range(procesos)]
+    for indice, cliente in enumerate(servicio.clientes):
+        particiones[particion_de(cliente.nit, procesos)].append((indice, cliente))
+
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=bloqueo.bajo_bloqueo_del_padre) as pool:
+        futuros = {
+            pool.submit(_facturar_particion, particion, procesos, clientes, servicio.recursos,
+                        servicio.config_por_id, fecha_inicio, fecha_fin): len(clientes)
+            for particion, clientes in enumerate(particiones) if clientes
+        }
+        resultados = []
+        procesados = 0
+        # El avance es el de las particiones terminadas; el orden se restablece abajo
+        for futuro in as_completed(futuros):
+            resultados.append(futuro.result())
+            procesados += futuros[futuro]
+            servicio._avanzar(procesados)
+
+    facturas, errores, claves = [], [], set()
+    for facturas_particion, errores_particion, claves_particion in resultados:
+        facturas.extend(facturas_particion)
+        errores.extend(errores_particion)
+        claves |= claves_particion
+    # Orden estable: los errores de un mismo cliente conservan su orden
+    facturas.sort(key=lambda par: par[0])
+    errores.sort(key=lambda par: par[0])
+    return facturas, errores, claves
+
+
+def _facturar_particion(particion: int, particiones: int, clientes: List[Tuple[int, Cliente]],
+                        recursos: Dict[int, Recurso], config_por_id: Dict[int, Configuracion],
+                        fecha_inicio: str, fecha_fin: str) -> ResultadoFacturacion:
+    from services.facturacion_service import FacturacionService
+
+    indices = [indice for indice, _ in clientes]
+    servicio = FacturacionService(recursos, config_por_id, [cliente for _, cliente in clientes])
+    servicio.particion = (particion, particiones)
+    facturas, errores, claves = servicio._calcular_facturas(
+        fecha_inicio, fecha_fin,
+        datetime.strptime(fecha_inicio, "%d/%m/%Y"), datetime.strptime(fecha_fin, "%d/%m/%Y")
+    )
+    return (
+        [(indices[i], factura) for i, factura in facturas],
+        [(indices[i], error) for i, error in errores],
+        claves,
+    )
@@ -1,61 +1,130 @@
 from __future__ import annotations
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from models.classes.consumo import GrupoConsumos, Consumo
 from models.classes.factura import Factura
 from models.classes.detalle_factura import DetalleFactura, ConsumoFactura
 from models.classes.recurso import Recurso
-from models.classes.categoria import Categoria
+from models.classes.categoria import Categoria, GestorCategoria
 from models.classes.cliente import Cliente
+from models.classes.configuracion import Configuracion
+from models.classes.fecha_hora import minuto_epoca
+from models import bloqueo
+from services import facturacion_numpy, facturacion_paralela
+import config
+
+# (facturas, errores) con el índice del cliente al que corresponden, y claves facturadas
+ResultadoFacturacion = Tuple[List[Tuple[int, Factura]], List[Tuple[int, str]], Set[Tuple[str, int]]]
+
+
+# Parte del avance que corresponde a armar las facturas; el resto es guardarlas y
+# marcar los consumos
+FRACCION_CALCULO = 0.9
 
 
 class FacturacionService:
 
-    def __init__(self):
+    def __init__(self, recursos: Optional[Dict[int, Recurso]] = None,
+                 config_por_id: Optional[Dict[int, Configuracion]] = None,
+                 clientes: Optional[List[Cliente]] = None,
+                 avance: Optional[Callable[[float, str], None]] = None):
         # Cargar datos base
-        self.recursos = Recurso.get_dict_recursos()
-        self.config_por_id = Categoria.get_dict_configuraciones()
-        self.clientes = Cliente.get_all()
+        self.recursos = Recurso.get_dict_recursos() if recursos is None else recursos
+        self.config_por_id = Categoria.get_dict_configuraciones() if config_por_id is None else config_por_id
+        self.clientes = Cliente.get_all() if clientes is None else clientes
+        # (partición, particiones): solo se facturan los NIT de esa partición
+        self.particion: Optional[Tuple[int, int]] = None
+        # avance(fraccion, mensaje): clientes procesados y luego guardado
+        self.avance = avance
 
     def facturar(self, fecha_inicio: str, fecha_fin: str) -> List[Factura]:
         """
         Genera facturas para todos los clientes con consumos no facturados
-        dentro del rango de fechas indicado.
+        dentro del rango de fechas indicado. Leer los consumos pendientes, guardar las
+        facturas y marcar los consumos es un único ciclo con el bloqueo exclusivo de data/.
         """
+        with bloqueo.escritura():
+            return self._facturar(fecha_inicio, fecha_fin)
+
+    def _facturar(self, fecha_inicio: str, fecha_fin: str) -> List[Factura]:
         fecha_ini = datetime.strptime(fecha_inicio, "%d/%m/%Y")
         fecha_fn = datetime.strptime(fecha_fin, "%d/%m/%Y")
 
-        grupos = GrupoConsumos.get_all()
-        facturas: List[Factura] = []
-        errors: List[str] = []
+        if config.PROCESOS_FACTURACION > 1:
+            por_cliente, errores_por_cliente, claves_facturadas = facturacion_paralela.generar_facturas(
+                self, fecha_inicio, fecha_fin, config.PROCESOS_FACTURACION
+            )
+        else:
+            por_cliente, errores_por_cliente, claves_facturadas = self._calcular_facturas(
+                fecha_inicio, fecha_fin, fecha_ini, fecha_fn
+            )
+        facturas = [factura for _, factura in por_cliente]
+        errors = [error for _, error in errores_por_cliente]
+
+        if facturas:
+            self._asignar_categorias(facturas)
+            # Se informa antes de guardar: quien recibe el avance puede cancelar la
+            # facturación, pero no entre guardar las facturas y marcar sus consumos
+            self._informar(FRACCION_CALCULO, f"Guardando {len(facturas)} facturas y marcando sus consumos")
+            # Guardar las facturas en archivo XML
+            Factura.write_xml(facturas)
+            # Actualizar los consumos en el XML
+            GrupoConsumos.marcar_facturados(claves_facturadas, fecha_ini, fecha_fn)
+        return {
+            "facturas_generadas": len(facturas),
+            "errors": errors
+        }
+
+    def _calcular_facturas(self, fecha_inicio: str, fecha_fin: str, fecha_ini: datetime,
+                           fecha_fn: datetime) -> ResultadoFacturacion:
+        """
+        Arma las facturas con el motor configurado, sin guardarlas.
+        """
+        if facturacion_numpy.ACTIVO:
+            return facturacion_numpy.generar_facturas(self, fecha_inicio, fecha_fin, fecha_ini, fecha_fn)
+        return self._generar_facturas(fecha_inicio, fecha_fin, fecha_ini, fecha_fn)
 
-        for cliente in self.clientes:
+    def _generar_facturas(self, fecha_inicio: str, fecha_fin: str, fecha_ini: datetime,
+                          fecha_fn: datetime) -> ResultadoFacturacion:
+        """
+        Arma las facturas de los consumos pendientes. Retorna las facturas y los errores,
+        cada uno con el índice en `self.clientes` del cliente al que corresponde, y las
+        claves (nitCliente, idInstancia) facturadas.
+        """
+        grupos = self._cargar_grupos_pendientes(fecha_ini, fecha_fn)
+        minuto_ini, minuto_fin = minuto_epoca(fecha_ini), minuto_epoca(fecha_fn)
+        facturas: List[Tuple[int, Factura]] = []
+        errors: List[Tuple[int, str]] = []
+        claves_facturadas: Set[Tuple[str, int]] = set()
+
+        grupos_por_nit = self._indexar_grupos(grupos)
+
+        for indice, cliente in enumerate(self.clientes):
             detalles: List[DetalleFactura] = []
             total_cliente = 0.0
+            configuraciones = self._indexar_configuraciones(cliente)
 
             # Procesar todos los grupos de consumos asociados al cliente
-            for grupo in grupos:
-                if grupo.nitCliente.lower() != cliente.nit.lower():
-                    continue
-
+            for grupo in grupos_por_nit.get(cliente.nit.lower(), ()):
                 # Filtrar consumos válidos
-                consumos_validos = self._filtrar_consumos(grupo, fecha_ini, fecha_fn)
+                consumos_validos = self._filtrar_consumos(grupo, minuto_ini, minuto_fin)
                 if not consumos_validos:
                     continue
 
                 horas = sum(c.tiempo for c in consumos_validos)
-                id_conf = self._obtener_id_configuracion(cliente, grupo.idInstancia)
+                id_conf = configuraciones.get(grupo.idInstancia)
                 if id_conf is None:
-                    errors.append(f"Id de configuración no encontrado para el cliente '{cliente.nit}' y la instancia '{grupo.idInstancia}'.")
+                    errors.append((indice, f"Id de configuración no encontrado para el cliente '{cliente.nit}' y la instancia '{grupo.idInstancia}'."))
                     continue
 
                 # Calcular costo de la instancia
-                recursos_cantidad, subtotal = self._calcular_costo_instancia(id_conf, horas)
+                recursos_cantidad, recursos_monto, subtotal = self._calcular_costo_instancia(id_conf, horas)
                 total_cliente += subtotal
 
                 # Marcar los consumos como facturados
                 consumos_facturados = self._marcar_consumos_facturados(consumos_validos)
+                claves_facturadas.add((grupo.nitCliente, grupo.idInstancia))
 
                 detalles.append(
                     DetalleFactura(
@@ -64,6 +133,7 @@ class FacturacionService:
                         horas=horas,
                         subtotal=subtotal,
                         recursos_cantidad=recursos_cantidad,
+                        recursos_monto=recursos_monto,
                         consumos=consumos_facturados
                     )
                 )
@@ -76,30 +146,35 @@ class FacturacionService:
                     detalles=detalles,
                     total=total_cliente
                 )
-                facturas.append(factura)
-        if facturas:
-            # Guardar las facturas en archivo XML
-            Factura.write_xml(facturas)
-            # Actualizar los consumos en el XML
-            GrupoConsumos.write_xml(grupos)
-        return {
-            "facturas_generadas": len(facturas),
-            "errors": errors
-        }
+                facturas.append((indice, factura))
+            self._avanzar(indice + 1)
+        return facturas, errors, claves_facturadas
 
     # ------------------------------
     # MÉTODOS AUXILIARES
     # ------------------------------
-    def _filtrar_consumos(self, grupo: GrupoConsumos, fecha_ini: datetime, fecha_fin: datetime) -> List[Consumo]:
+    def _cargar_grupos_pendientes(self, fecha_ini: datetime, fecha_fin: datetime) -> List[GrupoConsumos]:
         """
-        Devuelve los consumos no facturados dentro del rango de fechas.
+        Obtiene únicamente los consumos no facturados dentro del rango, agrupados por
+        (nitCliente, idInstancia). La memoria depende de los consumos a facturar y no
+        del historial completo.
         """
-        consumos_validos = []
-        for c in grupo.consumos:
-            fecha = datetime.strptime(str(c.fechaHora), "%d/%m/%Y %H:%M")
-            if fecha_ini <= fecha <= fecha_fin and not c.facturado:
-                consumos_validos.append(c)
-        return consumos_validos
+        grupos: Dict[Tuple[str, int], GrupoConsumos] = {}
+        for nit, id_instancia, consumo in GrupoConsumos.iterar_pendientes(fecha_ini, fecha_fin, self._filtro_nit()):
+            clave = (nit, id_instancia)
+            if clave not in grupos:
+                grupos[clave] = GrupoConsumos(nitCliente=nit, idInstancia=id_instancia)
+            grupos[clave].consumos.append(consumo)
+        return list(grupos.values())
+
+    def _filtrar_consumos(self, grupo: GrupoConsumos, minuto_ini: int, minuto_fin: int) -> List[Consumo]:
+        """
+        Devuelve los consumos no facturados dentro del rango (en minutos desde la época).
+        """
+        return [c for c in grupo.consumos if self._consumo_valido(c, minuto_ini, minuto_fin)]
+
+    def _consumo_valido(self, consumo: Consumo, minuto_ini: int, minuto_fin: int) -> bool:
+        return not consumo.facturado and minuto_ini <= consumo.fechaHora.minuto <= minuto_fin
 
     def _marcar_consumos_facturados(self, consumos: List[Consumo]) -> List[ConsumoFactura]:
         """
@@ -116,28 +191,77 @@ class FacturacionService:
             )
         return consumos_facturados
 
-    def _obtener_id_configuracion(self, cliente: Cliente, id_instancia: int) -> int | None:
+    def _filtro_nit(self) -> Optional[Callable[[str], bool]]:
+        """
+        Filtro de NIT de la partición asignada, o None si se factura todo.
+        """
+        if self.particion is None:
+            return None
+        particion, particiones = self.particion
+        return lambda nit: facturacion_paralela.particion_de(nit, particiones) == particion
+
+    def _indexar_grupos(self, grupos: List[GrupoConsumos]) -> Dict[str, List[GrupoConsumos]]:
         """
-        Retorna el idConfiguracion de la instancia especificada del cliente.
+        Agrupa los grupos de consumos por NIT normalizado (en minúsculas), conservando
+        su orden, para no recorrer todos los grupos por cada cliente.
         """
+        por_nit: Dict[str, List[GrupoConsumos]] = {}
+        for grupo in grupos:
+            por_nit.setdefault(grupo.nitCliente.lower(), []).append(grupo)
+        return por_nit
+
+    def _indexar_configuraciones(self, cliente: Cliente) -> Dict[int, int]:
+        """
+        Retorna idInstancia -> idConfiguracion de las instancias del cliente. Si un id
+        se repite vale la primera instancia.
+        """
+        configuraciones: Dict[int, int] = {}
         for inst in cliente.instancias:
-            if inst.id == id_instancia:
-                return inst.idConfiguracion
-        return None
+            configuraciones.setdefault(inst.id, inst.idConfiguracion)
+        return configuraciones
+
+    def _avanzar(self, procesados: int) -> None:
+        """
+        Informa el avance del armado de las facturas: clientes procesados sobre el total.
+        """
+        if self.avance is not None:
+            total = len(self.clientes)
+            self.avance(FRACCION_CALCULO * procesados / total, f"Clientes procesados: {procesados} de {total}")
 
-    def _calcular_costo_instancia(self, id_config: int, horas: float) -> Tuple[Dict[int, float], float]:
+    def _informar(self, fraccion: float, mensaje: str) -> None:
+        if self.avance is not None:
+            self.avance(fraccion, mensaje)
+
+    def _asignar_categorias(self, facturas: List[Factura]) -> None:
+        """
+        Registra en cada detalle la categoría de su configuración al facturar.
+        """
+        gestor_categoria = GestorCategoria()
+        for factura in facturas:
+            for detalle in factura.detalles:
+                detalle.idCategoria = gestor_categoria.get_categoria_id_by_config_id(detalle.idConfiguracion)
+
+    def _configuracion(self, id_config: int) -> Configuracion:
+        configuracion = self.config_por_id.get(id_config)
+        if configuracion is None:
+            raise ValueError(f"Configuración '{id_config}' no encontrada.")
+        return configuracion
+
+    def _calcular_costo_instancia(self, id_config: int,
+                                  horas: float) -> Tuple[Dict[int, float], Dict[int, float], float]:
         """
-        Calcula el costo total de una instancia dada su configuración y horas.
+        Calcula el costo total de una instancia dada su configuración y horas. Retorna
+        la cantidad y el aporte (cantidad * valorXhora * horas) de cada recurso y el
+        total, la suma de los aportes en el orden de la configuración.
         """
-        if id_config not in self.config_por_id:
-            return 0.0
-        configuracion = self.config_por_id[id_config]
+        configuracion = self._configuracion(id_config)
         recursos_cantidad: Dict[int, float] = {}
+        recursos_monto: Dict[int, float] = {}
         total = 0.0
         for rid, cantidad in configuracion.recursos.items():
             recurso = self.recursos.get(rid)
             if recurso:
                 recursos_cantidad[rid] = cantidad
-                total += cantidad * recurso.valorXhora * horas
-        return recursos_cantidad, total
-
+                recursos_monto[rid] = cantidad * recurso.valorXhora * horas
+                total += recursos_monto[rid]
+        return recursos_cantidad, recursos_monto, total
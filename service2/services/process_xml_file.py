@@ -1,31 +1,37 @@
-import xml.etree.ElementTree as ET
 from models.classes.recurso import Recurso
 from models.classes.categoria import Categoria
 from models.classes.cliente import Cliente
 from models.exceptions import ValidationError
 from models.classes.consumo import Consumo, GrupoConsumos
+from services.validate_xml import iterar_validado
+from typing import Dict, Iterable, Iterator, List, Tuple
+import config
 
-def procesar_configuracion(xml_string):
-    root = ET.fromstring(xml_string)
+def procesar_configuracion(ruta, xsd_path):
+    """
+    Valida y procesa el archivo de configuración en un solo recorrido. Los archivos de
+    datos se escriben al final, solo si el archivo es válido; si no lo es se lanza
+    XmlInvalidoError.
+    """
     errors = []
- 
-    # Procesando recursos
     resources = []
-    resource_list = root.find('listaRecursos')
-    if resource_list is not None:
-        for nodo in resource_list.findall('recurso'):
+    categories = []
+    countConfigurations = 0
+    clients = []
+    countInstances = 0
+
+    # recurso, categoria y cliente están dentro de listaRecursos, listaCategorias y listaClientes
+    for nodo in iterar_validado(ruta, xsd_path, 2):
+        # Procesando recursos
+        if nodo.tag == 'recurso':
             try:
                 resource = Recurso.from_element(nodo)
                 resources.append(resource)
             except ValidationError as e:
                 errors.append(f"Error al procesar recurso: {e}")
 
-    # Procesando categorias
-    categories = []
-    countConfigurations = 0
-    category_list = root.find('listaCategorias')
-    if category_list is not None:
-        for nodo in category_list.findall('categoria'):
+        # Procesando categorias
+        elif nodo.tag == 'categoria':
             try:
                 category = Categoria.from_element(nodo)
                 categories.append(category)
@@ -33,12 +39,8 @@ def procesar_configuracion(xml_string):
             except ValidationError as e:
                 errors.append(f"Error al procesar categoria: {e}")
 
-    # Procesando clientes
-    clients = []
-    countInstances = 0
-    client_list = root.find('listaClientes')
-    if client_list is not None:
-        for nodo in client_list.findall('cliente'):
+        # Procesando clientes
+        elif nodo.tag == 'cliente':
             try:
                 client, c_errors = Cliente.from_element(nodo)
                 clients.append(client)
@@ -62,39 +64,51 @@ def procesar_configuracion(xml_string):
         "errors": errors
     }
 
-def procesar_consumo(xml_string):
-    root = ET.fromstring(xml_string)
+def procesar_consumo(ruta, xsd_path):
+    """
+    Valida y procesa el archivo de consumos en un solo recorrido. Los consumos se
+    agregan a la bitácora en lotes de LOTE_CARGA_CONSUMOS, solo si el archivo
+    completo es válido; si no lo es se lanza XmlInvalidoError.
+    """
     errors = []
 
-    # Procesando consumos
-    grupos: Dict[Tuple[str, int], GrupoConsumo] = {}
-    countConsumptions = 0
-    consumption_list = root
-    if consumption_list is not None:
-        for nodo in consumption_list.findall('consumo'):
-            try:
-                nitCliente = nodo.attrib["nitCliente"]
-                idInstancia = int(nodo.attrib["idInstancia"])
-                clave = (nitCliente, idInstancia)
-                if clave not in grupos:
-                    grupos[clave] = GrupoConsumos(nitCliente = nitCliente, idInstancia = idInstancia)
-                grupos[clave].consumos.append(
-                    Consumo(
-                        tiempo = float(nodo.findtext("tiempo", "0")),
-                        fechaHora = nodo.findtext("fechaHora", ""),
-                    )
-                )
-                countConsumptions += 1
-
-            except ValidationError as e:
-                errors.append(f"Error al procesar consumo: {e}")
-    if len(grupos) > 0:
-        # GrupoConsumos.write_xml(list(grupos.values()))
-        GrupoConsumos.append_xml(list(grupos.values()))
-
+    countConsumptions = GrupoConsumos.append_xml_lotes(
+        _lotes_consumos(iterar_validado(ruta, xsd_path, 1), errors, config.LOTE_CARGA_CONSUMOS)
+    )
 
     return {
         "consumos_procesados": countConsumptions,
         "errors": errors
     }
 
+def _lotes_consumos(nodos: Iterable, errors: List[str], tamano: int) -> Iterator[List[GrupoConsumos]]:
+    """
+    Produce los consumos de los elementos `nodos` agrupados por (nitCliente, idInstancia), en lotes
+    de hasta `tamano` consumos. Los consumos inválidos se agregan a `errors`.
+    """
+    grupos: Dict[Tuple[str, int], GrupoConsumos] = {}
+    filas = 0
+    for nodo in nodos:
+        if nodo.tag != 'consumo':
+            continue
+        try:
+            nitCliente = nodo.attrib["nitCliente"]
+            idInstancia = int(nodo.attrib["idInstancia"])
+            clave = (nitCliente, idInstancia)
+            if clave not in grupos:
+                grupos[clave] = GrupoConsumos(nitCliente = nitCliente, idInstancia = idInstancia)
+            grupos[clave].consumos.append(
+                Consumo(
+                    tiempo = float(nodo.findtext("tiempo", "0")),
+                    fechaHora = nodo.findtext("fechaHora", ""),
+                )
+            )
+            filas += 1
+        except ValidationError as e:
+            errors.append(f"Error al procesar consumo: {e}")
+        if filas >= tamano:
+            yield list(grupos.values())
+            grupos = {}
+            filas = 0
+    if grupos:
+        yield list(grupos.values())
@@ -1,7 +1,11 @@
 from __future__ import annotations
 import xml.etree.ElementTree as ET
+import csv
+import io
+import json
+import os
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from models.classes.consumo import GrupoConsumos, Consumo
 from models.classes.factura import Factura
 from models.classes.detalle_factura import DetalleFactura, ConsumoFactura
@@ -10,6 +14,7 @@ from models.classes.categoria import Categoria, GestorCategoria
 from models.classes.cliente import Cliente
 from models.classes.configuracion import Configuracion
 from models.classes.factura import Factura
+from models.classes.ingreso_diario import IngresoDiario
 
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
@@ -20,22 +25,31 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
 
+# Columnas de los datos de cada reporte (GET /reporte/<id>/datos)
+COLUMNAS_REPORTES = {
+    "1": ["seccion", "posicion", "id", "nombre", "categoria", "descripcion", "ingresos"],
+    "2": ["posicion", "id", "nombre", "abreviatura", "tipo", "metrica", "valorXhora", "ingresos"],
+}
+
+
 class ReporteService:
 
-    def __init__(self, fecha_inicio: str, fecha_fin: str):
+    def __init__(self, fecha_inicio: str, fecha_fin: str,
+                 avance: Optional[Callable[[float, str], None]] = None):
         self.base_path = "data/pdfs"
         self.fecha_inicio = datetime.strptime(fecha_inicio, "%d/%m/%Y")
         self.fecha_fin = datetime.strptime(fecha_fin, "%d/%m/%Y")
-        self.facturas = Factura.get_all()
+        # avance(fraccion, mensaje): elementos del PDF ya ubicados en sus páginas
+        self.avance = avance
 
-    def reporte1(self):
+    def reporte1(self, filename: Optional[str] = None):
         gestor_categoria = GestorCategoria()
         categoria, config = self._generar_datos_reporte1(gestor_categoria)
  
         # Crear el documento PDF
         fecha_inicio_str = self.fecha_inicio.strftime('%d%m%Y')
         fecha_fin_str = self.fecha_fin.strftime('%d%m%Y')
-        filename = f"{self.base_path}/reporte_ingresos_por_categoria.pdf"
+        filename = filename or f"{self.base_path}/reporte_ingresos_por_categoria.pdf"
 
         doc = SimpleDocTemplate(
             filename,
@@ -197,11 +211,11 @@ class ReporteService:
         elements.append(stats_paragraph)
 
         # Generar el PDF
-        doc.build(elements)
+        self._construir(doc, elements)
 
         return filename
 
-    def reporte2(self):
+    def reporte2(self, filename: Optional[str] = None):
         recursos = Recurso.get_dict_recursos()
         ingresos_por_recurso = self._generar_datos_reporte2(recursos)
 
@@ -209,7 +223,7 @@ class ReporteService:
         fecha_inicio_str = self.fecha_inicio.strftime('%d%m%Y')
         fecha_fin_str = self.fecha_fin.strftime('%d%m%Y')
 
-        filename = f"{self.base_path}/reporte_ingresos_recursos.pdf"
+        filename = filename or f"{self.base_path}/reporte_ingresos_recursos.pdf"
 
         doc = SimpleDocTemplate(
             filename,
@@ -427,7 +441,7 @@ class ReporteService:
         elements.append(footer_paragraph)
 
         # Generar el PDF
-        doc.build(elements)
+        self._construir(doc, elements)
 
         return filename
 
@@ -435,70 +449,135 @@ class ReporteService:
     # ------------------------------
     # MÉTODOS AUXILIARES
     # ------------------------------
+    def filas(self, reporte_id: str) -> Iterator[dict]:
+        """
+        Datos del reporte, fila por fila, con las columnas de COLUMNAS_REPORTES. Se
+        arman con la misma agregación que el PDF pero incluyen todas las filas, no
+        solo las primeras. La agregación se hace al llamar (sus errores se lanzan
+        aquí); las filas se generan al recorrer el iterador.
+        """
+        if reporte_id == "1":
+            return self._filas_reporte1()
+        if reporte_id == "2":
+            return self._filas_reporte2()
+        raise ValueError(f"ID de reporte no válido '{reporte_id}'.")
+
+    def _filas_reporte1(self) -> Iterator[dict]:
+        gestor_categoria = GestorCategoria()
+        categoria, config = self._generar_datos_reporte1(gestor_categoria)
+
+        def iterar() -> Iterator[dict]:
+            for i, (cat_id, monto) in enumerate(categoria, 1):
+                cat_obj = gestor_categoria.get_categoria_by_id(cat_id)
+                yield {
+                    "seccion": "categoria",
+                    "posicion": i,
+                    "id": cat_id,
+                    "nombre": cat_obj.nombre if cat_obj else None,
+                    "categoria": None,
+                    "descripcion": cat_obj.descripcion if cat_obj else None,
+                    "ingresos": round(monto, 2),
+                }
+
+            for i, (config_id, monto) in enumerate(config, 1):
+                config_obj = gestor_categoria.get_config_by_id(config_id)
+                cat_id = gestor_categoria.get_categoria_id_by_config_id(config_id)
+                cat_obj = gestor_categoria.get_categoria_by_id(cat_id) if cat_id else None
+                yield {
+                    "seccion": "configuracion",
+                    "posicion": i,
+                    "id": config_id,
+                    "nombre": config_obj.nombre if config_obj else None,
+                    "categoria": cat_obj.nombre if cat_obj else None,
+                    "descripcion": config_obj.descripcion if config_obj else None,
+                    "ingresos": round(monto, 2),
+                }
+
+        return iterar()
+
+    def _filas_reporte2(self) -> Iterator[dict]:
+        recursos = Recurso.get_dict_recursos()
+        ingresos_por_recurso = self._generar_datos_reporte2(recursos)
+
+        def iterar() -> Iterator[dict]:
+            for i, (recurso_id, monto) in enumerate(ingresos_por_recurso, 1):
+                recurso_obj = recursos.get(recurso_id)
+                yield {
+                    "posicion": i,
+                    "id": recurso_id,
+                    "nombre": recurso_obj.nombre if recurso_obj else None,
+                    "abreviatura": recurso_obj.abreviatura if recurso_obj else None,
+                    "tipo": recurso_obj.tipo if recurso_obj else None,
+                    "metrica": recurso_obj.metrica if recurso_obj else None,
+                    "valorXhora": recurso_obj.valorXhora if recurso_obj else None,
+                    "ingresos": round(monto, 2),
+                }
+
+        return iterar()
+
+    def _construir(self, doc: SimpleDocTemplate, elements: list) -> None:
+        os.makedirs(os.path.dirname(doc.filename) or ".", exist_ok=True)
+        if self.avance is None:
+            doc.build(elements)
+            return
+        total = len(elements)
+        ubicados = 0
+
+        def despues(flowable) -> None:
+            nonlocal ubicados
+            # Una tabla partida entre páginas cuenta una vez por parte
+            ubicados = min(ubicados + 1, total)
+            self.avance(ubicados / total, f"Elementos del PDF ubicados: {ubicados} de {total}")
+
+        doc.afterFlowable = despues
+        doc.build(elements)
+
     def _generar_datos_reporte1(self, gestor_categoria: GestorCategoria):
         """
             En la factura, el subtotal de una instancia corresponde a la sumatoria de los
-            recursos consumidos de una configuración.
-            - Agrupar cada subtotal por configuración (mediante su id) y sumarlos. Luego
-              ordenarlos de mayor a menor para saber cuáles son las configuraciones más rentables.
-            - Buscar a que Categoria pertenece cada configuración y agrupar los totales por Categoría.
+            recursos consumidos de una configuración. Los subtotales ya están sumados por
+            día, configuración y categoría (IngresoDiario), así solo se suman los días
+            del rango.
+            - Ordenar las configuraciones de mayor a menor para saber cuáles son las más rentables.
+            - Ordenar las categorías (la de cada configuración al facturar) de mayor a menor.
         """
-        facturas_filtradas = self._filtrar_facturas()
-        grupo_conf: Dict[int, float] = {} # [id_configuracion] = sumatoria_subtotal
- 
-        # Agrupando y sumando subtotales por configuración
-        for factura in facturas_filtradas:
-            for detalle in factura.detalles:
-                if detalle.idConfiguracion not in grupo_conf:
-                    grupo_conf[detalle.idConfiguracion] = detalle.subtotal
-                else:
-                    grupo_conf[detalle.idConfiguracion] += detalle.subtotal
-        # Ordenando de mayor a menor
-        config_desc = sorted(grupo_conf.items(), key=lambda item: item[1], reverse=True)
-
-        # Buscando categorías y agrupando totales por categoría
-        grupo_categoria: Dict[int, float] = {} # [id_categoria] = sumatoria_subtotal
-        for idConfiguracion, total in config_desc:
-            id_categoria = gestor_categoria.get_categoria_id_by_config_id(idConfiguracion)
-            if id_categoria is None:
-                continue
-            if id_categoria not in grupo_categoria:
-                grupo_categoria[id_categoria] = total
-            else:
-                grupo_categoria[id_categoria] += total
-        # Ordenando de mayor a menor
-        categoria_desc = sorted(grupo_categoria.items(), key=lambda item: item[1], reverse=True)
-
+        ingresos = IngresoDiario.get_totales(self.fecha_inicio, self.fecha_fin)
+        config_desc = sorted(ingresos["configuracion"].items(), key=lambda item: item[1], reverse=True)
+        categoria_desc = sorted(ingresos["categoria"].items(), key=lambda item: item[1], reverse=True)
         return (categoria_desc, config_desc)
 
 
     def _generar_datos_reporte2(self, recursos: Dict[int, Recurso]):
-        facturas_filtradas = self._filtrar_facturas()
-
-        # Agrupar aportes por recurso
-        grupo_recursos: Dict[int, float] = {} # [id_recurso] = aporte_total
-        for factura in facturas_filtradas:
-            for detalle in factura.detalles:
-               for rid, cantidad in detalle.recursos_cantidad.items():
-                    recurso = recursos.get(rid)
-                    if recurso is None:
-                        continue
-                    precio = recurso.valorXhora
-                    aporte = cantidad * precio * detalle.horas
-                    if rid not in grupo_recursos:
-                        grupo_recursos[rid] = aporte
-                    else:
-                        grupo_recursos[rid] += aporte
+        # Aportes por recurso (cantidad * precio al facturar * horas) sumados por día
+        ingresos = IngresoDiario.get_totales(self.fecha_inicio, self.fecha_fin)
         # Ordenando de mayor a menor
-        return sorted(grupo_recursos.items(), key=lambda item: item[1], reverse=True)
-
-    def _filtrar_facturas(self) -> List[Factura]:
-        facturas_filtradas = []
-        for item in self.facturas:
-            fecha = datetime.strptime(item.fechaEmision, "%d/%m/%Y")
-            if self.fecha_inicio <= fecha <= self.fecha_fin:
-                facturas_filtradas.append(item)
-        return facturas_filtradas
-
-
-
+        return sorted(ingresos["recurso"].items(), key=lambda item: item[1], reverse=True)
+
+
+def filas_json(encabezado: dict, filas: Iterable[dict]) -> Iterator[str]:
+    """
+    Serializa `encabezado` con las filas en la clave "filas", entregando una fila a
+    la vez.
+    """
+    inicio = json.dumps(encabezado, ensure_ascii=False)
+    yield inicio[:-1] + (', "filas": [' if encabezado else '"filas": [')
+    separador = ""
+    for fila in filas:
+        yield separador + json.dumps(fila, ensure_ascii=False)
+        separador = ", "
+    yield "]}"
+
+
+def filas_csv(columnas: List[str], filas: Iterable[dict]) -> Iterator[str]:
+    """
+    Serializa las filas en CSV con encabezado, entregando una línea a la vez.
+    """
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=columnas)
+    escritor.writeheader()
+    for fila in filas:
+        escritor.writerow(fila)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
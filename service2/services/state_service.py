@@ -61,9 +61,13 @@ class StateService:
         recursos = Recurso.get_dict_recursos()
         config_por_id = Categoria.get_dict_configuraciones()
         clientes = Cliente.get_all()
-        grupo_consumos = GrupoConsumos.get_all_dict()
         clientes_dict = []
 
+        # Consumos por "nit-idInstancia", leídos en streaming sin cargar todo el árbol XML
+        consumos_por_instancia: Dict[str, List[Dict]] = {}
+        for nit, id_instancia, consumo in GrupoConsumos.iterar_consumos():
+            consumos_por_instancia.setdefault(f"{nit.lower()}-{str(id_instancia)}", []).append(consumo.to_dict())
+
         def crear_configuracion(id_configuracion: int) -> Dict:
             config = config_por_id.get(id_configuracion)
             config_dict = config.to_dict()
@@ -85,9 +89,9 @@ class StateService:
                 config_found = config_por_id.get(instancia.idConfiguracion)
                 instancia_dict["configuracion"] = crear_configuracion(instancia.idConfiguracion)
                 # Generando consumos de instancia
-                g_consumo_found = grupo_consumos.get(f"{cliente.nit.lower()}-{str(instancia.id)}")
-                if g_consumo_found is not None:
-                    instancia_dict["consumos"] = [c.to_dict() for c in g_consumo_found.consumos]
+                consumos_found = consumos_por_instancia.get(f"{cliente.nit.lower()}-{str(instancia.id)}")
+                if consumos_found is not None:
+                    instancia_dict["consumos"] = consumos_found
                 # Agregando instancia al cliente
                 cliente_dict.setdefault("instancias", []).append(instancia_dict)
             clientes_dict.append(cliente_dict)
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+from typing import Iterator
+import os
+import shutil
+import tempfile
+
+# Tamaño de los bloques con que se copia un archivo subido a disco
+BLOQUE = 1024 * 1024
+
+
+@contextmanager
+def guardar_subida(archivo) -> Iterator[str]:
+    """
+    Copia por bloques el archivo subido (`request.files[...]`) a un archivo temporal
+    y retorna su ruta, para validarlo y procesarlo en streaming sin cargarlo entero en
+    memoria. El temporal se elimina al salir.
+    """
+    descriptor, ruta = tempfile.mkstemp(prefix="subida-", suffix=".xml")
+    try:
+        with os.fdopen(descriptor, "wb") as destino:
+            shutil.copyfileobj(archivo.stream, destino, BLOQUE)
+        yield ruta
+    finally:
+        os.remove(ruta)
@@ -0,0 +1,432 @@
+"""
+Trabajos en segundo plano para las operaciones largas: facturación y reportes PDF.
+
+`encolar(tipo, parametros)` registra un trabajo y retorna enseguida; un grupo de
+TRABAJOS_HILOS hilos del proceso los ejecuta en orden de llegada. El estado
+(pendiente, en_proceso, completado, error), el avance y el resultado se consultan con
+`obtener(id)`. El resultado (el resumen de la facturación o el PDF del reporte, en
+data/trabajos/) se conserva TRABAJOS_TTL segundos desde que el trabajo termina.
+
+La cola vive en la memoria del proceso (SERVICE2_COLA_TRABAJOS=memoria) o en una base
+SQLite (sqlite, en RUTA_TRABAJOS). La cola SQLite la comparten los procesos del
+servicio, que toman cada trabajo pendiente de forma atómica, y conserva los trabajos
+si un proceso se reinicia. Mientras un trabajo está en proceso, el proceso que lo
+ejecuta renueva su latido; al tomar trabajos, los que llevan TRABAJOS_LATIDO_MAX
+segundos sin latido (su proceso terminó o se colgó) vuelven a la cola. Un trabajo
+puede así ejecutarse más de una vez: facturar no repite facturas porque los
+consumos ya facturados quedan marcados. Solo quien tomó el trabajo por última vez lo
+guarda; una ejecución anterior que continúa se detiene en su siguiente avance.
+"""
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import config
+
+DIR_TRABAJOS = "data/trabajos"
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+# Espera máxima de un hilo sin trabajos antes de revisar la cola compartida y los
+# resultados vencidos
+ESPERA_SEGUNDOS = 0.5
+# Intervalo mínimo entre dos guardados del avance de un trabajo
+INTERVALO_AVANCE = 0.25
+
+Avance = Callable[[float, str], None]
+
+
+@dataclass
+class Trabajo:
+    id: str
+    tipo: str
+    parametros: Dict[str, Any]
+    estado: str = PENDIENTE
+    avance: float = 0.0
+    mensaje: str = ""
+    resultado: Optional[Dict[str, Any]] = None
+    archivo: Optional[str] = None
+    error: Optional[str] = None
+    creado: float = field(default_factory=time.time)
+    terminado: Optional[float] = None
+    proceso: Optional[int] = None
+    # Identifica cada vez que se toma el trabajo: solo quien lo tomó último lo guarda
+    toma: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "avance": self.avance,
+            "mensaje": self.mensaje,
+            "resultado": self.resultado,
+            "error": self.error,
+            "creado": self.creado,
+            "terminado": self.terminado,
+            "expira": None if self.terminado is None else self.terminado + config.TRABAJOS_TTL,
+        }
+
+
+class ColaMemoria:
+    """
+    Cola de trabajos en la memoria del proceso.
+    """
+
+    def __init__(self):
+        self._trabajos: Dict[str, Trabajo] = {}
+        self._pendientes: Deque[str] = deque()
+        self._condicion = threading.Condition()
+
+    def agregar(self, trabajo: Trabajo) -> None:
+        with self._condicion:
+            self._trabajos[trabajo.id] = trabajo
+            self._pendientes.append(trabajo.id)
+            self._condicion.notify()
+
+    def tomar(self, espera: float) -> Optional[Trabajo]:
+        with self._condicion:
+            if not self._pendientes:
+                self._condicion.wait(espera)
+            if not self._pendientes:
+                return None
+            trabajo = self._trabajos[self._pendientes.popleft()]
+            trabajo.estado = EN_PROCESO
+            trabajo.proceso = os.getpid()
+            return trabajo
+
+    def guardar(self, trabajo: Trabajo) -> bool:
+        # Los trabajos en memoria se modifican en su lugar y no se vuelven a tomar
+        return True
+
+    def obtener(self, id_trabajo: str) -> Optional[Trabajo]:
+        with self._condicion:
+            return self._trabajos.get(id_trabajo)
+
+    def quitar_vencidos(self, limite: float) -> List[Trabajo]:
+        with self._condicion:
+            vencidos = [t for t in self._trabajos.values() if t.terminado is not None and t.terminado < limite]
+            for trabajo in vencidos:
+                del self._trabajos[trabajo.id]
+            return vencidos
+
+    def renovar(self, trabajo: Trabajo) -> bool:
+        return True
+
+    def recuperar_huerfanos(self) -> None:
+        pass
+
+    def vaciar(self) -> None:
+        with self._condicion:
+            self._trabajos.clear()
+            self._pendientes.clear()
+
+
+class ColaSqlite:
+    """
+    Cola de trabajos en una base SQLite compartida entre procesos.
+    """
+
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS trabajos (
+        id TEXT PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        parametros TEXT NOT NULL, -- JSON
+        estado TEXT NOT NULL,
+        avance REAL NOT NULL,
+        mensaje TEXT NOT NULL,
+        resultado TEXT, -- JSON
+        archivo TEXT,
+        error TEXT,
+        creado REAL NOT NULL,
+        terminado REAL,
+        proceso INTEGER,
+        toma TEXT,
+        latido REAL -- último latido del proceso que lo ejecuta
+    );
+    CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos(estado, creado);
+    """
+    COLUMNAS = ("id", "tipo", "parametros", "estado", "avance", "mensaje", "resultado", "archivo",
+                "error", "creado", "terminado", "proceso", "toma")
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        # Avisa a los hilos del proceso de los trabajos encolados aquí; los de otros
+        # procesos se encuentran al revisar la cola cada ESPERA_SEGUNDOS
+        self._condicion = threading.Condition()
+
+    def agregar(self, trabajo: Trabajo) -> None:
+        self._conexion().execute(
+            f"INSERT INTO trabajos ({', '.join(self.COLUMNAS)}) VALUES ({', '.join('?' * len(self.COLUMNAS))})",
+            self._fila(trabajo)
+        )
+        with self._condicion:
+            self._condicion.notify()
+
+    def tomar(self, espera: float) -> Optional[Trabajo]:
+        trabajo = self._tomar_pendiente()
+        if trabajo is None:
+            with self._condicion:
+                self._condicion.wait(espera)
+            trabajo = self._tomar_pendiente()
+        return trabajo
+
+    def guardar(self, trabajo: Trabajo) -> bool:
+        """
+        Guarda el trabajo si sigue siendo de quien lo tomó. Retorna False si se volvió
+        a la cola (sin latido) y otro lo tomó o lo terminó: no se guarda nada.
+        """
+        asignaciones = ", ".join(f"{c} = ?" for c in self.COLUMNAS[1:])
+        cursor = self._conexion().execute(
+            f"UPDATE trabajos SET {asignaciones}, latido = ? WHERE id = ? AND toma IS ?",
+            self._fila(trabajo)[1:] + (time.time(), trabajo.id, trabajo.toma)
+        )
+        return cursor.rowcount > 0
+
+    def renovar(self, trabajo: Trabajo) -> bool:
+        """
+        Renueva el latido del trabajo si sigue en proceso para quien lo tomó.
+        """
+        cursor = self._conexion().execute(
+            "UPDATE trabajos SET latido = ? WHERE id = ? AND estado = ? AND toma IS ?",
+            (time.time(), trabajo.id, EN_PROCESO, trabajo.toma)
+        )
+        return cursor.rowcount > 0
+
+    def obtener(self, id_trabajo: str) -> Optional[Trabajo]:
+        fila = self._conexion().execute(
+            f"SELECT {', '.join(self.COLUMNAS)} FROM trabajos WHERE id = ?", (id_trabajo,)
+        ).fetchone()
+        return None if fila is None else self._trabajo(fila)
+
+    def quitar_vencidos(self, limite: float) -> List[Trabajo]:
+        filas = self._conexion().execute(
+            f"DELETE FROM trabajos WHERE terminado < ? RETURNING {', '.join(self.COLUMNAS)}", (limite,)
+        ).fetchall()
+        return [self._trabajo(fila) for fila in filas]
+
+    def recuperar_huerfanos(self) -> None:
+        """
+        Devuelve a la cola los trabajos en proceso sin latido en los últimos
+        TRABAJOS_LATIDO_MAX segundos.
+        """
+        self._conexion().execute(
+            "UPDATE trabajos SET estado = ?, proceso = NULL, toma = NULL "
+            "WHERE estado = ? AND (latido IS NULL OR latido < ?)",
+            (PENDIENTE, EN_PROCESO, time.time() - config.TRABAJOS_LATIDO_MAX)
+        )
+
+    def vaciar(self) -> None:
+        self._conexion().execute("DELETE FROM trabajos")
+
+    # ------------------------------
+    # MÉTODOS AUXILIARES
+    # ------------------------------
+    def _tomar_pendiente(self) -> Optional[Trabajo]:
+        self.recuperar_huerfanos()
+        # Una sola sentencia: dos procesos no pueden tomar el mismo trabajo
+        fila = self._conexion().execute(
+            f"UPDATE trabajos SET estado = ?, proceso = ?, toma = ?, latido = ? WHERE id = ("
+            f"SELECT id FROM trabajos WHERE estado = ? ORDER BY creado, rowid LIMIT 1"
+            f") RETURNING {', '.join(self.COLUMNAS)}",
+            (EN_PROCESO, os.getpid(), uuid.uuid4().hex, time.time(), PENDIENTE)
+        ).fetchone()
+        return None if fila is None else self._trabajo(fila)
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conexion", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.ruta, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.ESQUEMA)
+            # Bases creadas antes de los latidos
+            columnas = {columna[1] for columna in conn.execute("PRAGMA table_info(trabajos)")}
+            for columna, tipo in (("toma", "TEXT"), ("latido", "REAL")):
+                if columna not in columnas:
+                    conn.execute(f"ALTER TABLE trabajos ADD COLUMN {columna} {tipo}")
+            self._local.conexion = conn
+        return conn
+
+    def _fila(self, trabajo: Trabajo) -> tuple:
+        return (
+            trabajo.id, trabajo.tipo, json.dumps(trabajo.parametros), trabajo.estado, trabajo.avance,
+            trabajo.mensaje, None if trabajo.resultado is None else json.dumps(trabajo.resultado),
+            trabajo.archivo, trabajo.error, trabajo.creado, trabajo.terminado, trabajo.proceso,
+            trabajo.toma,
+        )
+
+    def _trabajo(self, fila: tuple) -> Trabajo:
+        valores = dict(zip(self.COLUMNAS, fila))
+        valores["parametros"] = json.loads(valores["parametros"])
+        if valores["resultado"] is not None:
+            valores["resultado"] = json.loads(valores["resultado"])
+        return Trabajo(**valores)
+
+
+# ------------------------------
+# EJECUCIÓN
+# ------------------------------
+def _facturar(trabajo: Trabajo, avance: Avance) -> None:
+    from services.facturacion_service import FacturacionService
+
+    avance(0.0, "Generando facturas")
+    trabajo.resultado = FacturacionService(avance=avance).facturar(
+        trabajo.parametros["fecha_inicio"], trabajo.parametros["fecha_fin"]
+    )
+
+
+def _reporte(trabajo: Trabajo, avance: Avance) -> None:
+    from services.reporte_service import ReporteService
+
+    avance(0.0, "Generando reporte")
+    reporte_service = ReporteService(trabajo.parametros["fecha_inicio"], trabajo.parametros["fecha_fin"], avance)
+    ruta_pdf = os.path.join(DIR_TRABAJOS, f"{trabajo.id}.pdf")
+    if trabajo.parametros["reporte_id"] == "1":
+        trabajo.archivo = reporte_service.reporte1(ruta_pdf)
+    else:
+        trabajo.archivo = reporte_service.reporte2(ruta_pdf)
+
+
+EJECUTORES: Dict[str, Callable[[Trabajo, Avance], None]] = {
+    "factura": _facturar,
+    "reporte": _reporte,
+}
+
+_cola = None
+_hilos: List[threading.Thread] = []
+_lock = threading.Lock()
+
+
+def encolar(tipo: str, parametros: Dict[str, Any]) -> Trabajo:
+    """
+    Registra un trabajo de `tipo` (una clave de EJECUTORES) y lo deja pendiente.
+    """
+    if tipo not in EJECUTORES:
+        raise ValueError(f"Tipo de trabajo no válido '{tipo}'.")
+    trabajo = Trabajo(id=uuid.uuid4().hex, tipo=tipo, parametros=parametros)
+    _obtener_cola().agregar(trabajo)
+    return trabajo
+
+
+def obtener(id_trabajo: str) -> Optional[Trabajo]:
+    """
+    Retorna el trabajo, o None si no existe o su resultado ya venció.
+    """
+    trabajo = _obtener_cola().obtener(id_trabajo)
+    if trabajo is not None and trabajo.terminado is not None \
+            and trabajo.terminado + config.TRABAJOS_TTL < time.time():
+        return None
+    return trabajo
+
+
+def vaciar() -> None:
+    """
+    Quita todos los trabajos y sus resultados. Los que estén en proceso ya no son de
+    nadie: se detienen en su siguiente avance sin guardar nada.
+    """
+    with _lock:
+        cola = _cola
+    if cola is None and config.COLA_TRABAJOS == "sqlite" and os.path.exists(config.RUTA_TRABAJOS):
+        # La base la comparten los procesos del servicio: se vacía, no se elimina
+        cola = ColaSqlite(config.RUTA_TRABAJOS)
+    if cola is not None:
+        cola.vaciar()
+    shutil.rmtree(DIR_TRABAJOS, ignore_errors=True)
+
+
+def _obtener_cola():
+    global _cola
+    with _lock:
+        if _cola is None:
+            _cola = ColaSqlite(config.RUTA_TRABAJOS) if config.COLA_TRABAJOS == "sqlite" else ColaMemoria()
+            _cola.recuperar_huerfanos()
+            os.makedirs(DIR_TRABAJOS, exist_ok=True)
+            for i in range(config.TRABAJOS_HILOS):
+                hilo = threading.Thread(target=_trabajar, args=(_cola,), name=f"trabajos-{i}", daemon=True)
+                hilo.start()
+                _hilos.append(hilo)
+        return _cola
+
+
+def _trabajar(cola) -> None:
+    while True:
+        try:
+            trabajo = cola.tomar(ESPERA_SEGUNDOS)
+            if trabajo is None:
+                _quitar_vencidos(cola)
+                continue
+            _ejecutar(cola, trabajo)
+        except Exception as e:
+            print(f"Error en la cola de trabajos: {e}")
+            time.sleep(ESPERA_SEGUNDOS)
+
+
+class TrabajoReasignado(Exception):
+    """
+    El trabajo volvió a la cola mientras se ejecutaba y otro lo tomó.
+    """
+
+
+def _ejecutar(cola, trabajo: Trabajo) -> None:
+    guardado = 0.0
+    reasignado = threading.Event()
+
+    def avance(fraccion: float, mensaje: str) -> None:
+        nonlocal guardado
+        trabajo.avance = fraccion
+        trabajo.mensaje = mensaje
+        # Los ejecutores informan el avance en cada paso de su ciclo
+        if reasignado.is_set():
+            raise TrabajoReasignado()
+        if time.monotonic() - guardado >= INTERVALO_AVANCE:
+            if not cola.guardar(trabajo):
+                raise TrabajoReasignado()
+            guardado = time.monotonic()
+
+    terminado = threading.Event()
+    latido = threading.Thread(target=_latir, args=(cola, trabajo, terminado, reasignado), daemon=True)
+    latido.start()
+    try:
+        EJECUTORES[trabajo.tipo](trabajo, avance)
+        trabajo.estado = COMPLETADO
+        trabajo.avance = 1.0
+        trabajo.mensaje = ""
+    except TrabajoReasignado:
+        reasignado.set()
+    except Exception as e:
+        trabajo.estado = ERROR
+        trabajo.error = str(e)
+    finally:
+        terminado.set()
+        latido.join()
+    trabajo.terminado = time.time()
+    if reasignado.is_set() or not cola.guardar(trabajo):
+        print(f"El trabajo {trabajo.id} volvió a la cola y lo tomó otro; se descarta esta ejecución.")
+
+
+def _latir(cola, trabajo: Trabajo, terminado: threading.Event, reasignado: threading.Event) -> None:
+    while not terminado.wait(config.TRABAJOS_LATIDO_MAX / 4):
+        try:
+            if not cola.renovar(trabajo):
+                reasignado.set()
+                return
+        except Exception as e:
+            print(f"Error al renovar el latido del trabajo {trabajo.id}: {e}")
+
+
+def _quitar_vencidos(cola) -> None:
+    for trabajo in cola.quitar_vencidos(time.time() - config.TRABAJOS_TTL):
+        if trabajo.archivo and os.path.exists(trabajo.archivo):
+            os.remove(trabajo.archivo)
@@ -1,17 +1,63 @@
 from lxml import etree
+from models.exceptions import XmlInvalidoError
+from models.repositorio import repositorio
 
-def validate_xml(xml_string, xsd_path):
-    try:
-        with open(xsd_path, 'rb') as f:
-            schema_doc = etree.XML(f.read())
-            esquema = etree.XMLSchema(schema_doc)
+def obtener_esquema(xsd_path):
+    """
+    Retorna el esquema XSD compilado de `xsd_path`. Se guarda en el repositorio y se
+    vuelve a compilar solo si el archivo .xsd cambia.
+    """
+    return repositorio.obtener(xsd_path, _compilar_esquema, "esquema")
 
-        xml_doc = etree.fromstring(xml_string.encode('utf-8'))
-        esquema.assertValid(xml_doc)
-        return True, "XML válido según el esquema XSD."
+def _compilar_esquema(xsd_path):
+    with open(xsd_path, 'rb') as f:
+        schema_doc = etree.XML(f.read())
+    return etree.XMLSchema(schema_doc)
 
-    except etree.DocumentInvalid as e:
-        return False, f"XML inválido: {str(e)}"
+def iterar_validado(ruta_xml, xsd_path, profundidad):
+    """
+    Recorre el archivo `ruta_xml` una sola vez, validándolo contra el esquema mientras
+    se parsea, y produce cada elemento ubicado a `profundidad` niveles de la raíz apenas
+    termina de parsearse; después de procesarlo se libera, así la memoria no depende
+    del tamaño del archivo. Cada elemento producido es válido, pero un error posterior
+    lanza XmlInvalidoError más adelante, por lo que los elementos solo deben guardarse
+    después de recorrer el archivo completo.
+    """
+    try:
+        esquema = obtener_esquema(xsd_path)
     except Exception as e:
-        return False, f"Error al validar: {str(e)}"
+        raise XmlInvalidoError(f"Error al validar: {str(e)}") from e
 
+    abiertos = []
+    try:
+        contexto = etree.iterparse(ruta_xml, events=('start', 'end'), schema=esquema)
+        for evento, el in contexto:
+            if evento == 'start':
+                abiertos.append(el)
+                continue
+            abiertos.pop()
+            if len(abiertos) == profundidad:
+                # Un elemento se entrega solo si el archivo es válido hasta él
+                for error in contexto.error_log:
+                    if error.domain_name == "SCHEMASV":
+                        raise XmlInvalidoError(f"XML inválido: {error.message}")
+                yield el
+                abiertos[-1].clear()
+    except etree.XMLSyntaxError as e:
+        # iterparse informa los errores de validación como errores de sintaxis
+        if e.error_log and e.error_log.last_error.domain_name == "SCHEMASV":
+            raise XmlInvalidoError(f"XML inválido: {str(e)}") from e
+        raise XmlInvalidoError(f"Error al validar: {str(e)}") from e
+    except OSError as e:
+        raise XmlInvalidoError(f"Error al validar: {str(e)}") from e
+
+def validate_xml(ruta_xml, xsd_path):
+    """
+    Valida el archivo `ruta_xml` contra el esquema XSD sin procesarlo.
+    """
+    try:
+        for _ in iterar_validado(ruta_xml, xsd_path, 1):
+            pass
+        return True, "XML válido según el esquema XSD."
+    except XmlInvalidoError as e:
+        return False, str(e)
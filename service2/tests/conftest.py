@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+import pytest
+
+RAIZ_SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_SERVICIO)
+
+from models.repositorio import repositorio
+
+
+@pytest.fixture
+def datos(tmp_path, monkeypatch):
+    """
+    Directorio de trabajo temporal con data/ (solo recursos y categorías de ejemplo) y
+    schemas/, como el de la carpeta service2.
+    """
+    os.makedirs(tmp_path / "data")
+    for archivo in ("recursos.xml", "categorias.xml"):
+        shutil.copy(os.path.join(RAIZ_SERVICIO, "data", archivo), tmp_path / "data" / archivo)
+    os.symlink(os.path.join(RAIZ_SERVICIO, "schemas"), tmp_path / "schemas")
+    monkeypatch.chdir(tmp_path)
+    repositorio.limpiar()
+    yield tmp_path
+    repositorio.limpiar()
+
+
+@pytest.fixture
+def consumos(datos):
+    """
+    `datos` con 12 clientes (ver benchmarks.facturacion.generar_clientes), cada uno con
+    una instancia y consumos de enero de 2025 sin facturar.
+    """
+    from benchmarks.facturacion import generar_clientes
+    from models.classes.consumo import Consumo, GrupoConsumos
+
+    generar_clientes(str(datos), 12)
+    grupos = [
+        GrupoConsumos(nitCliente=f"{1000000 + g}-{g % 10}", idInstancia=g, consumos=[
+            Consumo(round(0.1 + (g * 7 + h * 13) % 37 / 10, 2), f"{1 + h % 28:02d}/01/2025 {h % 24:02d}:15")
+            for h in range(30)
+        ])
+        for g in range(12)
+    ]
+    GrupoConsumos.append_xml(grupos)
+    return datos
+
+
+@pytest.fixture
+def cliente_http(datos, monkeypatch):
+    """
+    Cliente de prueba de la aplicación Flask sobre `datos`.
+    """
+    import app
+    from models import cola_escritura
+
+    monkeypatch.setattr(cola_escritura, "_colas", {})
+    return app.app.test_client()
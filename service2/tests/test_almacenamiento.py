@@ -0,0 +1,40 @@
+import pytest
+from models import almacen_sqlite
+from models.classes.factura import Factura
+from services import almacenamiento_service
+from services.facturacion_service import FacturacionService
+
+
+@pytest.fixture
+def sqlite(consumos, monkeypatch):
+    """
+    `consumos` facturados, con una base SQLite propia; los modelos siguen leyendo los
+    XML.
+    """
+    FacturacionService().facturar("01/01/2025", "15/01/2025")
+    monkeypatch.setattr(almacen_sqlite.config, "RUTA_SQLITE", str(consumos / "data" / "service2.db"))
+    monkeypatch.setattr(almacen_sqlite._local, "conexion", None, raising=False)
+    yield consumos
+    almacen_sqlite._local.conexion.close()
+    almacen_sqlite._local.conexion = None
+
+
+def contar() -> dict:
+    return {tabla: almacen_sqlite.consultar(f"SELECT COUNT(*) FROM {tabla}")[0][0] for tabla in almacen_sqlite.TABLAS}
+
+
+def test_importar_xml_falla_sin_cambiar_la_base(sqlite, monkeypatch):
+    resumen = almacenamiento_service.importar_xml()
+    assert resumen["clientes"] == 12 and resumen["grupos_consumo"] == 12
+    antes = contar()
+    assert antes["clientes"] == 12 and antes["consumos"] == 12 * 30 and antes["facturas"] == 12
+
+    def fallar(facturas):
+        raise OSError("disco lleno")
+
+    # Falla la última tabla, después de vaciar y llenar las demás
+    monkeypatch.setattr(Factura, "_sqlite_agregar", staticmethod(fallar))
+    with pytest.raises(OSError):
+        almacenamiento_service.importar_xml()
+    assert contar() == antes
+    assert not almacen_sqlite.conexion().in_transaction
@@ -0,0 +1,49 @@
+import threading
+import time
+import pytest
+import config
+from models import cola_escritura
+from models.classes.cliente import Cliente
+
+
+@pytest.fixture
+def colas(consumos, monkeypatch):
+    # Colas nuevas con una ventana larga
+    monkeypatch.setattr(cola_escritura, "_colas", {})
+    monkeypatch.setattr(config, "COLA_ESCRITURA_VENTANA_MS", 2000)
+    return consumos
+
+
+def test_alta_sola_no_espera_la_ventana(colas):
+    inicio = time.monotonic()
+    Cliente.add_instancia("1000000-0", 2, "Nueva")
+    assert time.monotonic() - inicio < 1
+    assert [i.nombre for i in Cliente.get_all()[0].instancias] == ["Instancia 0", "Nueva"]
+
+
+def test_escritura_fallida_no_modifica_los_objetos_leidos(colas, monkeypatch):
+    cliente = Cliente.get_all()[0]
+
+    def fallar(clientes):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(Cliente, "write_xml", staticmethod(fallar))
+    with pytest.raises(OSError):
+        Cliente.add_instancia(cliente.nit, 2, "Nueva")
+
+    assert len(cliente.instancias) == 1
+    assert len(Cliente.get_all()[0].instancias) == 1
+
+
+def test_rafaga_de_altas(colas, monkeypatch):
+    monkeypatch.setattr(config, "COLA_ESCRITURA_VENTANA_MS", 20)
+    hilos = [
+        threading.Thread(target=Cliente.add_instancia, args=(f"{1000000 + i % 12}-{i % 12 % 10}", 1, f"R{i}"))
+        for i in range(24)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    nombres = {i.nombre for c in Cliente.get_all() for i in c.instancias}
+    assert {f"R{i}" for i in range(24)} <= nombres
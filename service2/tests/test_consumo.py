@@ -0,0 +1,114 @@
+from datetime import datetime
+import pytest
+from models.classes.consumo import Consumo, GrupoConsumos, COLUMNAS_CONSUMO, RUTA_BITACORA
+
+
+def grupo(nit: str, id_instancia: int, *fechas: str) -> GrupoConsumos:
+    return GrupoConsumos(nitCliente=nit, idInstancia=id_instancia,
+                         consumos=[Consumo(1.5, fecha) for fecha in fechas])
+
+
+def filas():
+    return [(nit, id_inst, c.fechaHora.minuto, c.facturado) for nit, id_inst, c in GrupoConsumos.iterar_consumos()]
+
+
+def test_compactar_interrumpida_no_duplica(datos, monkeypatch):
+    GrupoConsumos.append_xml([grupo("1000000-0", 1, "01/01/2024 10:00", "02/01/2024 10:00")])
+    GrupoConsumos.append_xml([grupo("2000000-0", 2, "03/01/2024 10:00")])
+    esperadas = filas()
+
+    # Falla entre la reescritura de consumos.xml y el reinicio de la bitácora
+    def interrumpir(generacion):
+        raise OSError("interrumpido")
+    with monkeypatch.context() as m:
+        m.setattr(GrupoConsumos, "_reiniciar_bitacora", staticmethod(interrumpir))
+        with pytest.raises(OSError):
+            GrupoConsumos.compactar()
+
+    assert filas() == esperadas
+    assert sum(len(g.consumos) for g in GrupoConsumos.get_all()) == 3
+
+    GrupoConsumos.append_xml([grupo("1000000-0", 1, "04/01/2024 10:00")])
+    assert len(filas()) == 4
+    GrupoConsumos.compactar()
+    assert len(filas()) == 4
+
+
+def test_compactar_sin_base_conserva_marcas(datos):
+    GrupoConsumos.append_xml([grupo("1000000-0", 1, "01/01/2024 10:00", "20/01/2024 10:00")])
+    # Bitácora sin consumos.xml (p.ej. copiada desde otra instalación)
+    (datos / "data" / "consumos.xml").unlink()
+    (datos / "data" / "consumos.xml.snap").unlink(missing_ok=True)
+    GrupoConsumos.marcar_facturados({("1000000-0", 1)}, datetime(2024, 1, 1), datetime(2024, 1, 10))
+    assert [facturado for *_, facturado in filas()] == [True, False]
+    GrupoConsumos.compactar()
+
+    assert [facturado for *_, facturado in filas()] == [True, False]
+    consumos = GrupoConsumos.get_all()[0].consumos
+    assert [c.facturado for c in consumos] == [True, False]
+
+
+def primera_pendiente() -> int:
+    with COLUMNAS_CONSUMO.abrir() as columnas:
+        return columnas.primera_pendiente
+
+
+def test_primera_pendiente_avanza_solo_sobre_filas_facturadas(datos):
+    a, b = ("1000000-0", 1), ("2000000-0", 2)
+    GrupoConsumos.append_xml([grupo(*a, "01/01/2024 10:00", "02/01/2024 10:00", "03/01/2024 10:00")])
+    GrupoConsumos.append_xml([grupo(*b, "01/01/2024 11:00")])
+    assert primera_pendiente() == 0
+
+    GrupoConsumos.marcar_facturados({a}, datetime(2024, 1, 1), datetime(2024, 1, 1, 23, 59))
+    assert primera_pendiente() == 1
+    # Queda pendiente una fila anterior: la búsqueda sigue empezando en ella
+    GrupoConsumos.marcar_facturados({a}, datetime(2024, 1, 3), datetime(2024, 1, 3, 23, 59))
+    assert primera_pendiente() == 1
+    assert [(nit, c.fechaHora.minuto) for nit, _, c in GrupoConsumos.iterar_pendientes(
+        datetime(2024, 1, 1), datetime(2024, 1, 31))] == [(nit, minuto) for nit, _, minuto, facturado in filas() if not facturado]
+    assert [facturado for *_, facturado in filas()] == [True, False, True, False]
+
+    GrupoConsumos.marcar_facturados({a, b}, datetime(2024, 1, 1), datetime(2024, 1, 31))
+    assert primera_pendiente() == 4
+    assert list(GrupoConsumos.iterar_pendientes(datetime(2024, 1, 1), datetime(2024, 1, 31))) == []
+
+    # Reconstruir las columnas desde los XML y las marcas da el mismo estado
+    GrupoConsumos.append_xml([grupo(*b, "05/01/2024 11:00")])
+    COLUMNAS_CONSUMO.reconstruir()
+    assert primera_pendiente() == 4
+    assert [facturado for *_, facturado in filas()] == [True, True, True, True, False]
+
+
+def segmentos() -> int:
+    with open(RUTA_BITACORA, "rb") as f:
+        return sum(1 for linea in f if linea.startswith(b"<segmento>"))
+
+
+def test_carga_por_lotes_es_un_solo_segmento(datos):
+    GrupoConsumos.append_xml([grupo("1000000-0", 1, "01/01/2024 10:00")])
+    lotes = [[grupo("1000000-0", 1, f"0{d}/01/2024 11:00"), grupo("2000000-0", 2, f"0{d}/01/2024 12:00")]
+             for d in range(2, 5)]
+    assert GrupoConsumos.append_xml_lotes(iter(lotes)) == 6
+    assert segmentos() == 2
+    assert len(filas()) == 7
+    with COLUMNAS_CONSUMO.abrir() as columnas:
+        assert columnas.filas == 7
+
+    def lotes_con_error():
+        yield lotes[0]
+        raise ValueError("archivo inválido")
+    with pytest.raises(ValueError):
+        GrupoConsumos.append_xml_lotes(lotes_con_error())
+    assert segmentos() == 2 and len(filas()) == 7
+
+
+def test_escritura_interrumpida_no_se_une_a_la_siguiente(datos):
+    GrupoConsumos.append_xml([grupo("1000000-0", 1, "01/01/2024 10:00")])
+    linea, _ = GrupoConsumos._preparar_segmento([grupo("1000000-0", 1, "02/01/2024 10:00")])
+    with open(RUTA_BITACORA, "ab") as f:
+        f.write(linea[:len(linea) // 2])
+    assert len(filas()) == 1
+
+    GrupoConsumos.append_xml([grupo("2000000-0", 2, "03/01/2024 10:00")])
+    assert [nit for nit, *_ in filas()] == ["1000000-0", "2000000-0"]
+    assert segmentos() == 2
@@ -0,0 +1,26 @@
+import os
+from models.classes.factura import Factura
+from services.facturacion_service import FacturacionService
+
+
+def test_pdf_repetido_responde_304(consumos, cliente_http):
+    FacturacionService().facturar("01/01/2025", "31/01/2025")
+    url = f"/facturas/{Factura.get_all()[0].id}"
+
+    primera = cliente_http.get(url)
+    assert primera.status_code == 200 and primera.data.startswith(b"%PDF")
+    etag, modificado = primera.headers["ETag"], primera.headers["Last-Modified"]
+    (ruta,) = [os.path.join("data/pdfs/facturas", a) for a in os.listdir("data/pdfs/facturas")]
+    generado = os.stat(ruta).st_mtime_ns
+
+    repetida = cliente_http.get(url, headers={"If-None-Match": etag})
+    assert repetida.status_code == 304 and repetida.data == b""
+    assert repetida.headers["ETag"] == etag
+    assert cliente_http.get(url, headers={"If-Modified-Since": modificado}).status_code == 304
+    # El PDF se generó una sola vez
+    assert os.stat(ruta).st_mtime_ns == generado
+
+    distinta = cliente_http.get(url, headers={"If-None-Match": '"otra"'})
+    assert distinta.status_code == 200 and distinta.data == primera.data
+    resumen = cliente_http.get(url + "?resumen=dia", headers={"If-None-Match": etag})
+    assert resumen.status_code == 200 and resumen.headers["ETag"] != etag
@@ -0,0 +1,85 @@
+from datetime import datetime
+import pytest
+from models import bloqueo
+from services import facturacion_numpy, facturacion_paralela
+from services.facturacion_service import FacturacionService
+
+np = pytest.importorskip("numpy")
+
+RANGO = ("01/01/2025", "31/01/2025", datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+
+def resumen(resultado):
+    """
+    Facturas sin su id (se genera al armarlas), errores y claves facturadas.
+    """
+    facturas, errores, claves = resultado
+    return (
+        [(indice, f.nitCliente, f.fechaEmision, f.total, f.detalles) for indice, f in facturas],
+        errores,
+        claves
+    )
+
+
+def activar_numpy(monkeypatch) -> None:
+    monkeypatch.setattr(facturacion_numpy, "ACTIVO", True)
+    monkeypatch.setattr(facturacion_numpy, "np", np, raising=False)
+
+
+def test_motores_generan_las_mismas_facturas(consumos, monkeypatch):
+    servicio = FacturacionService()
+    python = resumen(servicio._calcular_facturas(*RANGO))
+    assert python[0]
+
+    with monkeypatch.context() as m:
+        activar_numpy(m)
+        assert resumen(servicio._calcular_facturas(*RANGO)) == python
+
+    for motor in ("python", "numpy"):
+        # Los procesos leen el motor de su entorno
+        monkeypatch.setenv("SERVICE2_MOTOR_FACTURACION", motor)
+        with bloqueo.escritura():
+            paralelo = facturacion_paralela.generar_facturas(servicio, *RANGO[:2], 2)
+        assert resumen(paralelo) == python
+
+
+@pytest.mark.parametrize("numpy_activo", [False, True])
+def test_configuracion_inexistente(consumos, monkeypatch, numpy_activo):
+    if numpy_activo:
+        activar_numpy(monkeypatch)
+    servicio = FacturacionService()
+    servicio.clientes[0].instancias[0].idConfiguracion = 99
+    with pytest.raises(ValueError, match="Configuración '99' no encontrada"):
+        servicio._calcular_facturas(*RANGO)
+
+
+def costo_como_antes(servicio, id_conf, horas):
+    """
+    Subtotal como lo calculaba la facturación antes de los motores: la suma de
+    cantidad * valorXhora * horas de cada recurso, en el orden de la configuración.
+    """
+    total = 0.0
+    for rid, cantidad in servicio.config_por_id[id_conf].recursos.items():
+        recurso = servicio.recursos.get(rid)
+        if recurso:
+            total += cantidad * recurso.valorXhora * horas
+    return total
+
+
+@pytest.mark.parametrize("numpy_activo", [False, True])
+def test_mismos_valores_que_antes(consumos, monkeypatch, numpy_activo):
+    if numpy_activo:
+        activar_numpy(monkeypatch)
+    servicio = FacturacionService()
+    facturas, _, _ = servicio._calcular_facturas(*RANGO)
+    distintos = 0
+    for _, factura in facturas:
+        for detalle in factura.detalles:
+            horas = sum(c.tiempo for c in detalle.consumos)
+            assert detalle.horas == horas
+            assert detalle.subtotal == costo_como_antes(servicio, detalle.idConfiguracion, horas)
+            precio_hora = sum(cantidad * servicio.recursos[rid].valorXhora
+                              for rid, cantidad in detalle.recursos_cantidad.items())
+            distintos += detalle.subtotal != precio_hora * horas
+    # Los datos incluyen detalles en que (precio por hora) * horas redondea distinto
+    assert distintos
@@ -0,0 +1,107 @@
+from datetime import datetime
+import os
+import shutil
+from models import almacen_sqlite
+from models.classes.categoria import GestorCategoria
+from models.classes.factura import Factura
+from models.classes.ingreso_diario import IngresoDiario, TIPOS
+from models.classes.recurso import Recurso
+from services import almacenamiento_service
+from services.facturacion_service import FacturacionService
+from services.reporte_service import ReporteService
+from tests.conftest import RAIZ_SERVICIO
+
+ENERO = (datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+
+def recorrer_facturas(fecha_inicio: datetime, fecha_fin: datetime):
+    totales = {tipo: {} for tipo in TIPOS}
+    for (_, tipo, id_), monto in IngresoDiario.calcular(Factura.get_by_rango(fecha_inicio, fecha_fin)).items():
+        totales[tipo][id_] = totales[tipo].get(id_, 0.0) + monto
+    return totales
+
+
+def assert_totales_iguales(obtenidos, esperados):
+    for tipo in TIPOS:
+        assert obtenidos[tipo].keys() == esperados[tipo].keys()
+        for id_, monto in esperados[tipo].items():
+            assert abs(obtenidos[tipo][id_] - monto) < 1e-9 * max(1.0, monto)
+
+
+def test_acumulados_igual_a_recorrer_facturas(consumos):
+    servicio = FacturacionService()
+    servicio.facturar("01/01/2025", "15/01/2025")
+    servicio.facturar("16/01/2025", "31/01/2025")
+
+    totales = IngresoDiario.get_totales(*ENERO)
+    assert totales["configuracion"] and totales["categoria"] and totales["recurso"]
+    assert_totales_iguales(totales, recorrer_facturas(*ENERO))
+    assert_totales_iguales(IngresoDiario.get_totales(datetime(2025, 1, 3), datetime(2025, 1, 3)),
+                           recorrer_facturas(datetime(2025, 1, 3), datetime(2025, 1, 3)))
+
+
+def test_cambio_de_precio_no_altera_lo_facturado(consumos):
+    FacturacionService().facturar("01/01/2025", "31/01/2025")
+    antes = IngresoDiario.get_totales(*ENERO)
+
+    recursos = Recurso.get_all()
+    for recurso in recursos:
+        recurso.valorXhora *= 3
+    Recurso.write_xml(recursos)
+
+    assert IngresoDiario.reconstruir() == len(Factura.get_all())
+    assert_totales_iguales(IngresoDiario.get_totales(*ENERO), antes)
+
+
+def reportes_como_antes(facturas):
+    """
+    Datos de los reportes 1 y 2 calculados recorriendo las facturas como antes de los
+    acumulados: categoría actual de cada configuración y cantidad * valorXhora * horas.
+    """
+    gestor, recursos = GestorCategoria(), Recurso.get_dict_recursos()
+    configuraciones, categorias, aportes = {}, {}, {}
+    for factura in facturas:
+        for detalle in factura.detalles:
+            configuraciones[detalle.idConfiguracion] = configuraciones.get(detalle.idConfiguracion, 0.0) + detalle.subtotal
+            for rid, cantidad in detalle.recursos_cantidad.items():
+                if rid in recursos:
+                    aportes[rid] = aportes.get(rid, 0.0) + cantidad * recursos[rid].valorXhora * detalle.horas
+    for id_conf, total in configuraciones.items():
+        id_categoria = gestor.get_categoria_id_by_config_id(id_conf)
+        if id_categoria is not None:
+            categorias[id_categoria] = categorias.get(id_categoria, 0.0) + total
+    return {"configuracion": configuraciones, "categoria": categorias, "recurso": aportes}
+
+
+def datos_de_reportes(servicio: ReporteService):
+    categorias, configuraciones = servicio._generar_datos_reporte1(None)
+    return {"configuracion": dict(configuraciones), "categoria": dict(categorias),
+            "recurso": dict(servicio._generar_datos_reporte2(None))}
+
+
+def test_facturas_anteriores_a_los_acumulados(datos, monkeypatch):
+    # Facturas de ejemplo, sin categoría ni montos por recurso y sin acumulados
+    shutil.copytree(os.path.join(RAIZ_SERVICIO, "data", "facturas"), datos / "data" / "facturas")
+    facturas = Factura.get_all()
+    assert len(facturas) == 3 and all(d.idCategoria is None and not d.recursos_monto
+                                      for f in facturas for d in f.detalles)
+    esperados = reportes_como_antes(facturas)
+    assert esperados["categoria"] and esperados["recurso"]
+
+    servicio = ReporteService("31/10/2025", "31/10/2025")
+    assert_totales_iguales(datos_de_reportes(servicio), esperados)
+    assert IngresoDiario._xml_leer().facturas == 3
+
+    # Con el motor sqlite, en una base con las facturas pero sin acumulados
+    monkeypatch.setattr(almacen_sqlite.config, "RUTA_SQLITE", str(datos / "data" / "service2.db"))
+    monkeypatch.setattr(almacen_sqlite._local, "conexion", None, raising=False)
+    try:
+        almacenamiento_service.importar_xml()
+        with almacen_sqlite.transaccion() as conn:
+            conn.execute("DELETE FROM ingresos_diarios")
+            conn.execute("DELETE FROM ingresos_cobertura")
+        monkeypatch.setattr(almacen_sqlite.config, "ALMACENAMIENTO", "sqlite")
+        assert_totales_iguales(datos_de_reportes(servicio), esperados)
+    finally:
+        almacen_sqlite._local.conexion.close()
+        almacen_sqlite._local.conexion = None
@@ -0,0 +1,33 @@
+import os
+import time
+from models.classes.factura import Factura
+from services import trabajos
+
+
+def test_limpiar_elimina_todo_lo_generado(consumos, cliente_http, monkeypatch):
+    monkeypatch.setattr(trabajos.config, "COLA_TRABAJOS", "sqlite")
+    monkeypatch.setattr(trabajos, "_cola", None)
+    rango = {"fecha_inicio": "01/01/2025", "fecha_fin": "31/01/2025"}
+    assert cliente_http.post("/factura", json=rango).get_json()["facturas_generadas"] == 12
+    assert cliente_http.get(f"/facturas/{Factura.get_all()[0].id}").status_code == 200
+    assert cliente_http.post("/reporte/1", json=rango).status_code == 200
+    trabajo = cliente_http.post("/reporte/2?asincrono=1", json=rango).get_json()
+    for _ in range(100):
+        if cliente_http.get(trabajo["url"]).get_json()["estado"] == trabajos.COMPLETADO:
+            break
+        time.sleep(0.05)
+    generados = {os.path.relpath(os.path.join(raiz, nombre), "data")
+                 for raiz, _, archivos in os.walk("data") for nombre in archivos}
+    for ruta in ("consumos.facturados", "ingresos_diarios.xml", "facturas/manifiesto.xml",
+                 "consumos.columnas/estado", "consumos.journal.xml",
+                 "pdfs/reporte_ingresos_por_categoria.pdf", f"trabajos/{trabajo['id']}.pdf"):
+        assert ruta in generados
+
+    respuesta = cliente_http.post("/limpiar-db")
+    assert respuesta.status_code == 200, respuesta.get_json()
+    # Quedan el candado y la base de trabajos (compartida entre procesos), vacía
+    restantes = {os.path.relpath(os.path.join(raiz, nombre), "data")
+                 for raiz, _, archivos in os.walk("data") for nombre in archivos}
+    assert {ruta for ruta in restantes if not ruta.startswith("trabajos.db")} == {".lock"}
+    assert trabajos.obtener(trabajo["id"]) is None
+    assert cliente_http.get("/datos").status_code == 200
@@ -0,0 +1,23 @@
+import pytest
+from models.classes.cliente import Cliente
+from models.classes.consumo import GrupoConsumos
+from models.classes.recurso import Recurso
+from models.exceptions import ValidationError
+
+
+def test_alta_de_recurso_sin_metrica(cliente_http):
+    respuesta = cliente_http.post("/recursos", json={
+        "nombre": "GPU", "abreviatura": "gpu", "tipo": "hardware", "valorXhora": "2.5"
+    })
+    assert respuesta.status_code == 200, respuesta.get_json()
+    recurso = Recurso.get_all()[-1]
+    assert (recurso.nombre, recurso.tipo, recurso.valorXhora) == ("GPU", "Hardware", 2.5)
+    assert not recurso.metrica
+
+
+def test_valores_ausentes():
+    assert Recurso(1, "CPU", "cpu", None, "Hardware", 1.0).metrica is None
+    with pytest.raises(ValidationError, match="NIT inválido 'None'"):
+        Cliente(None, "Cliente", "usuario", "clave", "direccion", "correo")
+    with pytest.raises(ValidationError, match="NIT inválido 'None'"):
+        GrupoConsumos(nitCliente=None, idInstancia=1)
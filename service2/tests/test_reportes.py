@@ -0,0 +1,25 @@
+import time
+from services import trabajos
+
+
+def test_reporte_pdf_desde_otro_directorio(consumos, cliente_http):
+    rango = {"fecha_inicio": "01/01/2025", "fecha_fin": "31/01/2025"}
+    cliente_http.post("/factura", json=rango)
+    for reporte_id in ("1", "2"):
+        respuesta = cliente_http.post(f"/reporte/{reporte_id}", json=rango)
+        assert respuesta.status_code == 200, respuesta.get_json()
+        assert respuesta.data.startswith(b"%PDF")
+
+
+def test_resultado_de_trabajo_de_reporte(consumos, cliente_http, monkeypatch):
+    monkeypatch.setattr(trabajos, "_cola", None)
+    rango = {"fecha_inicio": "01/01/2025", "fecha_fin": "31/01/2025"}
+    trabajo = cliente_http.post("/reporte/2?asincrono=1", json=rango).get_json()
+    for _ in range(100):
+        estado = cliente_http.get(trabajo["url"]).get_json()
+        if estado["estado"] in (trabajos.COMPLETADO, trabajos.ERROR):
+            break
+        time.sleep(0.05)
+    assert estado["estado"] == trabajos.COMPLETADO, estado
+    respuesta = cliente_http.get(estado["resultado_url"])
+    assert respuesta.status_code == 200 and respuesta.data.startswith(b"%PDF")
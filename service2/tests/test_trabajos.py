@@ -0,0 +1,82 @@
+import time
+from services import trabajos
+from services.facturacion_service import FacturacionService, FRACCION_CALCULO
+from services.trabajos import ColaSqlite, Trabajo, COMPLETADO, EN_PROCESO, PENDIENTE
+
+
+def test_facturar_informa_clientes_procesados(consumos):
+    avances = []
+    resultado = FacturacionService(avance=lambda fraccion, mensaje: avances.append((fraccion, mensaje))) \
+        .facturar("01/01/2025", "31/01/2025")
+    assert resultado["facturas_generadas"] == 12
+
+    fracciones = [fraccion for fraccion, _ in avances]
+    assert fracciones == sorted(fracciones)
+    assert avances[0] == (FRACCION_CALCULO / 12, "Clientes procesados: 1 de 12")
+    assert (FRACCION_CALCULO, "Clientes procesados: 12 de 12") in avances
+    assert avances[-1][0] < 1.0
+
+
+def test_trabajo_sin_latido_vuelve_a_la_cola(tmp_path, monkeypatch):
+    monkeypatch.setattr(trabajos.config, "TRABAJOS_LATIDO_MAX", 60.0)
+    cola = ColaSqlite(str(tmp_path / "trabajos.db"))
+    cola.agregar(Trabajo(id="t1", tipo="factura", parametros={}))
+
+    tomado = cola.tomar(0)
+    assert tomado.id == "t1" and tomado.estado == EN_PROCESO
+    # Con latido reciente nadie más lo toma
+    cola.renovar(tomado)
+    assert cola.tomar(0) is None
+
+    # Su proceso dejó de latir: al tomar trabajos vuelve a la cola y se toma otra vez
+    cola._conexion().execute("UPDATE trabajos SET latido = ? WHERE id = 't1'", (time.time() - 61,))
+    assert cola.tomar(0).id == "t1"
+    assert cola.obtener("t1").estado == EN_PROCESO
+
+
+def test_ejecucion_reasignada_no_pisa_la_nueva(tmp_path, monkeypatch):
+    cola = ColaSqlite(str(tmp_path / "trabajos.db"))
+    cola.agregar(Trabajo(id="t1", tipo="prueba", parametros={}))
+    colgado = cola.tomar(0)
+    cola._conexion().execute("UPDATE trabajos SET latido = ? WHERE id = 't1'", (time.time() - 3600,))
+    nuevo = cola.tomar(0)
+    assert nuevo.id == "t1" and nuevo.toma != colgado.toma
+
+    pasos = []
+
+    def ejecutor(trabajo, avance):
+        pasos.append("inicio")
+        avance(0.5, "a mitad")
+        pasos.append("fin")
+        trabajo.resultado = {"de": "colgado"}
+    monkeypatch.setitem(trabajos.EJECUTORES, "prueba", ejecutor)
+
+    # El proceso colgado sigue: se detiene en su primer avance y no guarda nada
+    trabajos._ejecutar(cola, colgado)
+    assert pasos == ["inicio"]
+    assert not cola.renovar(colgado)
+    guardado = cola.obtener("t1")
+    assert (guardado.estado, guardado.toma, guardado.resultado) == (EN_PROCESO, nuevo.toma, None)
+
+    trabajos._ejecutar(cola, nuevo)
+    guardado = cola.obtener("t1")
+    assert (guardado.estado, guardado.resultado) == (COMPLETADO, {"de": "colgado"})
+
+
+def test_bases_sin_latido_se_migran(tmp_path):
+    import sqlite3
+
+    ruta = str(tmp_path / "trabajos.db")
+    esquema = ColaSqlite.ESQUEMA.replace(",\n        toma TEXT,\n        latido REAL -- último latido del proceso que lo ejecuta", "")
+    assert "latido" not in esquema and "toma" not in esquema
+    conn = sqlite3.connect(ruta, isolation_level=None)
+    conn.executescript(esquema)
+    conn.execute(
+        "INSERT INTO trabajos (id, tipo, parametros, estado, avance, mensaje, creado, proceso) "
+        "VALUES ('t1', 'factura', '{}', ?, 0, '', ?, 1)", (EN_PROCESO, time.time())
+    )
+    conn.close()
+
+    cola = ColaSqlite(ruta)
+    cola.recuperar_huerfanos()
+    assert cola.obtener("t1").estado == PENDIENTE